@@ -0,0 +1,94 @@
+# Active Window Component
+#
+# Shows the title and class of the focused window from Hyprland's
+# activewindow events. Hyprland emits the event again on every title change
+# of the focused window, which for browsers playing media or terminals
+# drawing progress bars can be many times per second: the latest value is
+# kept and rendered at most once per frame, and unchanged text is skipped.
+#
+from typing import Tuple
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Pango  # pyright: ignore # noqa
+from hyprbar.aio import TaskScope, hyprctl
+from hyprbar.config import ComponentConfig
+from hyprbar.hyprevents import hyprlandEvents
+from hyprbar.render import renderBatcher
+from hyprbar.stateexport import stateExport
+from hyprbar.util import printLog
+
+
+class ActiveWindow:
+    """
+    Title and class of the focused window.
+
+    Attributes:
+        current (Tuple[str, str]): Latest (class, title) from Hyprland
+        rendered (str): Text the label shows, or is about to show
+    """
+
+    def __init__(self, box: Gtk.Box, config: ComponentConfig) -> None:
+        self.config = config
+        self.cssId = config.css_id  # pyright: ignore # noqa
+        self.current: Tuple[str, str] = ("", "")
+        self.rendered = ""
+
+        self.root = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+        if self.cssId:
+            self.root.set_name(self.cssId)
+        if config.icon:  # pyright: ignore # noqa
+            icon = Gtk.Label(label=f"{config.icon}")  # pyright: ignore # noqa
+            icon.set_name(f"{self.cssId}-icon")
+            self.root.append(icon)
+        # The width is fixed once, so title changes never resize the bar
+        self.label = Gtk.Label()
+        self.label.set_name(f"{self.cssId}-label")
+        self.label.set_single_line_mode(True)
+        self.label.set_ellipsize(Pango.EllipsizeMode.END)
+        self.label.set_max_width_chars(config.max_chars)  # pyright: ignore # noqa
+        self.label.set_width_chars(config.max_chars)  # pyright: ignore # noqa
+        self.label.set_xalign(0)
+        self.root.append(self.label)
+        box.append(self.root)
+
+        hyprlandEvents.subscribe("activewindow", self.onActiveWindow)
+        self.root.connect("destroy", self.onDestroy)
+        self.tasks = TaskScope("activewindow").bindTo(self.root)
+        self.tasks.spawn(self.load())
+
+    async def load(self) -> None:
+        # Current window once, events keep it current afterwards
+        try:
+            window = await hyprctl("activewindow")
+        except (OSError, ValueError) as e:
+            printLog(f"Error reading the active window: {e}")
+            return
+        if window:
+            self.update(window.get("class", ""), window.get("title", ""))
+
+    def onActiveWindow(self, data: str) -> None:
+        # "CLASS,TITLE": the class has no commas, the title may have some
+        wmClass, _, title = data.partition(",")
+        self.update(wmClass, title)
+
+    def update(self, wmClass: str, title: str) -> None:
+        if (wmClass, title) == self.current:
+            return
+        self.current = (wmClass, title)
+        stateExport.publish("activewindow", {"class": wmClass, "title": title})
+        text = self.format(wmClass, title)
+        if text == self.rendered:
+            return
+        self.rendered = text
+        # A newer title replaces one still waiting for the next frame
+        renderBatcher.setText(self.label, text)
+        renderBatcher.setVisible(self.root, bool(wmClass or title))
+
+    def format(self, wmClass: str, title: str) -> str:
+        if not wmClass and not title:
+            return ""
+        return self.config.format.format(  # pyright: ignore # noqa
+            **{"title": title or wmClass, "class": wmClass}
+        )
+
+    def onDestroy(self, _) -> None:
+        hyprlandEvents.unsubscribe("activewindow", self.onActiveWindow)
@@ -0,0 +1,156 @@
+# Asyncio on the GLib Main Loop
+#
+# hyprbar runs asyncio on top of the GLib main loop through PyGObject's
+# GLibEventLoopPolicy, so component code can be written as coroutines that
+# await Hyprland IPC, D-Bus calls, subprocesses and worker jobs instead of
+# chaining GLib.timeout_add/idle_add callbacks and blocking sync calls.
+#
+# Every component owns a TaskScope bound to one of its widgets: when the
+# widget is destroyed, all the tasks of the component are cancelled.
+#
+import json
+import asyncio
+from typing import Any, Coroutine, Optional, Set, Tuple
+from gi.events import GLibEventLoopPolicy  # pyright: ignore # noqa
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Gio  # pyright: ignore # noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.hypripc import hyprIPC
+from hyprbar.workers import workerPool
+from hyprbar.util import printLog
+
+
+def installEventLoop() -> None:
+    # Must run before the GTK main loop starts
+    if not isinstance(asyncio.get_event_loop_policy(), GLibEventLoopPolicy):
+        asyncio.set_event_loop_policy(GLibEventLoopPolicy())
+
+
+def getLoop() -> asyncio.AbstractEventLoop:
+    installEventLoop()
+    return asyncio.get_event_loop_policy().get_event_loop()
+
+
+class TaskScope:
+    """
+    Tasks owned by one component, cancelled together.
+
+    Attributes:
+        name (str): Component name, used in task names and logs
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.tasks: Set[asyncio.Task] = set()
+
+    def bindTo(self, widget: Gtk.Widget) -> "TaskScope":
+        widget.connect("destroy", lambda _: self.cancel())
+        return self
+
+    def spawn(self, coroutine: Coroutine) -> asyncio.Task:
+        task = getLoop().create_task(coroutine, name=f"{self.name}")
+        self.tasks.add(task)
+        task.add_done_callback(self._onDone)
+        return task
+
+    def cancel(self) -> None:
+        for task in list(self.tasks):
+            task.cancel()
+
+    def _onDone(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            printLog(f"Task of component '{self.name}' failed: {task.exception()!r}")
+
+
+async def runCommand(command: str) -> Tuple[int, str, str]:
+    """
+    Runs a shell command without blocking the main loop.
+
+    Returns:
+        Tuple[int, str, str]: exit code, stdout and stderr, like executeCommand
+    """
+    process = await asyncio.create_subprocess_shell(
+        command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    return process.returncode or 0, stdout.decode(), stderr.decode()
+
+
+async def hyprctl(command: str, asJson: bool = True) -> Any:
+    """
+    Sends one request to Hyprland's control socket, like `hyprctl`.
+
+    Args:
+        command (str): e.g. "clients" or "dispatch workspace 2".
+        asJson (bool): Ask for a JSON reply and decode it.
+    """
+    reply = await hyprIPC.requestAsync(f"{'j/' if asJson else ''}{command}")
+    return json.loads(reply) if asJson else reply.decode()
+
+
+async def dbusCall(
+    connection: Gio.DBusConnection,
+    busName: str,
+    objectPath: str,
+    interface: str,
+    method: str,
+    parameters: Optional[GLib.Variant] = None,
+    replyType: Optional[GLib.VariantType] = None,
+    timeout: int = 5000,
+) -> GLib.Variant:
+    # Cancelling the awaiting task cancels the D-Bus call
+    future = getLoop().create_future()
+    cancellable = Gio.Cancellable()
+
+    def onReply(connection, result, _) -> None:
+        if future.done():
+            return
+        try:
+            future.set_result(connection.call_finish(result))
+        except GLib.Error as e:
+            future.set_exception(e)
+
+    connection.call(
+        busName,
+        objectPath,
+        interface,
+        method,
+        parameters,
+        replyType,
+        Gio.DBusCallFlags.NONE,
+        timeout,
+        cancellable,
+        onReply,
+        None,
+    )
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancellable.cancel()
+        raise
+
+
+async def inWorker(task: str, payload: str) -> str:
+    """
+    Runs a worker task (see hyprbar.workers) and returns its value.
+
+    Raises:
+        RuntimeError: The task failed or its worker was restarted.
+    """
+    future = getLoop().create_future()
+
+    def onResult(value: Optional[str], error: Optional[str]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(value or "")
+
+    workerPool.submit(task, payload, onResult)
+    return await future
@@ -0,0 +1,200 @@
+# AppSwitch Buttons
+#
+# Buttons of the appswitch component and the pool they are recycled through.
+# A button is built once, its "clicked" handler is connected once, and it is
+# re-bound to another window (icon, title, addresses) when a window opens
+# instead of building a new widget tree for every terminal or popup.
+#
+# Run `python -m hyprbar.appbutton` for a synthetic open/close churn benchmark
+# comparing pooled and unpooled buttons.
+#
+import os
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+from hyprbar.desktopindex import desktopIndex
+from hyprbar.render import renderBatcher
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Pango  # pyright: ignore # noqa
+
+POOL_SIZE = 16  # default number of released buttons kept for reuse
+
+
+class AppButton:
+    """
+    Button showing one window, or every window of one class when grouping.
+
+    Attributes:
+        wmClass (str): Class the icon was resolved for
+        addresses (List[str]): Windows the button focuses, cycled on click
+    """
+
+    __slots__ = (
+        "button",
+        "icon",
+        "label",
+        "countLabel",
+        "wmClass",
+        "addresses",
+        "nextIndex",
+        "onClicked",
+    )
+
+    def __init__(self, onClicked: Callable[["AppButton"], None]) -> None:
+        app_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+        self.icon = Gtk.Image()
+        # Create label for app title
+        self.label = Gtk.Label()
+        self.label.set_ellipsize(Pango.EllipsizeMode.END)
+        self.label.set_max_width_chars(20)
+        # Window count, only shown for groups with more than one window
+        self.countLabel = Gtk.Label()
+        self.countLabel.add_css_class("appswitch-count")
+        self.countLabel.set_visible(False)
+        # Pack icon and labels into app_box
+        app_box.append(self.icon)
+        app_box.append(self.label)
+        app_box.append(self.countLabel)
+        # Create button with the box as content
+        self.button = Gtk.Button()
+        self.button.set_child(app_box)
+        self.button.add_css_class("appswitch")
+        # Connected once, reads whatever the button is bound to when clicked
+        self.button.connect("clicked", self._onClicked)
+        # The full title is only looked at when the button is hovered
+        self.button.set_has_tooltip(True)
+        self.button.connect("query-tooltip", self._onQueryTooltip)
+        self.onClicked = onClicked
+        self.wmClass = ""
+        self.addresses: List[str] = []
+        self.nextIndex = 0
+
+    def bind(self, wmClass: str, title: str, name: Optional[str] = None) -> None:
+        # Updates queued for the previous window must not land on this one
+        self._cancelUpdates()
+        if wmClass != self.wmClass:
+            # Resolve the app icon through the desktop entries
+            iconName = desktopIndex.resolve(wmClass)
+            if os.path.isabs(iconName):
+                self.icon.set_from_file(iconName)
+            else:
+                self.icon.set_from_icon_name(iconName)
+            self.wmClass = wmClass
+        self.label.set_text(title)
+        self.button.set_name(name or "")
+
+    def unbind(self) -> None:
+        self._cancelUpdates()
+        self.addresses.clear()
+        self.nextIndex = 0
+        self.countLabel.set_visible(False)
+        self.button.set_name("")
+
+    def _cancelUpdates(self) -> None:
+        renderBatcher.cancel(self.label)
+        renderBatcher.cancel(self.countLabel)
+
+    def _onClicked(self, _) -> None:
+        self.onClicked(self)
+
+    def _onQueryTooltip(self, button, x, y, keyboardMode, tooltip) -> bool:
+        # Titles that fit in the label need no tooltip
+        if not self.label.get_layout().is_ellipsized():
+            return False
+        tooltip.set_text(self.label.get_text())
+        return True
+
+
+class ButtonPool:
+    """
+    Bounded free list of AppButtons.
+
+    Attributes:
+        maxSize (int): Released buttons kept, the rest are left to the GC
+        created (int): Buttons built since the pool was created
+        reused (int): Buttons handed out from the free list
+    """
+
+    def __init__(
+        self, onClicked: Callable[[AppButton], None], maxSize: int = POOL_SIZE
+    ) -> None:
+        self.onClicked = onClicked
+        self.maxSize = maxSize
+        self.free: List[AppButton] = []
+        self.created = 0
+        self.reused = 0
+
+    def prewarm(self, count: int) -> bool:
+        for _ in range(min(count, self.maxSize) - len(self.free)):
+            self.free.append(self._build())
+        return False
+
+    def acquire(self, wmClass: str, title: str, name: Optional[str] = None) -> AppButton:
+        if self.free:
+            appButton = self.free.pop()
+            self.reused += 1
+        else:
+            appButton = self._build()
+        appButton.bind(wmClass, title, name)
+        return appButton
+
+    def release(self, appButton: AppButton) -> None:
+        # The caller must have removed the button from its parent
+        appButton.unbind()
+        if len(self.free) < self.maxSize:
+            self.free.append(appButton)
+
+    def _build(self) -> AppButton:
+        self.created += 1
+        return AppButton(self.onClicked)
+
+
+def benchmarkChurn(
+    cycles: int = 2000, windows: int = 20, poolSize: int = POOL_SIZE
+) -> dict:
+    """
+    Opens and closes windows in a sliding window of `windows` open buttons.
+
+    Args:
+        cycles (int): Windows opened (and closed) during the run.
+        windows (int): Buttons open at the same time.
+        poolSize (int): Pool bound, 0 builds a new button for every window.
+
+    Returns:
+        dict: Buttons built, average milliseconds per open+close, peak KiB.
+    """
+    box = Gtk.Box()
+    pool = ButtonPool(lambda _: None, maxSize=poolSize)
+    classes = ["kitty", "firefox", "code", "thunar", "pavucontrol"]
+    live: List[AppButton] = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(cycles):
+        address = f"0x{i:x}"
+        appButton = pool.acquire(classes[i % len(classes)], f"window {i}", address)
+        appButton.addresses.append(address)
+        box.append(appButton.button)
+        live.append(appButton)
+        if len(live) > windows:
+            closed = live.pop(0)
+            box.remove(closed.button)
+            pool.release(closed)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "created": pool.created,
+        "ms_per_cycle": elapsed * 1000 / cycles,
+        "peak_kib": peak / 1024,
+    }
+
+
+if __name__ == "__main__":
+    Gtk.init()
+    for label, size in (("unpooled", 0), ("pooled", POOL_SIZE)):
+        result = benchmarkChurn(poolSize=size)
+        print(
+            f"{label:>8}: {result['created']:5d} buttons built, "
+            f"{result['ms_per_cycle']:.3f} ms per open/close, "
+            f"peak {result['peak_kib']:.0f} KiB"
+        )
@@ -1,81 +1,400 @@
 # this class is reponsible for appswitch hyprbar module
 # This is Gtk4 based component that displays a list of open applications
 #
+# Windows are kept in workspace -> windows and class -> windows indexes that
+# are updated incrementally on every refresh. Buttons live in one view box
+# per workspace (a single view when every workspace is shown), so following
+# the active workspace only toggles the visibility of two boxes. Buttons of
+# closed windows go back to a pool and are re-bound to the next new window.
+#
+# The list mode (AppSwitchList) keeps windows in a Gio.ListStore rendered by
+# a Gtk.ListView, so only the buttons that fit in the bar are realized.
+#
 from hyprbar.config import ComponentConfig
-from typing import List
-from hyprpy import Hyprland
-from hyprbar.util import executeCommand
+import asyncio
+from typing import Dict, Iterable, List, Tuple
+from hyprbar.util import printLog
+from hyprbar.aio import TaskScope, hyprctl
+from hyprbar.snapshot import snapshot
+from hyprbar.stateexport import stateExport
+from hyprbar.appbutton import AppButton, ButtonPool
+from hyprbar.render import renderBatcher
+from hyprbar.workspaces import workspaceModel
+from hyprbar.hypripc import CLIENTS, CachedQuery, Client
 from rich.console import Console
 from gi.repository import Gtk  # pyright: ignore #noqa
 from gi.repository import GLib  # pyright: ignore # noqa
-from gi.repository import Pango  # pyright: ignore # noqa
+from gi.repository import Gio  # pyright: ignore # noqa
+from gi.repository import GObject  # pyright: ignore # noqa
 
 cl = Console()
 
+ALL_WORKSPACES = 0  # view key used when windows of every workspace are shown
+
+
+class WindowEntry:
+    __slots__ = ("address", "title", "wmClass", "workspaceId")
+
+    def __init__(self, address: str, title: str, wmClass: str, workspaceId: int):
+        self.address = address
+        self.title = title
+        self.wmClass = wmClass
+        self.workspaceId = workspaceId
+
 
 class AppSwitch:
-    hyprland = Hyprland()  # instance of Hyprland
-    windowsAddresses: List[str] = []
     refresh: int = 100  # 100 miliseconds
 
     def __init__(self, box: Gtk.Box, config: ComponentConfig) -> None:
+        self.clients = CachedQuery(CLIENTS)  # skips unchanged replies
         self.box = box
         self.config = config
-        # self.updateAppSwitch()
-        GLib.timeout_add(
-            self.refresh,
-            lambda: self.updateAppSwitch(),
+        self.show: str = config.show  # pyright: ignore # noqa
+        self.group: bool = config.group  # pyright: ignore # noqa
+        self.listed = set(
+            config.workspace_ids  # pyright: ignore # noqa
+            or range(1, config.workspaces + 1)  # pyright: ignore # noqa
         )
 
-    def removeButtonByName(self, name):
-        child = self.box.get_first_child()
-        while child:
-            if child.get_name() == name:
-                self.box.remove(child)
-                break
-            child = child.get_next_sibling()
+        # Indexes, all updated incrementally
+        self.windows: Dict[str, WindowEntry] = {}  # address -> window
+        self.byWorkspace: Dict[int, Dict[str, None]] = {}  # workspace -> addresses
+        self.byClass: Dict[Tuple[int, str], Dict[str, None]] = {}  # (view, class)
+        # Widgets
+        self.views: Dict[int, Gtk.Box] = {}  # view key -> box with its buttons
+        self.buttons: Dict[object, AppButton] = {}  # address or (view, class)
+        self.activeWorkspace: int = workspaceModel.activeId
+
+        self.buildWidgets()
+        # Draw the windows of the last run, the first update reconciles them
+        for window in snapshot.get("windows", []):
+            self.addWindow(
+                WindowEntry(
+                    window["address"],
+                    window["title"],
+                    window["class"],
+                    window.get("workspace", 1),
+                )
+            )
+        if self.show == "current":
+            # Follow the active workspace from events instead of polling it
+            workspaceModel.addListener(
+                lambda _: self.setActiveWorkspace(workspaceModel.activeId)
+            )
+        self.tasks = TaskScope("appswitch").bindTo(self.root)
+        self.tasks.spawn(self.pollWindows())
+
+    def buildWidgets(self) -> None:
+        # Only the box mode recycles buttons itself, the list view has its own
+        self.pool = ButtonPool(
+            self.onClicked, self.config.pool_size  # pyright: ignore # noqa
+        )
+        self.root = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=self.box.get_spacing()
+        )
+        if self.config.css_id:  # pyright: ignore # noqa
+            self.root.set_name(self.config.css_id)  # pyright: ignore # noqa
+        self.box.append(self.root)
+        # Build spare buttons once the bar is drawn, before windows churn
+        GLib.idle_add(self.pool.prewarm, self.pool.maxSize // 2)
+
+    def viewKey(self, workspaceId: int) -> int:
+        return ALL_WORKSPACES if self.show == "all" else workspaceId
+
+    def isViewVisible(self, key: int) -> bool:
+        if self.show == "current":
+            return key == self.activeWorkspace
+        if self.show == "listed":
+            return key in self.listed
+        return True
+
+    def viewBox(self, key: int) -> Gtk.Box:
+        view = self.views.get(key)
+        if view is None:
+            view = Gtk.Box(
+                orientation=Gtk.Orientation.HORIZONTAL, spacing=self.box.get_spacing()
+            )
+            view.set_visible(self.isViewVisible(key))
+            # Keep the views ordered by workspace id
+            previous = max((k for k in self.views if k < key), default=None)
+            self.root.insert_child_after(
+                view, self.views[previous] if previous is not None else None
+            )
+            self.views[key] = view
+        return view
+
+    def setActiveWorkspace(self, workspaceId: int) -> None:
+        if workspaceId == self.activeWorkspace:
+            return
+        previous = self.activeWorkspace
+        self.activeWorkspace = workspaceId
+        if self.show != "current":
+            return
+        # O(1): hide the old view, show the new one
+        if previous in self.views:
+            renderBatcher.setVisible(self.views[previous], False)
+        if workspaceId in self.views:
+            renderBatcher.setVisible(self.views[workspaceId], True)
+
+    def indexWindow(self, entry: WindowEntry) -> None:
+        self.windows[entry.address] = entry
+        self.byWorkspace.setdefault(entry.workspaceId, {})[entry.address] = None
+
+    def unindexWindow(self, address: str) -> WindowEntry:
+        entry = self.windows.pop(address)
+        addresses = self.byWorkspace[entry.workspaceId]
+        del addresses[address]
+        if not addresses:
+            del self.byWorkspace[entry.workspaceId]
+        return entry
+
+    def addWindow(self, entry: WindowEntry) -> None:
+        self.indexWindow(entry)
+        key = self.viewKey(entry.workspaceId)
+
+        if self.group:
+            groupKey = (key, entry.wmClass)
+            self.byClass.setdefault(groupKey, {})[entry.address] = None
+            appButton = self.buttons.get(groupKey)
+            if appButton is None:
+                appButton = self.pool.acquire(entry.wmClass, entry.title)
+                self.buttons[groupKey] = appButton
+                self.viewBox(key).append(appButton.button)
+            appButton.addresses.append(entry.address)
+            self.updateGroupLabels(groupKey)
+        else:
+            appButton = self.pool.acquire(entry.wmClass, entry.title, entry.address)
+            appButton.addresses.append(entry.address)
+            self.buttons[entry.address] = appButton
+            self.viewBox(key).append(appButton.button)
+
+    def removeWindow(self, address: str) -> None:
+        entry = self.unindexWindow(address)
+        key = self.viewKey(entry.workspaceId)
+
+        if self.group:
+            groupKey = (key, entry.wmClass)
+            del self.byClass[groupKey][address]
+            appButton = self.buttons[groupKey]
+            appButton.addresses.remove(address)
+            if appButton.addresses:
+                self.updateGroupLabels(groupKey)
+                return
+            del self.byClass[groupKey]
+            del self.buttons[groupKey]
+        else:
+            appButton = self.buttons.pop(address)
+        self.views[key].remove(appButton.button)
+        self.pool.release(appButton)
+
+    def updateGroupLabels(self, groupKey: Tuple[int, str]) -> None:
+        appButton = self.buttons[groupKey]
+        count = len(appButton.addresses)
+        if count == 1:
+            title = self.windows[appButton.addresses[0]].title
+        else:
+            title = groupKey[1]
+        renderBatcher.setText(appButton.label, title)
+        renderBatcher.setText(appButton.countLabel, f"{count}")
+        renderBatcher.setVisible(appButton.countLabel, count > 1)
+
+    def updateTitle(self, entry: WindowEntry) -> None:
+        if self.group:
+            self.updateGroupLabels((self.viewKey(entry.workspaceId), entry.wmClass))
+        else:
+            renderBatcher.setText(self.buttons[entry.address].label, entry.title)
+
+    def onClicked(self, appButton: AppButton) -> None:
+        # Groups cycle through their windows on every click
+        if not appButton.addresses:
+            return
+        appButton.nextIndex %= len(appButton.addresses)
+        address = appButton.addresses[appButton.nextIndex]
+        appButton.nextIndex += 1
+        self.tasks.spawn(
+            hyprctl(f"dispatch focuswindow address:{address}", asJson=False)
+        )
+
+    async def pollWindows(self) -> None:
+        while True:
+            try:
+                clients, changed = await self.clients.fetch()
+            except (OSError, ValueError) as e:
+                printLog(f"Error reading Hyprland clients: {e}")
+            else:
+                # Same reply as last time: nothing to reconcile
+                if changed:
+                    self.applyClients(clients)
+            await asyncio.sleep(self.refresh / 1000)
 
     def updateAppSwitch(self) -> bool:
-        # Get current windows and their addresses
-        current_windows = self.hyprland.get_windows()
-        current_addresses = [window.address for window in current_windows]
+        # Synchronous refresh, used by the memory soak test
+        clients, changed = self.clients.get()
+        if changed:
+            self.applyClients(clients)
+        return True
+
+    def applyClients(self, clients: List[Client]) -> None:
+        self.reconcile(
+            WindowEntry(c.address, c.title, c.wmClass, c.workspaceId)
+            for c in clients
+        )
+
+    def reconcile(self, current: Iterable[WindowEntry]) -> None:
+        # Reconcile the current windows with the indexes
+        seen = set()
+        for window in current:
+            seen.add(window.address)
+            entry = self.windows.get(window.address)
+            if entry is None:
+                self.addWindow(window)
+            elif (
+                entry.workspaceId != window.workspaceId
+                or entry.wmClass != window.wmClass
+            ):
+                # Moved to another workspace (or reclassed): move its button
+                self.removeWindow(window.address)
+                self.addWindow(window)
+            elif entry.title != window.title:
+                entry.title = window.title
+                self.updateTitle(entry)
 
         # Remove buttons for closed windows
-        closed_addresses = [
-            addr for addr in self.windowsAddresses if addr not in current_addresses
-        ]
-        for address in closed_addresses:
-            self.removeButtonByName(address)
-            self.windowsAddresses.remove(address)
-
-        # Add buttons for new windows
-        for window in current_windows:
-            if window.address not in self.windowsAddresses:
-                self.windowsAddresses.append(window.address)
-                app_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
-                # Try to get app icon
-                icon = Gtk.Image()
-                icon.set_from_icon_name(window.wm_class.lower())
-                # Create label for app title
-                label = Gtk.Label(label=window.title)
-                label.set_ellipsize(Pango.EllipsizeMode.END)
-                label.set_max_width_chars(20)
-                # Pack icon and label into app_box
-                app_box.append(icon)
-                app_box.append(label)
-                # Create button with the box as content
-                button = Gtk.Button()
-                button.set_child(app_box)
-                button.set_name(f"{window.address}")
-                button.add_css_class("appswitch")
-                # Add click event to focus the window
-                button.connect(
-                    "clicked",
-                    lambda _, win_addr=window.address: executeCommand(
-                        f"hyprctl dispatch focuswindow address:{win_addr}"
-                    ),
-                )
+        for address in [addr for addr in self.windows if addr not in seen]:
+            self.removeWindow(address)
+
+        snapshot.update(
+            "windows",
+            [
+                {
+                    "address": entry.address,
+                    "title": entry.title,
+                    "class": entry.wmClass,
+                    "workspace": entry.workspaceId,
+                }
+                for entry in self.windows.values()
+            ],
+        )
+        stateExport.publish(
+            "windows",
+            {
+                entry.address: {
+                    "title": entry.title,
+                    "class": entry.wmClass,
+                    "workspace": entry.workspaceId,
+                }
+                for entry in self.windows.values()
+            },
+        )
 
-                self.box.append(button)
 
-        return True
+class WindowItem(GObject.Object):
+    """
+    Window in the Gio.ListStore of the list mode.
+    """
+
+    __gtype_name__ = "HyprbarWindowItem"
+
+    address = GObject.Property(type=str, default="")
+    title = GObject.Property(type=str, default="")
+    wmClass = GObject.Property(type=str, default="")
+    workspaceId = GObject.Property(type=int, default=0)
+
+
+class AppSwitchList(AppSwitch):
+    """
+    AppSwitch rendered by a horizontal Gtk.ListView (mode: list).
+
+    Windows live in a Gio.ListStore filtered by the visible workspaces. Only
+    the buttons in the visible width are realized and recycled by the list
+    view, and every window change is a single-item items-changed.
+    """
+
+    def buildWidgets(self) -> None:
+        if self.group:
+            printLog("appswitch: group is not supported in list mode, ignoring it")
+            self.group = False
+        self.items: Dict[str, WindowItem] = {}  # address -> item in the store
+        self.bindings: Dict[Gtk.ListItem, Tuple[AppButton, int]] = {}
+
+        self.store = Gio.ListStore(item_type=WindowItem)
+        self.filter = Gtk.CustomFilter.new(
+            lambda item: self.isViewVisible(self.viewKey(item.workspaceId))
+        )
+        filtered = Gtk.FilterListModel(model=self.store, filter=self.filter)
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.onSetup)
+        factory.connect("bind", self.onBind)
+        factory.connect("unbind", self.onUnbind)
+        factory.connect("teardown", self.onTeardown)
+
+        listView = Gtk.ListView(
+            model=Gtk.NoSelection(model=filtered),
+            factory=factory,
+            orientation=Gtk.Orientation.HORIZONTAL,
+        )
+        listView.add_css_class("appswitch-list")
+
+        self.root = Gtk.ScrolledWindow()
+        self.root.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.NEVER)
+        self.root.set_propagate_natural_width(True)
+        self.root.set_max_content_width(self.config.max_width)  # pyright: ignore # noqa
+        self.root.set_child(listView)
+        if self.config.css_id:  # pyright: ignore # noqa
+            self.root.set_name(self.config.css_id)  # pyright: ignore # noqa
+        self.box.append(self.root)
+
+    def onSetup(self, factory, listItem: Gtk.ListItem) -> None:
+        appButton = AppButton(self.onClicked)
+        listItem.set_child(appButton.button)
+        self.bindings[listItem] = (appButton, 0)
+
+    def onBind(self, factory, listItem: Gtk.ListItem) -> None:
+        appButton, _ = self.bindings[listItem]
+        item = listItem.get_item()
+        appButton.bind(item.wmClass, item.title, item.address)
+        appButton.addresses.append(item.address)
+        handlerId = item.connect(
+            "notify::title",
+            lambda item, _: renderBatcher.setText(appButton.label, item.title),
+        )
+        self.bindings[listItem] = (appButton, handlerId)
+
+    def onUnbind(self, factory, listItem: Gtk.ListItem) -> None:
+        appButton, handlerId = self.bindings[listItem]
+        listItem.get_item().disconnect(handlerId)
+        # Also drops a title still queued for this row by notify::title
+        appButton.unbind()
+        self.bindings[listItem] = (appButton, 0)
+
+    def onTeardown(self, factory, listItem: Gtk.ListItem) -> None:
+        del self.bindings[listItem]
+
+    def setActiveWorkspace(self, workspaceId: int) -> None:
+        if workspaceId == self.activeWorkspace:
+            return
+        self.activeWorkspace = workspaceId
+        if self.show == "current":
+            self.filter.changed(Gtk.FilterChange.DIFFERENT)
+
+    def addWindow(self, entry: WindowEntry) -> None:
+        self.indexWindow(entry)
+        item = WindowItem(
+            address=entry.address,
+            title=entry.title,
+            wmClass=entry.wmClass,
+            workspaceId=entry.workspaceId,
+        )
+        self.items[entry.address] = item
+        self.store.append(item)
+
+    def removeWindow(self, address: str) -> None:
+        self.unindexWindow(address)
+        found, position = self.store.find(self.items.pop(address))
+        if found:
+            self.store.remove(position)
+
+    def updateTitle(self, entry: WindowEntry) -> None:
+        # Bound buttons follow through notify::title
+        self.items[entry.address].title = entry.title
@@ -1,3 +1,5 @@
+import os
+import sys
 from ctypes import CDLL
 
 CDLL("libgtk4-layer-shell.so")
@@ -11,24 +13,55 @@ from gi.repository import Gtk4LayerShell as LayerShell  # pyright: ignore #noqa
 from gi.repository import GLib  # pyright: ignore # noqa
 
 from hyprbar.config import HyprbarConfig  # pyright: ignore # noqa
-from hyprbar.constants import STYLE_FILE, ANCHOR  # pyright: ignore # noqa
-from hyprbar.widgets import populateBox  # pyright: ignore # noqa
+from hyprbar.constants import CONFIG_FILE, STYLE_FILE  # pyright: ignore # noqa
+from hyprbar.configcache import configFingerprint  # pyright: ignore # noqa
+from hyprbar.controlsocket import controlServer  # pyright: ignore # noqa
+from hyprbar.stateexport import stateExport  # pyright: ignore # noqa
+from hyprbar.widgets import buildBarContent, loadStyle  # pyright: ignore # noqa
 from hyprbar.util import printLog  # pyright: ignore # noqa
+from hyprbar.snapshot import snapshot  # pyright: ignore # noqa
+from hyprbar.render import renderBatcher  # pyright: ignore # noqa
+from hyprbar.memdiag import memoryDiagnostics  # pyright: ignore # noqa
+from hyprbar.workers import workerPool  # pyright: ignore # noqa
+from hyprbar.aio import installEventLoop  # pyright: ignore # noqa
 
 
+ANCHOR = {
+    "top": LayerShell.Edge.TOP,
+    "bottom": LayerShell.Edge.BOTTOM,
+}
+
 hyprBarConfig = None
+configKey = None  # fingerprint of the config file the bar was built from
 components = []
 index = 0
 
 
-def createGtkBox(h_align: Gtk.Align) -> Gtk.Box:
-    retValue = Gtk.Box(
-        orientation=Gtk.Orientation.HORIZONTAL,
-        spacing=hyprBarConfig.window.left_container.hor_spacing,  # pyright: ignore # noqa
-    )
-    retValue.set_halign(h_align)
-    retValue.set_valign(Gtk.Align.CENTER)
-    return retValue
+def reloadBar(cssProvider: Gtk.CssProvider) -> None:
+    # Styles are reloaded in place
+    printLog("Reloading style from " + STYLE_FILE)
+    cssProvider.load_from_path(f"{STYLE_FILE}")
+    try:
+        changed = configFingerprint(CONFIG_FILE) != configKey
+    except OSError as e:
+        printLog(f"Cannot read {CONFIG_FILE}: {e}")
+        return
+    if changed:
+        # Components own timers and subscriptions, restarting is the clean
+        # way to rebuild them; the warm-start snapshot keeps it fast
+        printLog("Configuration changed, restarting hyprbar")
+        snapshot.flush()
+        controlServer.stop()
+        stateExport.stop()
+        workerPool.stop()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+def onStartup(app):
+    # Only emitted in the primary instance: a second launch just activates
+    # it and exits, and must not touch the sockets of the running bar
+    controlServer.start()
+    stateExport.start()
 
 
 def onActivate(app):
@@ -36,15 +69,15 @@ def onActivate(app):
     window = Gtk.Window(application=app)
     printLog("window created, setting properties for hyprbar window instance: ")
     window.set_name("hyprbar")
+    # Component updates are applied once per frame of this window
+    renderBatcher.attach(window)
     # Carregar CSS
-    printLog("Setting up style with CSS path: " + STYLE_FILE)
-    css_provider = Gtk.CssProvider()
-    css_provider.load_from_path(f"{STYLE_FILE}")
-    display = window.get_display()
-    Gtk.StyleContext.add_provider_for_display(
-        display, css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+    css_provider = loadStyle(window.get_display())
+
+    controlServer.registerAction(
+        "toggle", lambda: window.set_visible(not window.get_visible())
     )
-    printLog("CSS provider loaded")
+    controlServer.registerAction("reload", lambda: reloadBar(css_provider))
 
     printLog(
         f"bar size to '{hyprBarConfig.window.width}x{hyprBarConfig.window.height}'"  # pyright: ignore # noqa
@@ -66,51 +99,50 @@ def onActivate(app):
     )
     LayerShell.set_margin(window, LayerShell.Edge.TOP, hyprBarConfig.window.margin_top)  # pyright: ignore # noqa
 
-    mainBox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-    # faz com que todos os widgets filhos ocupem o mesmo espaço
-    # horizontalmente
-    printLog("Setting homogeneous to True for mainBox.")
-    mainBox.set_homogeneous(True)
-
-    window.set_child(mainBox)
+    window.set_child(buildBarContent(hyprBarConfig))  # pyright: ignore # noqa
 
     # Enable Exclusive Zone
     LayerShell.auto_exclusive_zone_enable(window)
 
-    printLog("Creating leftGtkBox for window...")
-    leftGtkBox = createGtkBox(Gtk.Align.START)
-
-    printLog("Creating centerGtkBox for window...")
-    centerGtkBox = createGtkBox(Gtk.Align.CENTER)
-
-    printLog("Creating rightGtkBox for window...")
-    rightGtkBox = createGtkBox(Gtk.Align.END)
-
-    mainBox.append(leftGtkBox)
-    mainBox.append(centerGtkBox)
-    mainBox.append(rightGtkBox)
-
-    printLog("Populate boxes with widgets.")
-    populateBox(leftGtkBox, hyprBarConfig.window.left_container.components)  # pyright: ignore # noqa
-    populateBox(centerGtkBox, hyprBarConfig.window.center_container.components)  # pyright: ignore # noqa
-    populateBox(rightGtkBox, hyprBarConfig.window.right_container.components)  # pyright: ignore # noqa
-
     printLog("Show the window with all widgets.")
     window.present()
 
 
-def runHyprBar(config: HyprbarConfig) -> None:
+def runHyprBar(config: HyprbarConfig, memoryReport: int = 0) -> None:
     """
     HyprBar is a GTK4 Layer Shell bar for Hyprland.
+
+    Args:
+        config (HyprbarConfig): The validated configuration.
+        memoryReport (int): Seconds between memory reports, 0 to disable them.
     """
     printLog("Instantiate the config Class ")
-    global hyprBarConfig
+    global hyprBarConfig, configKey
     hyprBarConfig = config
+    configKey = configFingerprint(CONFIG_FILE)
+
+    printLog("Load the warm-start snapshot")
+    snapshot.load()
+
+    if memoryReport:
+        memoryDiagnostics.start(memoryReport)
+
+    if config.workers:
+        workerPool.start(config.workers)
+
+    # Component coroutines run on the GLib main loop started by app.run()
+    installEventLoop()
 
     # Create the application
     printLog("Create a new Application instance with 'com.antrax.HyprBar' as an id")
     app = Gtk.Application(application_id="com.antrax.HyprBar")
     printLog("Connect to the activate signal of the application")
+    app.connect("startup", onStartup)
     app.connect("activate", onActivate)
     printLog("Start the GTK main loop with 'app.run()'")
     app.run(None)
+    controlServer.stop()
+    stateExport.stop()
+    workerPool.stop()
+    printLog("Saving the warm-start snapshot")
+    snapshot.flush()
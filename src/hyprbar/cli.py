@@ -1,23 +1,25 @@
 # Command Line Interface for hyprbar
 # Using click for command line interface
 import sys
+import json
+import time
+import socket
 import click
 from rich.table import Table
-from hyprbar.bar import runHyprBar  # pyright: ignore # noqa
-from hyprbar.config import HyprbarConfig  # pyright: ignore # noqa
-from hyprbar.util import cl, showError, fileExists
-from hyprbar.constants import APP_NAME, APP_VERSION, CONFIG_FILE, STYLE_FILE
+from hyprbar.configcache import loadConfig, benchmarkConfig, validateConfig
+from hyprbar.util import cl, showError, showStatus, fileExists
+from hyprbar.constants import (
+    APP_NAME,
+    APP_VERSION,
+    CONFIG_FILE,
+    STYLE_FILE,
+    CONTROL_SOCKET,
+    STATE_SOCKET,
+    STATE_TOPICS,
+)
 
 
-@click.command()
-def cli() -> None:
-    """
-    Command line interface for hyprbar.
-    """
-    cl.print(
-        f"[bold green]{APP_NAME}[/bold green] [bold blue]{APP_VERSION}[/bold blue]"
-    )
-
+def showConfigStatus(configFileOk: bool, styleFileOk: bool) -> None:
     cl.print("Configuration Status...")
     # Criação da tabela
     table = Table(show_header=True, header_style="bold cyan")
@@ -25,8 +27,6 @@ def cli() -> None:
     table.add_column("Path")
     table.add_column("Status", justify="center")
 
-    configFileOk = fileExists(file=CONFIG_FILE)
-    styleFileOk = fileExists(file=STYLE_FILE)
     table.add_row(
         "Config",
         f"[yellow]{CONFIG_FILE}[/yellow]",
@@ -40,17 +40,296 @@ def cli() -> None:
 
     cl.print(table)
 
+
+def checkConfig() -> None:
+    """
+    Validates the configuration without starting GTK and reports how much
+    time the validated-config cache saves.
+    """
+    try:
+        validateConfig(CONFIG_FILE)
+    except Exception as e:
+        showError(f"Invalid configuration: {e}")
+        sys.exit(1)
+
+    validationMs, cacheMs = benchmarkConfig(CONFIG_FILE)
+    showStatus("Config", "[bold green]valid[/bold green]")
+    showStatus("Validation", f"{validationMs:.2f} ms")
+    showStatus("Cache load", f"{cacheMs:.2f} ms")
+    showStatus("Saved", f"{validationMs - cacheMs:.2f} ms per start")
+
+
+def soakTest(cycles: int) -> None:
+    """
+    Runs the window and tray churn soak test and exits with an error if
+    memory keeps growing.
+    """
+    # GTK is only needed for this mode
+    from hyprbar.memdiag import runSoak  # pyright: ignore # noqa
+
+    bounded, lines = runSoak(cycles)
+    for line in lines:
+        showStatus("Soak", line)
+    if not bounded:
+        showError("Memory kept growing during the soak test")
+        sys.exit(1)
+    showStatus("Soak", "[bold green]memory bounded[/bold green]")
+
+
+@click.group(invoke_without_command=True)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Validate the configuration and exit without starting the bar.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Validate the configuration again instead of using the cached copy.",
+)
+@click.option(
+    "--memory-report",
+    type=int,
+    default=0,
+    metavar="SECONDS",
+    help="Log tracemalloc growth and live GObject counts every SECONDS.",
+)
+@click.option(
+    "--soak",
+    type=int,
+    default=0,
+    metavar="CYCLES",
+    help="Run CYCLES synthetic window/tray add-remove cycles and check memory.",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context, check: bool, no_cache: bool, memory_report: int, soak: int
+) -> None:
+    """
+    Command line interface for hyprbar.
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+
+    cl.print(
+        f"[bold green]{APP_NAME}[/bold green] [bold blue]{APP_VERSION}[/bold blue]"
+    )
+
+    configFileOk = fileExists(file=CONFIG_FILE)
+    styleFileOk = fileExists(file=STYLE_FILE)
+    if check or not (configFileOk and styleFileOk):
+        showConfigStatus(configFileOk, styleFileOk)
+
     if not configFileOk:
         showError(f"{CONFIG_FILE} does not exist. Exiting...")
         sys.exit(1)
 
+    if check:
+        checkConfig()
+        return
+
+    if soak:
+        soakTest(soak)
+        return
+
     if not styleFileOk:
         showError("Style file does not exists... Exiting...")
         sys.exit(1)
 
     try:
-        hyprbarConfig = HyprbarConfig()  # pyright: ignore # noqa
+        start = time.perf_counter()
+        if no_cache:
+            hyprbarConfig, cacheHit = validateConfig(CONFIG_FILE), False
+        else:
+            hyprbarConfig, cacheHit = loadConfig(CONFIG_FILE)
+        showStatus(
+            "Config",
+            f"loaded in {(time.perf_counter() - start) * 1000:.2f} ms "
+            f"({'cached' if cacheHit else 'validated'})",
+        )
+        # GTK is only loaded once the config is known to be valid
+        from hyprbar.bar import runHyprBar  # pyright: ignore # noqa
+
         cl.print("Starting GUI...")
-        runHyprBar(config=hyprbarConfig)
+        runHyprBar(config=hyprbarConfig, memoryReport=memory_report)
     except Exception as e:
         showError(f"Error: {e}")
+
+
+def sendControlMessage(request: dict) -> dict:
+    """
+    Sends one request to the control socket of the running bar.
+
+    Args:
+        request (dict): The request, see hyprbar.controlsocket.
+
+    Returns:
+        dict: The reply of the bar.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(2)
+        sock.connect(CONTROL_SOCKET)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            data = sock.recv(4096)
+            if not data:
+                break
+            reply += data
+    return json.loads(reply)
+
+
+@cli.command()
+@click.argument(
+    "command",
+    type=click.Choice(
+        ["text", "class", "visible", "reload", "toggle", "search", "list"]
+    ),
+)
+@click.argument("target", required=False)
+@click.argument("value", required=False)
+@click.option(
+    "--remove",
+    is_flag=True,
+    help="With 'class', remove the CSS class instead of adding it.",
+)
+def msg(command: str, target: str, value: str, remove: bool) -> None:
+    """
+    Pushes a value to a running bar.
+
+    \b
+    hyprbar msg text vpn "wg0 up"
+    hyprbar msg class vpn warning [--remove]
+    hyprbar msg visible vpn false
+    hyprbar msg reload | toggle | search | list
+    """
+    request: dict = {"cmd": command}
+    if command in ("text", "class", "visible"):
+        if target is None or value is None:
+            showError(f"'{command}' needs a target and a value")
+            sys.exit(2)
+        request["target"] = target
+        request["value"] = value
+        if command == "class":
+            request["enabled"] = not remove
+        elif command == "visible":
+            request["value"] = value.lower() in ("1", "true", "yes", "on")
+
+    try:
+        reply = sendControlMessage(request)
+    except (OSError, ValueError) as e:
+        showError(f"Cannot reach hyprbar at {CONTROL_SOCKET}: {e}")
+        sys.exit(1)
+    if not reply.get("ok"):
+        showError(reply.get("error", "request failed"))
+        sys.exit(1)
+    if "targets" in reply:
+        for name in reply["targets"]:
+            cl.print(name)
+
+
+@cli.command()
+@click.argument("topics", nargs=-1, type=click.Choice(STATE_TOPICS))
+@click.option(
+    "--merged",
+    is_flag=True,
+    help="Print the whole value of a topic on every change instead of diffs.",
+)
+def watch(topics: tuple, merged: bool) -> None:
+    """
+    Streams the state of a running bar as JSON lines.
+
+    \b
+    hyprbar watch                      # every topic
+    hyprbar watch workspaces --merged  # {"topic": ..., "seq": ..., "data": ...}
+    """
+    # The protocol lives with the server, which needs GLib
+    from hyprbar.stateexport import (  # pyright: ignore # noqa
+        STREAM_VERSION,
+        applyMessage,
+        subscribe,
+    )
+
+    state: dict = {}
+    try:
+        for message in subscribe(topics, STATE_SOCKET):
+            if message.get("v") != STREAM_VERSION:
+                showError(f"Unsupported state stream version {message.get('v')}")
+                sys.exit(1)
+            if message.get("type") == "error":
+                showError(message.get("error", "subscription refused"))
+                sys.exit(1)
+            if not merged:
+                line = json.dumps(message)
+            else:
+                topic = applyMessage(state, message)
+                if topic is None:
+                    continue
+                line = json.dumps(
+                    {"topic": topic, "seq": message["seq"], "data": state[topic]}
+                )
+            # Plain stdout: readers such as eww expect one line per update
+            print(line, flush=True)
+    except (BrokenPipeError, KeyboardInterrupt):
+        return  # The reader went away
+    except (OSError, ValueError) as e:
+        showError(f"Cannot reach hyprbar at {STATE_SOCKET}: {e}")
+        sys.exit(1)
+    showError("hyprbar closed the state stream")
+    sys.exit(1)
+
+
+@cli.command()
+@click.option(
+    "--output",
+    default="hyprbar.png",
+    show_default=True,
+    help="PNG file the bar is rendered to.",
+)
+@click.option(
+    "--frames",
+    default=100,
+    show_default=True,
+    help="Frames every widget is profiled over.",
+)
+@click.option(
+    "--top",
+    default=20,
+    show_default=True,
+    help="Most expensive widgets listed, 0 lists the whole tree.",
+)
+def render(output: str, frames: int, top: int) -> None:
+    """
+    Renders the bar offscreen and reports the render cost of every widget.
+    """
+    try:
+        hyprbarConfig, _ = loadConfig(CONFIG_FILE)
+    except Exception as e:
+        showError(f"Invalid configuration: {e}")
+        sys.exit(1)
+    # GTK is only loaded once the config is known to be valid
+    from hyprbar.offscreen import renderOffscreen  # pyright: ignore # noqa
+
+    costs = renderOffscreen(hyprbarConfig, output, frames)
+    if top:
+        costs = sorted(costs, key=lambda cost: cost.total, reverse=True)[:top]
+
+    table = Table(show_header=True, header_style="bold cyan")
+    table.add_column("Widget")
+    for column in ("measure", "allocate", "snapshot", "render", "total"):
+        table.add_column(f"{column} µs", justify="right")
+    for cost in costs:
+        table.add_row(
+            ("" if top else "  " * cost.depth) + cost.description,
+            *(
+                f"{value * 1e6:.1f}"
+                for value in (
+                    cost.measure,
+                    cost.allocate,
+                    cost.snapshot,
+                    cost.render,
+                    cost.total,
+                )
+            ),
+        )
+    cl.print(table)
@@ -20,6 +20,14 @@ class TrayIconManagerConfig(ComponentConfig):
 class AppSwitchConfig(ComponentConfig):
     type: Literal["appswitch"]  # pyright: ignore # noqa
     workspaces: int = 1  # number of workspaces to display windows
+    # which windows to show: every workspace, the active one or the listed ones
+    show: Literal["all", "current", "listed"] = "all"
+    workspace_ids: List[int] = []  # workspaces for "listed" (default 1..workspaces)
+    group: bool = False  # one button per application with a window count
+    pool_size: int = 16  # buttons of closed windows kept for reuse
+    # box: a button per window; list: virtualized list view for many windows
+    mode: Literal["box", "list"] = "box"
+    max_width: int = 800  # width in pixels before the list mode scrolls
     css_id: Optional[str] = None  # css id for the component
 
 
@@ -27,14 +35,19 @@ class KernelConfig(ComponentConfig):
     type: Literal["kernel"]  # pyright: ignore # noqa
     icon: Optional[str] = None  # icon  nerd font or emoji
     command: Optional[str] = "uname -r"  # command to run
+    provider: Optional[str] = None  # built-in provider (kernel, hostname, uptime...)
     css_id: Optional[str] = None  # css id for the component
     refresh: int = 60  # refresh time in seconds
 
 
 class WorkspacesConfig(ComponentConfig):
     type: Literal["workspaces"]  # pyright: ignore # noqa
-    ids: List[str]  # list with workspaces identifiers
+    ids: List[str]  # labels of workspaces 1..n, always shown
     css_id: Optional[str] = None  # css id for the component
+    show_special: bool = False  # show special (scratchpad) workspaces
+    monitor: Optional[str] = None  # only workspaces of this monitor (e.g. DP-1)
+    scroll: bool = True  # scroll over the component to cycle workspaces
+    scroll_interval: int = 150  # minimum milliseconds between scroll dispatches
 
 
 class ClockConfig(ComponentConfig):
@@ -45,8 +58,84 @@ class ClockConfig(ComponentConfig):
     refresh: Optional[int] = 1
 
 
+class CustomConfig(ComponentConfig):
+    type: Literal["custom"]  # pyright: ignore # noqa
+    name: str  # target name used by `hyprbar msg`
+    icon: Optional[str] = None  # nerd font or emoji
+    text: str = ""  # shown until a script pushes a value
+    css_id: Optional[str] = None  # css id for the component
+
+
+class NotificationsConfig(ComponentConfig):
+    type: Literal["notifications"]  # pyright: ignore # noqa
+    icon: Optional[str] = None  # nerd font or emoji
+    css_id: Optional[str] = None  # css id for the component
+    history: int = 100  # notifications kept, least recently updated dropped
+    rate: float = 2.0  # notifications per second allowed per application
+    burst: int = 10  # notifications an application may send at once
+    timeout: int = 5000  # popup timeout in ms when the sender does not set one
+    max_popups: int = 3  # popups shown at once, the rest wait in a queue
+
+
+class ActiveWindowConfig(ComponentConfig):
+    type: Literal["activewindow"]  # pyright: ignore # noqa
+    icon: Optional[str] = None  # nerd font or emoji
+    css_id: Optional[str] = None  # css id for the component
+    format: str = "{title}"  # also {class}
+    max_chars: int = 60  # width of the title, longer titles are ellipsized
+
+
+class WindowSearchConfig(ComponentConfig):
+    type: Literal["windowsearch"]  # pyright: ignore # noqa
+    icon: Optional[str] = None  # bar button opening the popup, none by default
+    css_id: Optional[str] = None  # css id for the button
+    max_results: int = 100  # matches listed in the popup
+    width: int = 640  # popup width in pixels
+    height: int = 360  # height of the result list in pixels
+
+
+class TemperatureConfig(ComponentConfig):
+    type: Literal["temperature"]  # pyright: ignore # noqa
+    icon: Optional[str] = None  # nerd font or emoji
+    css_id: Optional[str] = None  # css id for the component
+    sensor: Optional[str] = None  # hwmon chip name (coretemp, k10temp, nvme...)
+    label: Optional[str] = None  # input label of the chip (e.g. "Package id 0")
+    format: str = "{temp:.0f}°C"
+    critical: int = 85  # degrees from which the label gets the "critical" class
+    refresh: int = 5  # refresh time in seconds
+
+
+class BacklightConfig(ComponentConfig):
+    type: Literal["backlight"]  # pyright: ignore # noqa
+    icon: Optional[str] = None  # nerd font or emoji
+    css_id: Optional[str] = None  # css id for the component
+    device: Optional[str] = None  # /sys/class/backlight device, default the first
+    format: str = "{percent:.0f}%"
+    refresh: int = 10  # backstop polling in seconds, file changes show at once
+
+
+class DiskConfig(ComponentConfig):
+    type: Literal["disk"]  # pyright: ignore # noqa
+    icon: Optional[str] = None  # nerd font or emoji
+    css_id: Optional[str] = None  # css id for the component
+    path: str = "/"  # any path on the filesystem
+    format: str = "{percent:.0f}%"  # also {used}, {free} and {total}
+    refresh: int = 30  # refresh time in seconds, at least 5
+
+
 ComponentUnion = Union[
-    TrayIconManagerConfig, AppSwitchConfig, KernelConfig, WorkspacesConfig, ClockConfig
+    TrayIconManagerConfig,
+    AppSwitchConfig,
+    KernelConfig,
+    WorkspacesConfig,
+    ClockConfig,
+    CustomConfig,
+    NotificationsConfig,
+    ActiveWindowConfig,
+    WindowSearchConfig,
+    TemperatureConfig,
+    BacklightConfig,
+    DiskConfig,
 ]
 
 
@@ -81,7 +170,10 @@ class HyprbarConfig(BaseConfig):
 
     Attributes:
         window (WindowConfig): Window-specific configuration settings
+        workers (int): Worker processes for commands and providers, 0 runs
+            them in the bar process
     """
 
     CONFIG_SOURCES = FileSource(CONFIG_FILE)
     window: WindowConfig
+    workers: int = 0
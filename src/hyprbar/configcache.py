@@ -0,0 +1,138 @@
+# Validated Config Cache
+#
+# Parsing config.yaml and validating the discriminated component union is the
+# most expensive step before anything is drawn. The validated HyprbarConfig is
+# pickled under $XDG_CACHE_HOME, keyed by the config file fingerprint (path,
+# mtime, size, content hash), the hyprbar version and the config schema, and
+# reused as long as none of them has changed.
+#
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+from typing import Optional, Tuple
+from confz import FileSource
+from hyprbar import config as configModule
+from hyprbar.config import HyprbarConfig
+from hyprbar.constants import APP_VERSION, CONFIG_FILE, CONFIG_CACHE_FILE
+from hyprbar.util import printLog
+
+CacheKey = Tuple[str, int, int, str, str, str]
+
+
+def schemaFingerprint() -> str:
+    # Cached objects must be rebuilt when the config classes change
+    with open(configModule.__file__, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+
+def configFingerprint(path: str) -> CacheKey:
+    """
+    Builds the cache key of a config file.
+
+    Args:
+        path (str): The config file path.
+
+    Returns:
+        CacheKey: (path, mtime_ns, size, blake2b digest, hyprbar version, schema)
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+        stat = os.fstat(f.fileno())
+    digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    return (
+        os.path.abspath(path),
+        stat.st_mtime_ns,
+        stat.st_size,
+        digest,
+        APP_VERSION,
+        schemaFingerprint(),
+    )
+
+
+def validateConfig(path: str = CONFIG_FILE) -> HyprbarConfig:
+    # Parse and validate without going through the confz singleton
+    return HyprbarConfig(config_sources=FileSource(path))  # pyright: ignore # noqa
+
+
+def readCachedConfig(
+    key: CacheKey, cacheFile: str = CONFIG_CACHE_FILE
+) -> Optional[HyprbarConfig]:
+    try:
+        with open(cacheFile, "rb") as f:
+            cachedKey, config = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        printLog(f"Ignoring unreadable config cache {cacheFile}: {e}")
+        return None
+    if cachedKey != key or not isinstance(config, HyprbarConfig):
+        return None
+    return config
+
+
+def writeCachedConfig(
+    key: CacheKey, config: HyprbarConfig, cacheFile: str = CONFIG_CACHE_FILE
+) -> None:
+    try:
+        os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(
+            dir=os.path.dirname(cacheFile), prefix=".config-"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((key, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, cacheFile)
+        except BaseException:
+            os.unlink(tmpPath)
+            raise
+    except OSError as e:
+        printLog(f"Error writing config cache {cacheFile}: {e}")
+
+
+def loadConfig(
+    path: str = CONFIG_FILE, cacheFile: str = CONFIG_CACHE_FILE
+) -> Tuple[HyprbarConfig, bool]:
+    """
+    Loads the validated config, from the cache when the file is unchanged.
+
+    Args:
+        path (str): The config file path.
+        cacheFile (str): Where the validated config is cached.
+
+    Returns:
+        Tuple[HyprbarConfig, bool]: The config and whether it came from the cache.
+    """
+    key = configFingerprint(path)
+    config = readCachedConfig(key, cacheFile)
+    cacheHit = config is not None
+    if config is None:
+        config = validateConfig(path)
+        writeCachedConfig(key, config, cacheFile)
+    # Make HyprbarConfig() return this instance everywhere
+    HyprbarConfig.confz_instance = config
+    return config, cacheHit
+
+
+def benchmarkConfig(
+    path: str = CONFIG_FILE, cacheFile: str = CONFIG_CACHE_FILE, rounds: int = 20
+) -> Tuple[float, float]:
+    """
+    Measures cold validation against a cache hit.
+
+    Returns:
+        Tuple[float, float]: Average milliseconds for validation and for a cache load.
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        config = validateConfig(path)
+    validationMs = (time.perf_counter() - start) * 1000 / rounds
+
+    key = configFingerprint(path)
+    writeCachedConfig(key, config, cacheFile)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        readCachedConfig(configFingerprint(path), cacheFile)
+    cacheMs = (time.perf_counter() - start) * 1000 / rounds
+    return validationMs, cacheMs
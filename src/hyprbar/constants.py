@@ -1,5 +1,4 @@
 import os
-from gi.repository import Gtk4LayerShell as LayerShell  # pyright: ignore #noqa
 
 APP_VERSION = "0.0.3"
 APP_NAME = "hyprbar"
@@ -10,8 +9,15 @@ CONFIG_DIR = os.path.join(os.path.expanduser(path="~"), ".config", f"{APP_NAME}"
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.yaml")
 STYLE_FILE = os.path.join(CONFIG_DIR, "styles.css")
 
-
-ANCHOR = {
-    "top": LayerShell.Edge.TOP,
-    "bottom": LayerShell.Edge.BOTTOM,
-}
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    f"{APP_NAME}",
+)
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, "snapshot.json")
+CONFIG_CACHE_FILE = os.path.join(CACHE_DIR, "config.cache")
+DESKTOP_INDEX_FILE = os.path.join(CACHE_DIR, "desktop-index.json")
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or f"/tmp/{APP_NAME}-{os.getuid()}"
+CONTROL_SOCKET = os.path.join(RUNTIME_DIR, f"{APP_NAME}.sock")
+STATE_SOCKET = os.path.join(RUNTIME_DIR, f"{APP_NAME}-state.sock")
+# Topics of the state stream, see hyprbar.stateexport
+STATE_TOPICS = ("workspaces", "windows", "activewindow", "tray", "metrics")
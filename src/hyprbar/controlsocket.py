@@ -0,0 +1,169 @@
+# Control Socket
+#
+# Unix socket through which scripts push data into the bar instead of being
+# polled by it (`hyprbar msg ...`). Every request is one JSON object per
+# line, answered by one JSON line:
+#
+#   {"cmd": "text", "target": "vpn", "value": "up"}
+#   {"cmd": "class", "target": "vpn", "value": "warning", "enabled": true}
+#   {"cmd": "visible", "target": "vpn", "value": false}
+#   {"cmd": "reload"} / {"cmd": "toggle"} / {"cmd": "search"}
+#
+# Targets are the named "custom" components. Widget mutations go through the
+# render batcher, so a burst of writes costs one update per frame.
+#
+import json
+import socket
+from typing import Any, Callable, Dict, Optional, Tuple
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.constants import CONTROL_SOCKET
+from hyprbar.render import renderBatcher
+from hyprbar.unixsocket import UnixListener
+from hyprbar.util import printLog
+
+MAX_LINE = 65536  # longest request accepted from a client
+
+
+class ControlServer:
+    """
+    Listens on the control socket and applies requests to named targets.
+
+    Attributes:
+        path (str): Socket path
+        targets (Dict[str, Tuple[Gtk.Widget, Gtk.Label]]): name -> (widget, label)
+        actions (Dict[str, Callable[[], None]]): Commands without a target
+    """
+
+    def __init__(self, path: str = CONTROL_SOCKET) -> None:
+        self.path = path
+        self.targets: Dict[str, Tuple[Gtk.Widget, Gtk.Label]] = {}
+        self.actions: Dict[str, Callable[[], None]] = {}
+        self._listener = UnixListener(path)
+        self._acceptSourceId: Optional[int] = None
+        self._buffers: Dict[int, Tuple[socket.socket, bytes]] = {}
+
+    def registerTarget(self, name: str, widget: Gtk.Widget, label: Gtk.Label) -> None:
+        if name in self.targets:
+            printLog(f"Control target '{name}' is defined twice, keeping the last one")
+        self.targets[name] = (widget, label)
+
+    def registerAction(self, name: str, action: Callable[[], None]) -> None:
+        self.actions[name] = action
+
+    def start(self) -> None:
+        # Called by the primary instance only, see bar.onStartup
+        if self._acceptSourceId is not None or not self._listener.bind():
+            return
+        self._acceptSourceId = GLib.io_add_watch(
+            self._listener.sock.fileno(),  # pyright: ignore # noqa
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN,
+            self._onAccept,
+        )
+        printLog(f"Control socket listening at {self.path}")
+
+    def stop(self) -> None:
+        # Only removes the socket if this process bound it
+        if self._acceptSourceId is not None:
+            GLib.source_remove(self._acceptSourceId)
+            self._acceptSourceId = None
+        self._listener.close()
+
+    def _onAccept(self, fd: int, condition: GLib.IOCondition) -> bool:
+        if self._listener.sock is None:
+            return False
+        try:
+            client, _ = self._listener.sock.accept()
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            printLog(f"Error accepting control connection: {e}")
+            return True
+        client.setblocking(False)
+        self._buffers[client.fileno()] = (client, b"")
+        GLib.io_add_watch(
+            client.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+            self._onClientReadable,
+        )
+        return True
+
+    def _onClientReadable(self, fd: int, condition: GLib.IOCondition) -> bool:
+        client, buffer = self._buffers[fd]
+        try:
+            data = client.recv(MAX_LINE)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+        if not data:
+            del self._buffers[fd]
+            client.close()
+            return False
+
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE:
+            printLog("Control request too long, closing the connection")
+            del self._buffers[fd]
+            client.close()
+            return False
+        self._buffers[fd] = (client, buffer)
+        replies = [self._handleLine(line) for line in lines if line.strip()]
+        try:
+            for reply in replies:
+                client.sendall(json.dumps(reply).encode() + b"\n")
+        except OSError:
+            pass
+        return True
+
+    def _handleLine(self, line: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"ok": False, "error": f"invalid request: {e}"}
+        return self.handle(request)
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Applies one request.
+
+        Args:
+            request (Dict[str, Any]): The decoded JSON request.
+
+        Returns:
+            Dict[str, Any]: {"ok": True} or {"ok": False, "error": reason}
+        """
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "invalid request: not an object"}
+        command = request.get("cmd")
+        if not isinstance(command, str):
+            return {"ok": False, "error": "invalid request: 'cmd' is not a string"}
+        if command in self.actions:
+            self.actions[command]()
+            return {"ok": True}
+        if command == "list":
+            return {"ok": True, "targets": sorted(self.targets)}
+
+        name = request.get("target", "")
+        if not isinstance(name, str):
+            return {"ok": False, "error": "invalid request: 'target' is not a string"}
+        target = self.targets.get(name)
+        if target is None:
+            return {"ok": False, "error": f"unknown target '{request.get('target')}'"}
+        widget, label = target
+        value = request.get("value")
+        if command == "text":
+            renderBatcher.setText(label, str(value))
+        elif command == "class":
+            renderBatcher.setCssClass(widget, str(value), request.get("enabled", True))
+        elif command == "visible":
+            renderBatcher.setVisible(widget, bool(value))
+        else:
+            return {"ok": False, "error": f"unknown command '{command}'"}
+        return {"ok": True}
+
+
+controlServer = ControlServer()
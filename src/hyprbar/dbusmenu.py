@@ -0,0 +1,326 @@
+# DBusMenu Client
+#
+# Native client for the com.canonical.dbusmenu interface exported by tray
+# applications (nm-applet, Steam, Discord...). The menu layout is fetched
+# lazily, one level at a time: a submenu is an empty placeholder until it is
+# opened, which sends AboutToShow and fetches its items. Layouts are cached
+# per revision and kept up to date from the LayoutUpdated and
+# ItemsPropertiesUpdated signals, re-rendering only the affected submenus.
+# The layout is rendered into a Gio.Menu shown by a Gtk.PopoverMenu; every
+# D-Bus call is asynchronous so opening a menu never blocks the bar.
+#
+from typing import Any, Dict, List, Optional
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Gdk  # pyright: ignore #noqa
+from gi.repository import Gio  # pyright: ignore #noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.util import printLog
+
+DBUSMENU_INTERFACE = "com.canonical.dbusmenu"
+ACTION_PREFIX = "dbusmenu"
+CALL_TIMEOUT_MS = 5000
+ROOT_ID = 0
+
+
+class MenuNode:
+    """
+    One dbusmenu item and the ids of its children, if they were fetched.
+    """
+
+    __slots__ = ("id", "properties", "children", "loaded")
+
+    def __init__(self, id: int, properties: Dict[str, Any]) -> None:
+        self.id = id
+        self.properties = properties
+        self.children: List[int] = []
+        self.loaded = False  # children fetched for the current revision
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.properties.get(name, default)
+
+    @property
+    def hasSubmenu(self) -> bool:
+        return self.get("children-display") == "submenu" or bool(self.children)
+
+
+class DBusMenuClient:
+    """
+    Caches the layout of one remote dbusmenu and renders it on demand.
+
+    Attributes:
+        busName (str): D-Bus name of the application exporting the menu
+        objectPath (str): Object path of the menu
+        revision (int): Last layout revision received from the application
+    """
+
+    def __init__(
+        self, connection: Gio.DBusConnection, busName: str, objectPath: str
+    ) -> None:
+        self.connection = connection
+        self.busName = busName
+        self.objectPath = objectPath
+        self.revision = 0
+        self.nodes: Dict[int, MenuNode] = {ROOT_ID: MenuNode(ROOT_ID, {})}
+        self.actionGroup = Gio.SimpleActionGroup()
+        self._parents: Dict[int, int] = {}  # item id -> parent id
+        self._menus: Dict[int, Gio.Menu] = {}  # parent id -> rendered Gio.Menu
+        self._fetching: set = set()  # parent ids with a GetLayout in flight
+        self._open: set = set()  # submenu ids currently shown
+        self._popover: Optional[Gtk.PopoverMenu] = None
+        self._subscriptionId = connection.signal_subscribe(
+            busName,
+            DBUSMENU_INTERFACE,
+            None,
+            objectPath,
+            None,
+            Gio.DBusSignalFlags.NONE,
+            self._onSignal,
+        )
+
+    def popup(self, widget: Gtk.Widget, x: int, y: int) -> None:
+        if self._popover is None:
+            self._popover = Gtk.PopoverMenu.new_from_model(self._menuFor(ROOT_ID))
+            self._popover.set_has_arrow(False)
+            self._popover.set_parent(widget)
+            widget.insert_action_group(ACTION_PREFIX, self.actionGroup)
+
+        rect = Gdk.Rectangle()
+        rect.x, rect.y, rect.width, rect.height = x, y, 1, 1
+        self._popover.set_pointing_to(rect)
+        self._popover.popup()
+        # Show the cached layout now, let the application refresh it meanwhile
+        self._aboutToShow(ROOT_ID)
+
+    def destroy(self) -> None:
+        self.connection.signal_unsubscribe(self._subscriptionId)
+        if self._popover is not None:
+            self._popover.unparent()
+            self._popover = None
+        self._menus.clear()
+        self._open.clear()
+        self._parents.clear()
+        self.nodes.clear()
+
+    def _call(self, method, parameters, replyType, callback, userData) -> None:
+        self.connection.call(
+            self.busName,
+            self.objectPath,
+            DBUSMENU_INTERFACE,
+            method,
+            parameters,
+            replyType,
+            Gio.DBusCallFlags.NONE,
+            CALL_TIMEOUT_MS,
+            None,
+            callback,
+            userData,
+        )
+
+    def _aboutToShow(self, parentId: int) -> None:
+        # The application may update the submenu first, so the layout is
+        # fetched once it answered
+        self._call(
+            "AboutToShow",
+            GLib.Variant("(i)", (parentId,)),
+            GLib.VariantType("(b)"),
+            self._onAboutToShow,
+            parentId,
+        )
+
+    def _onAboutToShow(self, connection, result, parentId: int) -> None:
+        try:
+            needUpdate = connection.call_finish(result).unpack()[0]
+        except GLib.Error as e:
+            # Many applications do not implement AboutToShow, not an error
+            printLog(f"AboutToShow failed for {self.busName}: {e.message}")
+            needUpdate = False
+        node = self.nodes.get(parentId)
+        if needUpdate or (node is not None and not node.loaded):
+            self._fetchLayout(parentId)
+
+    def _fetchLayout(self, parentId: int) -> None:
+        if parentId in self._fetching:
+            return
+        self._fetching.add(parentId)
+        # Only one level is fetched, submenus are fetched when opened
+        self._call(
+            "GetLayout",
+            GLib.Variant("(iias)", (parentId, 1, [])),
+            GLib.VariantType("(u(ia{sv}av))"),
+            self._onLayout,
+            parentId,
+        )
+
+    def _onLayout(self, connection, result, parentId: int) -> None:
+        self._fetching.discard(parentId)
+        try:
+            revision, layout = connection.call_finish(result).unpack()
+        except GLib.Error as e:
+            printLog(f"GetLayout({parentId}) failed for {self.busName}: {e.message}")
+            return
+        self.revision = max(self.revision, revision)
+
+        itemId, properties, children = layout
+        parent = self._storeNode(itemId, properties)
+        parent.children = []
+        for childId, childProperties, _ in children:
+            self._storeNode(childId, childProperties)
+            parent.children.append(childId)
+            self._parents[childId] = itemId
+        parent.loaded = True
+        self._render(itemId)
+
+    def _storeNode(self, itemId: int, properties: Dict[str, Any]) -> MenuNode:
+        node = self.nodes.get(itemId)
+        if node is None:
+            node = MenuNode(itemId, dict(properties))
+            self.nodes[itemId] = node
+        else:
+            node.properties = dict(properties)
+        self._updateAction(node)
+        return node
+
+    def _onSignal(
+        self, connection, sender, objectPath, interface, signal, parameters
+    ) -> None:
+        if signal == "LayoutUpdated":
+            revision, parentId = parameters.unpack()
+            node = self.nodes.get(parentId)
+            if node is not None and node.loaded and revision <= self.revision:
+                return  # Already fetched at this revision
+            self.revision = max(self.revision, revision)
+            if node is not None:
+                node.loaded = False
+            # Only menus that are on screen are fetched again, the others
+            # are fetched when opened
+            if parentId in self._menus and (
+                parentId == ROOT_ID or parentId in self._open
+            ):
+                self._fetchLayout(parentId)
+        elif signal == "ItemsPropertiesUpdated":
+            updated, removed = parameters.unpack()
+            parents = set()
+            for itemId, properties in updated:
+                node = self.nodes.get(itemId)
+                if node is not None:
+                    node.properties.update(properties)
+                    self._updateAction(node)
+                    parents.add(self._parents.get(itemId))
+            for itemId, names in removed:
+                node = self.nodes.get(itemId)
+                if node is not None:
+                    for name in names:
+                        node.properties.pop(name, None)
+                    self._updateAction(node)
+                    parents.add(self._parents.get(itemId))
+            for parentId in parents:
+                if parentId is not None:
+                    self._render(parentId)
+        elif signal == "ItemActivationRequested":
+            if self._popover is not None and self._popover.get_parent():
+                self._popover.popup()
+
+    def _menuFor(self, parentId: int) -> Gio.Menu:
+        menu = self._menus.get(parentId)
+        if menu is None:
+            menu = Gio.Menu()
+            self._menus[parentId] = menu
+        return menu
+
+    def _render(self, parentId: int) -> None:
+        # Rebuilds a single (sub)menu; separators split it into sections
+        parent = self.nodes.get(parentId)
+        if parent is None:
+            return
+        menu = self._menuFor(parentId)
+        menu.remove_all()
+        section = Gio.Menu()
+        for childId in parent.children:
+            node = self.nodes.get(childId)
+            if node is None or not node.get("visible", True):
+                continue
+            if node.get("type") == "separator":
+                if section.get_n_items():
+                    menu.append_section(None, section)
+                section = Gio.Menu()
+                continue
+            section.append_item(self._menuItem(node))
+        if section.get_n_items():
+            menu.append_section(None, section)
+
+    def _menuItem(self, node: MenuNode) -> Gio.MenuItem:
+        item = Gio.MenuItem.new(node.get("label", ""), None)
+        iconName = node.get("icon-name")
+        if iconName:
+            item.set_icon(Gio.ThemedIcon.new(iconName))
+        if node.hasSubmenu:
+            # Empty until opened: GTK sets the submenu action to True then
+            item.set_submenu(self._menuFor(node.id))
+            item.set_attribute_value(
+                "submenu-action",
+                GLib.Variant("s", f"{ACTION_PREFIX}.{self._submenuAction(node.id)}"),
+            )
+        else:
+            item.set_action_and_target_value(
+                f"{ACTION_PREFIX}.{self._actionName(node.id)}", None
+            )
+        return item
+
+    def _actionName(self, itemId: int) -> str:
+        return f"item-{itemId}"
+
+    def _submenuAction(self, itemId: int) -> str:
+        name = f"submenu-{itemId}"
+        if self.actionGroup.lookup_action(name) is None:
+            action = Gio.SimpleAction.new_stateful(
+                name, None, GLib.Variant("b", False)
+            )
+            action.connect("change-state", self._onSubmenuShown, itemId)
+            self.actionGroup.add_action(action)
+        return name
+
+    def _onSubmenuShown(self, action, value, itemId: int) -> None:
+        action.set_state(value)
+        if not value.get_boolean():
+            self._open.discard(itemId)
+            return
+        self._open.add(itemId)
+        self._aboutToShow(itemId)
+
+    def _updateAction(self, node: MenuNode) -> None:
+        if node.id == ROOT_ID or node.get("type") == "separator":
+            return
+        name = self._actionName(node.id)
+        toggleType = node.get("toggle-type", "")
+        action = self.actionGroup.lookup_action(name)
+        isStateful = action is not None and action.get_state() is not None
+        if action is None or isStateful != bool(toggleType):
+            if toggleType:
+                action = Gio.SimpleAction.new_stateful(
+                    name, None, GLib.Variant("b", False)
+                )
+            else:
+                action = Gio.SimpleAction.new(name, None)
+            action.connect("activate", self._onActivate, node.id)
+            self.actionGroup.add_action(action)
+        if toggleType:
+            action.set_state(GLib.Variant("b", node.get("toggle-state", 0) == 1))
+        action.set_enabled(node.get("enabled", True))
+
+    def _onActivate(self, action, parameter, itemId: int) -> None:
+        self._call(
+            "Event",
+            GLib.Variant(
+                "(isvu)",
+                (itemId, "clicked", GLib.Variant("i", 0), Gdk.CURRENT_TIME),
+            ),
+            None,
+            self._onEventSent,
+            itemId,
+        )
+
+    def _onEventSent(self, connection, result, itemId: int) -> None:
+        try:
+            connection.call_finish(result)
+        except GLib.Error as e:
+            printLog(f"Event 'clicked' on item {itemId} of {self.busName} failed: {e}")
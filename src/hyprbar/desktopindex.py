@@ -0,0 +1,231 @@
+# Desktop Entry Index
+#
+# Resolves a Hyprland window class to an icon through the installed .desktop
+# files. Flatpak, Electron and XWayland apps often report a class that is not
+# an icon name, so the index maps StartupWMClass, desktop id and Exec basename
+# to the entry's Icon. The index is stored on disk, invalidated by directory
+# mtimes (at startup) or file monitors (while running), and every distinct
+# class is resolved once per session through an in-memory memo.
+#
+import os
+import json
+import shlex
+from typing import Dict, List, Optional
+from gi.repository import Gio  # pyright: ignore # noqa
+from hyprbar.constants import DESKTOP_INDEX_FILE
+from hyprbar.util import printLog
+
+INDEX_VERSION = 1
+
+# Exec wrappers that are skipped to reach the real program
+EXEC_WRAPPERS = {"env", "sh", "bash", "dbus-launch"}
+# Launchers whose arguments are app ids, already covered by the desktop id
+EXEC_LAUNCHERS = {"flatpak", "snap", "gtk-launch"}
+
+# Key priorities, a higher value wins over a lower one
+PRIORITY_EXEC = 1
+PRIORITY_DESKTOP_ID = 2
+PRIORITY_WM_CLASS = 3
+
+
+def applicationDirs() -> List[str]:
+    dataHome = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    dataDirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+    dirs = []
+    for base in [dataHome] + dataDirs.split(":"):
+        path = os.path.join(base, "applications")
+        if base and path not in dirs and os.path.isdir(path):
+            dirs.append(path)
+    return dirs
+
+
+def parseDesktopEntry(path: str) -> Dict[str, str]:
+    # Only the keys of the [Desktop Entry] group are needed
+    entry: Dict[str, str] = {}
+    inGroup = False
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    if inGroup:
+                        break
+                    inGroup = line == "[Desktop Entry]"
+                elif inGroup and "=" in line:
+                    key, value = line.split("=", 1)
+                    key = key.strip()
+                    if key in ("Icon", "StartupWMClass", "Exec"):
+                        entry[key] = value.strip()
+    except OSError:
+        pass
+    return entry
+
+
+def execBasename(execLine: str) -> Optional[str]:
+    try:
+        args = shlex.split(execLine)
+    except ValueError:
+        args = execLine.split()
+    for arg in args:
+        if arg.startswith("-") or ("=" in arg and not arg.startswith("/")):
+            continue  # wrapper options and env assignments
+        name = os.path.basename(arg)
+        if name in EXEC_WRAPPERS:
+            continue
+        if name in EXEC_LAUNCHERS:
+            return None
+        return name or None
+    return None
+
+
+class DesktopEntryIndex:
+    """
+    Window class to icon index built from the installed .desktop files.
+
+    Attributes:
+        path (str): File the index is persisted to
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._icons: Optional[Dict[str, str]] = None  # lowercase key -> Icon
+        self._memo: Dict[str, str] = {}  # window class -> resolved icon
+        self._monitors: List[Gio.FileMonitor] = []
+
+    def resolve(self, wmClass: str) -> str:
+        """
+        Returns the icon name (or absolute icon path) for a window class.
+        """
+        icon = self._memo.get(wmClass)
+        if icon is None:
+            icon = self._lookup(wmClass)
+            self._memo[wmClass] = icon
+        return icon
+
+    def invalidate(self) -> None:
+        self._icons = None
+        self._memo.clear()
+
+    def _lookup(self, wmClass: str) -> str:
+        icons = self._ensureLoaded()
+        key = wmClass.lower()
+        candidates = [key]
+        if "." in key:
+            # Reverse DNS classes such as org.mozilla.firefox
+            candidates.append(key.rsplit(".", 1)[1])
+        candidates.append(key.replace(" ", "-"))
+        for candidate in candidates:
+            if candidate in icons:
+                return icons[candidate]
+        return key
+
+    def _ensureLoaded(self) -> Dict[str, str]:
+        if self._icons is None:
+            dirs = applicationDirs()
+            self._icons = self._readCache(dirs)
+            if self._icons is None:
+                self._icons, mtimes = self._build(dirs)
+                self._writeCache(mtimes)
+            self._watch(dirs)
+        return self._icons
+
+    def _build(self, dirs: List[str]):
+        icons: Dict[str, str] = {}
+        priorities: Dict[str, int] = {}
+        mtimes: Dict[str, int] = {}
+
+        def add(key: Optional[str], icon: str, priority: int) -> None:
+            if not key:
+                return
+            key = key.lower()
+            # Earlier directories (user data first) win on equal priority
+            if priorities.get(key, 0) < priority:
+                icons[key] = icon
+                priorities[key] = priority
+
+        for appDir in dirs:
+            for root, _, files in os.walk(appDir):
+                mtimes[root] = os.stat(root).st_mtime_ns
+                for name in files:
+                    if not name.endswith(".desktop"):
+                        continue
+                    entry = parseDesktopEntry(os.path.join(root, name))
+                    icon = entry.get("Icon")
+                    if not icon:
+                        continue
+                    relative = os.path.relpath(os.path.join(root, name), appDir)
+                    desktopId = relative[: -len(".desktop")].replace(os.sep, "-")
+                    add(entry.get("StartupWMClass"), icon, PRIORITY_WM_CLASS)
+                    add(desktopId, icon, PRIORITY_DESKTOP_ID)
+                    if "." in desktopId:
+                        add(desktopId.rsplit(".", 1)[1], icon, PRIORITY_EXEC)
+                    add(execBasename(entry.get("Exec", "")), icon, PRIORITY_EXEC)
+
+        printLog(f"Desktop entry index built with {len(icons)} keys from {dirs}")
+        return icons, mtimes
+
+    def _readCache(self, dirs: List[str]) -> Optional[Dict[str, str]]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION or data.get("dirs") != dirs:
+            return None
+        for directory, mtime in data.get("mtimes", {}).items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return None
+            except OSError:
+                return None
+        return data.get("icons")
+
+    def _writeCache(self, mtimes: Dict[str, int]) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "dirs": applicationDirs(),
+            "mtimes": mtimes,
+            "icons": self._icons,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmpPath = f"{self.path}.tmp"
+            with open(tmpPath, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmpPath, self.path)
+        except OSError as e:
+            printLog(f"Error writing desktop entry index {self.path}: {e}")
+
+    def _watch(self, dirs: List[str]) -> None:
+        if self._monitors:
+            return
+        for appDir in dirs:
+            try:
+                monitor = Gio.File.new_for_path(appDir).monitor_directory(
+                    Gio.FileMonitorFlags.NONE, None
+                )
+            except Exception as e:
+                printLog(f"Cannot monitor {appDir}: {e}")
+                continue
+            monitor.connect("changed", self._onDirectoryChanged)
+            self._monitors.append(monitor)
+
+    def _onDirectoryChanged(self, monitor, file, otherFile, eventType) -> None:
+        if eventType in (
+            Gio.FileMonitorEvent.CREATED,
+            Gio.FileMonitorEvent.DELETED,
+            Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+            Gio.FileMonitorEvent.MOVED_IN,
+            Gio.FileMonitorEvent.MOVED_OUT,
+        ):
+            printLog(f"Desktop entries changed ({file.get_path()}), rebuilding index")
+            self.invalidate()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+desktopIndex = DesktopEntryIndex(DESKTOP_INDEX_FILE)
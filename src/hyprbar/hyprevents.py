@@ -0,0 +1,126 @@
+# Hyprland Event Listener
+#
+# Reads Hyprland's event socket (.socket2.sock) on the GLib main loop and
+# dispatches every "EVENT>>DATA" line to the handlers subscribed to EVENT.
+# Components react to events instead of polling hyprctl, and the connection
+# is re-established with backoff if Hyprland restarts.
+#
+import os
+import socket
+from typing import Callable, Dict, List, Optional
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.util import printLog
+
+RECONNECT_MIN_MS = 500
+RECONNECT_MAX_MS = 30000
+
+
+def hyprlandSocketPath(name: str) -> str:
+    """
+    Returns the path of one of the sockets of the running Hyprland instance.
+
+    Args:
+        name (str): Socket file name, ".socket.sock" or ".socket2.sock".
+    """
+    signature = os.environ.get("HYPRLAND_INSTANCE_SIGNATURE", "")
+    runtimeDir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtimeDir:
+        path = os.path.join(runtimeDir, "hypr", signature, name)
+        if os.path.exists(path):
+            return path
+    # Hyprland before v0.40 used /tmp/hypr
+    return os.path.join("/tmp", "hypr", signature, name)
+
+
+def normalizeAddress(address: str) -> str:
+    # Events carry window addresses without the 0x prefix used by hyprctl
+    return address if address.startswith("0x") else f"0x{address}"
+
+
+class HyprlandEvents:
+    """
+    Subscription hub for the Hyprland event socket.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._socket: Optional[socket.socket] = None
+        self._watchId: Optional[int] = None
+        self._reconnectId: Optional[int] = None
+        self._reconnectDelay = RECONNECT_MIN_MS
+        self._buffer = b""
+
+    def subscribe(self, event: str, handler: Callable[[str], None]) -> None:
+        self._handlers.setdefault(event, []).append(handler)
+        if self._socket is None and self._reconnectId is None:
+            self._connect()
+
+    def unsubscribe(self, event: str, handler: Callable[[str], None]) -> None:
+        handlers = self._handlers.get(event, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def _connect(self) -> bool:
+        self._reconnectId = None
+        path = hyprlandSocketPath(".socket2.sock")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            sock.close()
+            printLog(
+                f"Cannot connect to Hyprland events at {path}: {e}, "
+                f"retrying in {self._reconnectDelay} ms"
+            )
+            self._scheduleReconnect()
+            return False
+        sock.setblocking(False)
+        self._socket = sock
+        self._buffer = b""
+        self._reconnectDelay = RECONNECT_MIN_MS
+        self._watchId = GLib.io_add_watch(
+            sock.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+            self._onReadable,
+        )
+        printLog(f"Listening to Hyprland events at {path}")
+        return False
+
+    def _scheduleReconnect(self) -> None:
+        self._reconnectId = GLib.timeout_add(self._reconnectDelay, self._connect)
+        self._reconnectDelay = min(self._reconnectDelay * 2, RECONNECT_MAX_MS)
+
+    def _disconnect(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        self._watchId = None
+
+    def _onReadable(self, fd: int, condition: GLib.IOCondition) -> bool:
+        try:
+            data = self._socket.recv(65536) if self._socket else b""
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            printLog(f"Error reading Hyprland events: {e}")
+            data = b""
+        if not data:
+            printLog("Hyprland event socket closed, reconnecting")
+            self._disconnect()
+            self._scheduleReconnect()
+            return False
+
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            event, _, payload = line.decode("utf-8", errors="replace").partition(">>")
+            for handler in list(self._handlers.get(event, ())):
+                try:
+                    handler(payload)
+                except Exception as e:
+                    printLog(f"Error handling Hyprland event '{event}': {e}")
+        return True
+
+
+hyprlandEvents = HyprlandEvents()
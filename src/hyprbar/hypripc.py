@@ -0,0 +1,262 @@
+# Hyprland IPC Client
+#
+# Thin client for Hyprland's request socket (.socket.sock). Replies to
+# j/clients, j/workspaces, j/monitors and j/activeworkspace are decoded with
+# json into compact __slots__ records holding only the fields the widgets
+# read, instead of full model objects with every field of every window.
+#
+# Pollers read through their own CachedQuery, which keeps the raw reply it
+# last decoded: when Hyprland answers with the same bytes as last time,
+# nothing is decoded and the previous records are returned with
+# changed=False, so the poller can skip its update entirely. The cache is
+# per consumer, so one component reading a query never hides a change from
+# another one.
+#
+#   python -m hyprbar.hypripc   # benchmark against hyprpy, inside Hyprland
+#
+import json
+import socket
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+from hyprbar.hyprevents import hyprlandSocketPath
+
+RECV_SIZE = 65536
+REQUEST_TIMEOUT = 2.0  # seconds
+
+
+class Client:
+    __slots__ = (
+        "address",
+        "title",
+        "wmClass",
+        "workspaceId",
+        "workspaceName",
+        "focusHistoryId",
+    )
+
+    def __init__(
+        self,
+        address: str,
+        title: str,
+        wmClass: str,
+        workspaceId: int,
+        workspaceName: str = "",
+        focusHistoryId: int = 0,
+    ) -> None:
+        self.address = address
+        self.title = title
+        self.wmClass = wmClass
+        self.workspaceId = workspaceId
+        self.workspaceName = workspaceName
+        self.focusHistoryId = focusHistoryId
+
+
+class Workspace:
+    __slots__ = ("id", "name", "monitor")
+
+    def __init__(self, id: int, name: str, monitor: str) -> None:
+        self.id = id
+        self.name = name
+        self.monitor = monitor
+
+
+class Monitor:
+    __slots__ = ("name", "activeWorkspaceId", "focused")
+
+    def __init__(self, name: str, activeWorkspaceId: int, focused: bool) -> None:
+        self.name = name
+        self.activeWorkspaceId = activeWorkspaceId
+        self.focused = focused
+
+
+def parseClients(data: Any) -> List[Client]:
+    return [
+        Client(
+            c["address"],
+            c["title"],
+            c["class"],
+            c["workspace"]["id"],
+            c["workspace"]["name"],
+            c.get("focusHistoryID", 0),
+        )
+        for c in data
+    ]
+
+
+def parseWorkspace(data: Any) -> Workspace:
+    return Workspace(data["id"], data["name"], data.get("monitor", ""))
+
+
+def parseWorkspaces(data: Any) -> List[Workspace]:
+    return [parseWorkspace(w) for w in data]
+
+
+def parseMonitors(data: Any) -> List[Monitor]:
+    return [
+        Monitor(m["name"], m["activeWorkspace"]["id"], m.get("focused", False))
+        for m in data
+    ]
+
+
+class Query:
+    """
+    A JSON request and the projection of its reply.
+
+    Attributes:
+        command (str): Request sent to the socket, e.g. "j/clients"
+        parse (Callable[[Any], Any]): Builds the records from the decoded JSON
+    """
+
+    __slots__ = ("command", "parse")
+
+    def __init__(self, command: str, parse: Callable[[Any], Any]) -> None:
+        self.command = command
+        self.parse = parse
+
+
+CLIENTS = Query("j/clients", parseClients)
+WORKSPACES = Query("j/workspaces", parseWorkspaces)
+MONITORS = Query("j/monitors", parseMonitors)
+ACTIVE_WORKSPACE = Query("j/activeworkspace", parseWorkspace)
+
+
+class HyprlandIPC:
+    """
+    Request socket client.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        # Resolved on first use, so the bar can be imported outside Hyprland
+        if self._path is None:
+            self._path = hyprlandSocketPath(".socket.sock")
+        return self._path
+
+    def request(self, command: str) -> bytes:
+        """
+        Sends one request and waits for the whole reply (blocking, short).
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(REQUEST_TIMEOUT)
+            sock.connect(self.path)
+            sock.sendall(command.encode())
+            chunks = []
+            while True:
+                chunk = sock.recv(RECV_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def requestAsync(self, command: str) -> bytes:
+        """
+        Sends one request and waits for the whole reply. Raises TimeoutError,
+        an OSError like those of request(), if Hyprland does not answer
+        within REQUEST_TIMEOUT.
+        """
+        return await asyncio.wait_for(self._exchange(command), REQUEST_TIMEOUT)
+
+    async def _exchange(self, command: str) -> bytes:
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            writer.write(command.encode())
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    def query(self, query: Query) -> Any:
+        # One-off read, always decoded
+        return query.parse(json.loads(self.request(query.command)))
+
+    async def queryAsync(self, query: Query) -> Any:
+        return query.parse(json.loads(await self.requestAsync(query.command)))
+
+    def dispatch(self, arguments: str) -> bool:
+        return self.request(f"dispatch {arguments}") == b"ok"
+
+
+hyprIPC = HyprlandIPC()
+
+
+class CachedQuery:
+    """
+    A query polled by one consumer, decoded only when its reply changed
+    since this consumer's previous read.
+
+    Attributes:
+        decoded (int): Replies decoded into records
+        skipped (int): Replies identical to the previous one, not decoded
+    """
+
+    def __init__(self, query: Query, ipc: HyprlandIPC = hyprIPC) -> None:
+        self.query = query
+        self.ipc = ipc
+        self._raw: Optional[bytes] = None
+        self._records: Any = None
+        self.decoded = 0
+        self.skipped = 0
+
+    def get(self) -> Tuple[Any, bool]:
+        """
+        Runs the query.
+
+        Returns:
+            Tuple[Any, bool]: The records, and False if the reply was the
+            same as the previous one (the previous records are returned).
+        """
+        return self._decode(self.ipc.request(self.query.command))
+
+    async def fetch(self) -> Tuple[Any, bool]:
+        # Same as get() without blocking the main loop
+        return self._decode(await self.ipc.requestAsync(self.query.command))
+
+    def _decode(self, raw: bytes) -> Tuple[Any, bool]:
+        if raw == self._raw:
+            self.skipped += 1
+            return self._records, False
+        self._records = self.query.parse(json.loads(raw))
+        self._raw = raw
+        self.decoded += 1
+        return self._records, True
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+
+    try:
+        from hyprpy import Hyprland
+    except ImportError:
+        raise SystemExit("The benchmark compares against hyprpy: uv sync --group dev")
+
+    rounds = 200
+
+    def measure(label: str, func: Callable[[], Any]) -> None:
+        func()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{label:>28}: {elapsed * 1000 / rounds:.3f} ms/poll, "
+            f"peak {peak / 1024:.0f} KiB"
+        )
+
+    hyprland = Hyprland()
+    windows = len(hyprland.get_windows())
+    print(f"{windows} windows, {rounds} polls each")
+    measure("hyprpy get_windows()", hyprland.get_windows)
+    measure(
+        "raw socket, decode always",
+        lambda: parseClients(json.loads(hyprIPC.request(CLIENTS.command))),
+    )
+    clients = CachedQuery(CLIENTS)
+    measure("raw socket, short-circuit", clients.get)
+    print(f"decoded {clients.decoded}, skipped {clients.skipped}")
@@ -0,0 +1,341 @@
+# Memory Diagnostics
+#
+# hyprbar runs for weeks, so slow leaks matter. With --memory-report the bar
+# takes periodic tracemalloc snapshots and logs the allocation sites that
+# grew the most since the previous report, together with the live GObject
+# count per type and the widget count of every component.
+#
+# `hyprbar --soak CYCLES` drives synthetic window and tray item churn through
+# the real AppSwitch and TrayIconManager code paths and fails if memory keeps
+# growing after the warm-up.
+#
+import gc
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import gi
+
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk  # pyright: ignore # noqa
+from gi.repository import Gio  # pyright: ignore # noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from gi.repository import GObject  # pyright: ignore # noqa
+from hyprbar.util import printLog  # noqa
+from hyprbar.hypripc import Client  # noqa
+
+TRACE_FRAMES = 10  # stack depth recorded per allocation
+TOP_GROWTH = 10  # allocation sites logged per report
+SOAK_WARMUP = 0.1  # fraction of the soak cycles run before the baseline
+SOAK_LIMIT_KIB = 512  # growth allowed after the warm-up
+SOAK_TRAY_ITEMS = 8  # synthetic tray items added and removed in turn
+SOAK_DRAIN_TIMEOUT = 5.0  # seconds a cycle waits for the tray's D-Bus replies
+
+
+def gobjectCounts() -> Counter:
+    # Python wrappers of live GObjects, by type
+    gc.collect()
+    return Counter(
+        type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, GObject.Object)
+    )
+
+
+def countWidgets(widget: Gtk.Widget) -> int:
+    count = 1
+    child = widget.get_first_child()
+    while child is not None:
+        count += countWidgets(child)
+        child = child.get_next_sibling()
+    return count
+
+
+class MemoryDiagnostics:
+    """
+    Periodic memory growth reports.
+
+    Attributes:
+        interval (int): Seconds between reports, 0 while disabled
+        components (Dict[str, List[weakref.ref]]): Top-level widgets per component
+    """
+
+    def __init__(self) -> None:
+        self.interval = 0
+        self.components: Dict[str, List[weakref.ref]] = {}
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previousCounts: Counter = Counter()
+
+    def start(self, interval: int) -> None:
+        if self.interval:
+            return
+        self.interval = interval
+        tracemalloc.start(TRACE_FRAMES)
+        self._previous = tracemalloc.take_snapshot()
+        self._previousCounts = gobjectCounts()
+        GLib.timeout_add_seconds(interval, self._onReport)
+        printLog(f"Memory diagnostics enabled, reporting every {interval} s")
+
+    def registerComponent(self, name: str, widget: Gtk.Widget) -> None:
+        self.components.setdefault(name, []).append(weakref.ref(widget))
+
+    def componentCounts(self) -> Dict[str, int]:
+        counts = {}
+        for name, refs in self.components.items():
+            widgets = [ref() for ref in refs]
+            counts[name] = sum(countWidgets(w) for w in widgets if w is not None)
+        return counts
+
+    def report(self) -> List[str]:
+        """
+        Compares the heap with the previous report.
+
+        Returns:
+            List[str]: Log lines, the top growing allocation sites first.
+        """
+        current = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        lines = []
+        size, peak = tracemalloc.get_traced_memory()
+        lines.append(f"traced {size / 1024:.0f} KiB (peak {peak / 1024:.0f} KiB)")
+        if self._previous is not None:
+            for stat in current.compare_to(self._previous, "lineno")[:TOP_GROWTH]:
+                if stat.size_diff > 0:
+                    lines.append(
+                        f"+{stat.size_diff / 1024:.1f} KiB "
+                        f"(+{stat.count_diff} blocks) {stat.traceback[0]}"
+                    )
+        self._previous = current
+
+        counts = gobjectCounts()
+        growth = counts - self._previousCounts
+        self._previousCounts = counts
+        lines.append(
+            "gobjects: "
+            + ", ".join(f"{name}={count}" for name, count in counts.most_common(8))
+        )
+        if growth:
+            lines.append(
+                "gobject growth: "
+                + ", ".join(f"{name}+{count}" for name, count in growth.most_common(8))
+            )
+        lines.append(
+            "widgets: "
+            + ", ".join(f"{n}={c}" for n, c in self.componentCounts().items())
+        )
+        return lines
+
+    def _onReport(self) -> bool:
+        for line in self.report():
+            printLog(f"Memory: {line}")
+        return True
+
+
+memoryDiagnostics = MemoryDiagnostics()
+
+
+SNI_XML = """
+<node>
+  <interface name="org.freedesktop.StatusNotifierItem">
+    <property name="Id" type="s" access="read"/>
+    <property name="Title" type="s" access="read"/>
+    <property name="Status" type="s" access="read"/>
+    <property name="IconName" type="s" access="read"/>
+    <property name="ToolTip" type="(sa(iiay)ss)" access="read"/>
+    <signal name="NewIcon"/>
+  </interface>
+</node>
+"""
+
+
+class SyntheticTrayItems:
+    """
+    StatusNotifierItems exported by a private connection on its own thread,
+    so they answer the tray's asynchronous GetAll calls while the soak loop
+    waits for the replies on the main context.
+    """
+
+    def __init__(self) -> None:
+        self.uniqueName = ""
+        self._ready = threading.Event()
+        self._loop: Optional[GLib.MainLoop] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.quit()
+        self._thread.join()
+
+    def address(self, index: int) -> str:
+        return f"{self.uniqueName}/StatusNotifierItem/soak{index}"
+
+    def _run(self) -> None:
+        context = GLib.MainContext()
+        context.push_thread_default()
+        connection = Gio.DBusConnection.new_for_address_sync(
+            Gio.dbus_address_get_for_bus_sync(Gio.BusType.SESSION, None),
+            Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT
+            | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION,
+            None,
+            None,
+        )
+        self.uniqueName = connection.get_unique_name()
+        interface = Gio.DBusNodeInfo.new_for_xml(SNI_XML).interfaces[0]
+        for index in range(SOAK_TRAY_ITEMS):
+            connection.register_object_with_closures(
+                f"/StatusNotifierItem/soak{index}",
+                interface,
+                None,
+                self._getProperty,
+                None,
+            )
+        self._loop = GLib.MainLoop(context)
+        self._ready.set()
+        self._loop.run()
+        connection.close_sync(None)
+        context.pop_thread_default()
+
+    def _getProperty(self, connection, sender, path, interface, name):
+        itemId = path.rsplit("/", 1)[-1]
+        if name == "ToolTip":
+            return GLib.Variant("(sa(iiay)ss)", ("", [], itemId, ""))
+        if name == "Status":
+            return GLib.Variant("s", "Active")
+        if name == "IconName":
+            return GLib.Variant("s", "application-x-executable")
+        return GLib.Variant("s", itemId)
+
+
+class SyntheticWindows:
+    """
+    Stand-in for the clients query of an AppSwitch: a sliding set of
+    windows where every step closes the oldest window and opens a new one.
+    """
+
+    def __init__(self, open: int) -> None:
+        self.open = open
+        self.serial = 0
+        self.windows: List[Client] = []
+        for _ in range(open):
+            self.step()
+
+    def step(self) -> None:
+        classes = ("kitty", "firefox", "code", "thunar", "pavucontrol")
+        self.windows.append(
+            Client(
+                address=f"0x{self.serial:x}",
+                title=f"soak window {self.serial}",
+                wmClass=classes[self.serial % len(classes)],
+                workspaceId=1 + self.serial % 5,
+            )
+        )
+        self.serial += 1
+        if len(self.windows) > self.open:
+            self.windows.pop(0)
+
+    def get(self) -> Tuple[List[Client], bool]:
+        return list(self.windows), True
+
+
+def runSoak(cycles: int, limitKiB: int = SOAK_LIMIT_KIB) -> Tuple[bool, List[str]]:
+    """
+    Opens and closes `cycles` windows and tray items and checks that the
+    traced memory stops growing once the warm-up is over.
+
+    Returns:
+        Tuple[bool, List[str]]: Whether memory stayed bounded, and a report.
+    """
+    # GTK based modules are only imported by this mode
+    from hyprbar.config import AppSwitchConfig
+    from hyprbar.appswitch import AppSwitch
+    from hyprbar.trayiconmanager import TrayIconManager
+    from hyprbar.render import renderBatcher
+    from hyprbar.snapshot import snapshot
+
+    Gtk.init()
+    # Never overwrite the real warm-start snapshot with synthetic state
+    snapshot.path = os.path.join(tempfile.mkdtemp(prefix="hyprbar-soak-"), "state.json")
+    context = GLib.MainContext.default()
+
+    def drain() -> None:
+        # Tray items are shown once their GetAll reply arrived from the
+        # GDBus thread: wait for it instead of stopping at an idle context
+        deadline = time.monotonic() + SOAK_DRAIN_TIMEOUT
+        while tray._pending_items and time.monotonic() < deadline:
+            context.iteration(True)
+        while context.pending():
+            context.iteration(False)
+        renderBatcher.flush()
+
+    windows = SyntheticWindows(open=20)
+    box = Gtk.Box()
+    appSwitch = AppSwitch(box, AppSwitchConfig(type="appswitch"))  # pyright: ignore # noqa
+    appSwitch.clients = windows  # pyright: ignore # noqa
+    # Only the synthetic windows are reconciled, not the live Hyprland ones
+    appSwitch.tasks.cancel()
+
+    trayItems = SyntheticTrayItems()
+    trayItems.start()
+    tray = TrayIconManager(Gtk.Box())
+
+    tracemalloc.start(TRACE_FRAMES)
+    added = shown = 0
+    warmup = max(1, int(cycles * SOAK_WARMUP))
+    baseline = 0
+    baselineCounts: Counter = Counter()
+    for cycle in range(cycles):
+        if cycle == warmup:
+            gc.collect()
+            baseline = tracemalloc.get_traced_memory()[0]
+            baselineCounts = gobjectCounts()
+        windows.step()
+        appSwitch.updateAppSwitch()
+        index = cycle % SOAK_TRAY_ITEMS
+        address = trayItems.address(index)
+        if address in tray.status_notifier_items:
+            tray._remove_tray_item(address)
+            drain()
+        else:
+            tray._add_tray_item(address)
+            added += 1
+            drain()
+            shown += address in tray.status_notifier_items
+
+    for index in range(SOAK_TRAY_ITEMS):
+        address = trayItems.address(index)
+        if (
+            address in tray.status_notifier_items
+            or address in tray._pending_items
+        ):
+            tray._remove_tray_item(address)
+    drain()
+    trayItems.stop()
+    gc.collect()
+    final = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    growthKiB = (final - baseline) / 1024
+    counts = gobjectCounts()
+    growth = counts - baselineCounts
+    lines = [
+        f"{cycles} window and tray item cycles ({warmup} warm-up)",
+        f"traced memory after warm-up: {baseline / 1024:.0f} KiB, "
+        f"at the end: {final / 1024:.0f} KiB ({growthKiB:+.0f} KiB)",
+        f"buttons built: {appSwitch.pool.created}, reused: {appSwitch.pool.reused}",
+        f"tray items shown: {shown} of {added} added",
+    ]
+    if growth:
+        lines.append(
+            "gobject growth: "
+            + ", ".join(f"{name}+{count}" for name, count in growth.most_common(8))
+        )
+    if shown < added:
+        lines.append("some tray items were never shown, the tray churn is incomplete")
+    return growthKiB <= limitKiB and shown == added, lines
@@ -0,0 +1,454 @@
+# Notification Daemon
+#
+# Optional org.freedesktop.Notifications server, enabled by adding a
+# "notifications" component (the unread count) to the config. Notifications
+# are shown as layer-shell popups next to the bar.
+#
+# A misbehaving application cannot stall the bar:
+# - the history is an LRU bounded by `history`
+# - every application has a token bucket of `burst` notifications refilled
+#   at `rate` per second, notifications over it are dropped
+# - floods of replaces_id updates (volume OSDs...) only rewrite the stored
+#   notification; its popup is updated once per frame by the render batcher
+# - at most `max_popups` popups are shown, a bounded queue holds the rest
+#
+# A popup that times out is signalled closed (EXPIRED) to its application,
+# but the notification stays in the history and in the unread count until
+# it is dismissed; it is not signalled closed a second time then.
+#
+# It uses the shared session bus connection, like the tray. To try it without
+# replacing the running daemon, start the bar on a private bus:
+#
+#   dbus-run-session -- sh -c 'hyprbar & sleep 2; gdbus call --session \
+#     --dest org.freedesktop.Notifications \
+#     --object-path /org/freedesktop/Notifications \
+#     --method org.freedesktop.Notifications.Notify \
+#     test 0 dialog-information "Hello" "From gdbus" "[]" "{}" 5000; wait'
+#
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Gio  # pyright: ignore # noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from gi.repository import Pango  # pyright: ignore # noqa
+from hyprbar.config import ComponentConfig
+from hyprbar.render import renderBatcher
+from hyprbar.util import printLog
+
+BUS_NAME = "org.freedesktop.Notifications"
+OBJECT_PATH = "/org/freedesktop/Notifications"
+INTERFACE_XML = """
+<node>
+  <interface name="org.freedesktop.Notifications">
+    <method name="GetCapabilities">
+      <arg type="as" direction="out"/>
+    </method>
+    <method name="Notify">
+      <arg type="s" direction="in"/>
+      <arg type="u" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="as" direction="in"/>
+      <arg type="a{sv}" direction="in"/>
+      <arg type="i" direction="in"/>
+      <arg type="u" direction="out"/>
+    </method>
+    <method name="CloseNotification">
+      <arg type="u" direction="in"/>
+    </method>
+    <method name="GetServerInformation">
+      <arg type="s" direction="out"/>
+      <arg type="s" direction="out"/>
+      <arg type="s" direction="out"/>
+      <arg type="s" direction="out"/>
+    </method>
+    <signal name="NotificationClosed">
+      <arg type="u"/>
+      <arg type="u"/>
+    </signal>
+    <signal name="ActionInvoked">
+      <arg type="u"/>
+      <arg type="s"/>
+    </signal>
+  </interface>
+</node>
+"""
+
+# NotificationClosed reasons
+EXPIRED = 1
+DISMISSED = 2
+CLOSED = 3
+
+
+class Notification:
+    __slots__ = (
+        "id",
+        "appName",
+        "icon",
+        "summary",
+        "body",
+        "actions",
+        "urgency",
+        "timeout",
+        "timestamp",
+        "expired",  # NotificationClosed already sent with EXPIRED
+    )
+
+    def __init__(
+        self,
+        id: int,
+        appName: str,
+        icon: str,
+        summary: str,
+        body: str,
+        actions: List[str],
+        urgency: int,
+        timeout: int,
+    ) -> None:
+        self.id = id
+        self.appName = appName
+        self.icon = icon
+        self.summary = summary
+        self.body = body
+        self.actions = actions
+        self.urgency = urgency
+        self.timeout = timeout
+        self.timestamp = time.monotonic()
+        self.expired = False
+
+
+class RateLimiter:
+    """
+    Token bucket per application.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # app -> (tokens, time)
+
+    def allow(self, appName: str) -> bool:
+        now = time.monotonic()
+        tokens, last = self._buckets.get(appName, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[appName] = (tokens, now)
+            return False
+        self._buckets[appName] = (tokens - 1, now)
+        return True
+
+
+class NotificationPopup:
+    """
+    Widgets of one notification inside the popup window.
+    """
+
+    __slots__ = ("box", "icon", "summary", "body", "expireSourceId")
+
+    def __init__(self, onClicked) -> None:
+        self.box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        self.box.add_css_class("notification")
+        self.icon = Gtk.Image(pixel_size=32)
+        texts = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        self.summary = Gtk.Label(xalign=0)
+        self.summary.add_css_class("notification-summary")
+        self.summary.set_ellipsize(Pango.EllipsizeMode.END)
+        self.body = Gtk.Label(xalign=0, wrap=True)
+        self.body.add_css_class("notification-body")
+        self.body.set_max_width_chars(40)
+        self.body.set_lines(3)
+        self.body.set_ellipsize(Pango.EllipsizeMode.END)
+        texts.append(self.summary)
+        texts.append(self.body)
+        self.box.append(self.icon)
+        self.box.append(texts)
+        click = Gtk.GestureClick.new()
+        click.connect("pressed", lambda *_: onClicked(self))
+        self.box.add_controller(click)
+        self.expireSourceId: Optional[int] = None
+
+    def show(self, notification: Notification) -> None:
+        if notification.icon:
+            renderBatcher.schedule(
+                self.icon, "icon", self.icon.set_from_icon_name, notification.icon
+            )
+        renderBatcher.setVisible(self.icon, bool(notification.icon))
+        renderBatcher.setText(self.summary, notification.summary)
+        renderBatcher.setText(self.body, notification.body)
+        renderBatcher.setVisible(self.body, bool(notification.body))
+        renderBatcher.setCssClass(
+            self.box, "notification-critical", notification.urgency == 2
+        )
+
+
+class NotificationServer:
+    """
+    org.freedesktop.Notifications implementation.
+
+    Attributes:
+        history (OrderedDict[int, Notification]): Notifications, oldest first
+        dropped (int): Notifications refused by the rate limiter
+        coalesced (int): Notifications that replaced an existing one
+    """
+
+    def __init__(self, config: ComponentConfig) -> None:
+        self.config = config
+        self.historySize: int = config.history  # pyright: ignore # noqa
+        self.maxPopups: int = config.max_popups  # pyright: ignore # noqa
+        self.defaultTimeout: int = config.timeout  # pyright: ignore # noqa
+        self.history: "OrderedDict[int, Notification]" = OrderedDict()
+        self.limiter = RateLimiter(
+            config.rate, config.burst  # pyright: ignore # noqa
+        )
+        self.popups: Dict[int, NotificationPopup] = {}  # id -> shown popup
+        self.queue: Deque[int] = deque(maxlen=config.history)  # pyright: ignore # noqa
+        self.listeners: List = []  # called with the history size on changes
+        self.dropped = 0
+        self.coalesced = 0
+        self._nextId = 1
+        self._connection: Optional[Gio.DBusConnection] = None
+        self._window: Optional[Gtk.Window] = None
+        self._popupBox: Optional[Gtk.Box] = None
+
+    def start(self) -> None:
+        try:
+            self._connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        except GLib.Error as e:
+            printLog(f"Error connecting to D-Bus for notifications: {e}")
+            return
+        interface = Gio.DBusNodeInfo.new_for_xml(INTERFACE_XML).interfaces[0]
+        self._connection.register_object_with_closures(
+            OBJECT_PATH, interface, self._onMethodCall, None, None
+        )
+        Gio.bus_own_name_on_connection(
+            self._connection,
+            BUS_NAME,
+            Gio.BusNameOwnerFlags.NONE,
+            lambda *_: printLog(f"Notification daemon owns {BUS_NAME}"),
+            lambda *_: printLog(
+                f"{BUS_NAME} is owned by another daemon, notifications disabled"
+            ),
+        )
+
+    def _onMethodCall(
+        self, connection, sender, path, interface, method, parameters, invocation
+    ) -> None:
+        if method == "Notify":
+            notificationId = self.notify(*parameters.unpack())
+            invocation.return_value(GLib.Variant("(u)", (notificationId,)))
+        elif method == "CloseNotification":
+            self.close(parameters.unpack()[0], CLOSED)
+            invocation.return_value(None)
+        elif method == "GetCapabilities":
+            invocation.return_value(
+                GLib.Variant("(as)", (["body", "actions", "icon-static"],))
+            )
+        elif method == "GetServerInformation":
+            invocation.return_value(
+                GLib.Variant("(ssss)", ("hyprbar", "antrax2024", "1", "1.2"))
+            )
+        else:
+            invocation.return_dbus_error(
+                "org.freedesktop.DBus.Error.UnknownMethod", method
+            )
+
+    def notify(
+        self,
+        appName: str,
+        replacesId: int,
+        appIcon: str,
+        summary: str,
+        body: str,
+        actions: List[str],
+        hints: Dict[str, Any],
+        expireTimeout: int,
+    ) -> int:
+        existing = self.history.get(replacesId) if replacesId else None
+        if existing is None and not self.limiter.allow(appName):
+            # Still answer with an id, the sender must not notice
+            self.dropped += 1
+            notificationId = self._nextId
+            self._nextId += 1
+            return notificationId
+
+        if existing is not None:
+            # Coalesced: updated in place, shown on the next frame
+            self.coalesced += 1
+            notification = existing
+            notification.summary, notification.body = summary, body
+            notification.icon = appIcon or notification.icon
+            notification.actions = actions
+            notification.timestamp = time.monotonic()
+            notification.expired = False
+            self.history.move_to_end(notification.id)
+        else:
+            notification = Notification(
+                self._nextId,
+                appName,
+                appIcon,
+                summary,
+                body,
+                actions,
+                int(hints.get("urgency", 1)),
+                expireTimeout,
+            )
+            self._nextId += 1
+            self.history[notification.id] = notification
+            while len(self.history) > self.historySize:
+                oldId, _ = self.history.popitem(last=False)
+                self._hidePopup(oldId)
+        notification.timeout = (
+            self.defaultTimeout if expireTimeout < 0 else expireTimeout
+        )
+
+        popup = self.popups.get(notification.id)
+        if popup is not None:
+            popup.show(notification)
+            self._scheduleExpire(notification, popup)
+        elif notification.id not in self.queue:
+            self.queue.append(notification.id)
+            self._showQueued()
+        self._notifyListeners()
+        return notification.id
+
+    def close(self, notificationId: int, reason: int) -> None:
+        notification = self.history.pop(notificationId, None)
+        if notification is None:
+            return
+        self._hidePopup(notificationId)
+        if not notification.expired:
+            self._emitClosed(notificationId, reason)
+        self._notifyListeners()
+
+    def _emitClosed(self, notificationId: int, reason: int) -> None:
+        if self._connection is not None:
+            self._connection.emit_signal(
+                None,
+                OBJECT_PATH,
+                BUS_NAME,
+                "NotificationClosed",
+                GLib.Variant("(uu)", (notificationId, reason)),
+            )
+
+    def clear(self) -> None:
+        for notificationId in list(self.history):
+            self.close(notificationId, DISMISSED)
+
+    def _notifyListeners(self) -> None:
+        for listener in self.listeners:
+            listener(len(self.history))
+
+    def _ensureWindow(self) -> Gtk.Box:
+        if self._popupBox is None:
+            # Imported on first popup so the offscreen renderer needs no layer shell
+            from gi.repository import Gtk4LayerShell as LayerShell  # pyright: ignore #noqa
+
+            self._window = Gtk.Window(application=Gtk.Application.get_default())
+            self._window.set_name("hyprbar-notifications")
+            LayerShell.init_for_window(self._window)
+            LayerShell.set_layer(self._window, LayerShell.Layer.OVERLAY)
+            LayerShell.set_anchor(self._window, LayerShell.Edge.TOP, True)
+            LayerShell.set_anchor(self._window, LayerShell.Edge.RIGHT, True)
+            self._popupBox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+            self._window.set_child(self._popupBox)
+        return self._popupBox
+
+    def _showQueued(self) -> None:
+        while self.queue and len(self.popups) < self.maxPopups:
+            notification = self.history.get(self.queue.popleft())
+            if notification is None:
+                continue
+            popup = NotificationPopup(self._onPopupClicked)
+            popup.show(notification)
+            self.popups[notification.id] = popup
+            self._ensureWindow().append(popup.box)
+            self._scheduleExpire(notification, popup)
+        if self._window is not None:
+            self._window.set_visible(bool(self.popups))
+
+    def _scheduleExpire(self, notification: Notification, popup: NotificationPopup):
+        if popup.expireSourceId is not None:
+            GLib.source_remove(popup.expireSourceId)
+            popup.expireSourceId = None
+        if notification.timeout > 0 and notification.urgency < 2:
+            popup.expireSourceId = GLib.timeout_add(
+                notification.timeout, self._onExpired, notification.id
+            )
+
+    def _onExpired(self, notificationId: int) -> bool:
+        popup = self.popups.get(notificationId)
+        if popup is not None:
+            popup.expireSourceId = None
+        # Expired popups stay in the history and in the count, but the
+        # application is told, e.g. `notify-send --wait` returns
+        self._hidePopup(notificationId)
+        notification = self.history.get(notificationId)
+        if notification is not None and not notification.expired:
+            notification.expired = True
+            self._emitClosed(notificationId, EXPIRED)
+        return False
+
+    def _hidePopup(self, notificationId: int) -> None:
+        popup = self.popups.pop(notificationId, None)
+        if popup is None:
+            return
+        if popup.expireSourceId is not None:
+            GLib.source_remove(popup.expireSourceId)
+        if self._popupBox is not None:
+            self._popupBox.remove(popup.box)
+        self._showQueued()
+
+    def _onPopupClicked(self, popup: NotificationPopup) -> None:
+        for notificationId, shown in self.popups.items():
+            if shown is popup:
+                break
+        else:
+            return
+        notification = self.history.get(notificationId)
+        if notification is not None and "default" in notification.actions[::2]:
+            if self._connection is not None:
+                self._connection.emit_signal(
+                    None,
+                    OBJECT_PATH,
+                    BUS_NAME,
+                    "ActionInvoked",
+                    GLib.Variant("(us)", (notificationId, "default")),
+                )
+        self.close(notificationId, DISMISSED)
+
+
+def createNotificationsComponent(
+    box: Gtk.Box, component: ComponentConfig, startServer: bool = True
+) -> None:
+    """
+    Starts the notification daemon and shows the number of notifications.
+    Clicking the count dismisses all of them.
+
+    Args:
+        box (Gtk.Box): Container the count is added to.
+        component (ComponentConfig): The notifications component config.
+        startServer (bool): Own org.freedesktop.Notifications, False when
+            rendering offscreen so the session's daemon is left alone.
+    """
+    server = NotificationServer(component)
+    countBox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+    if component.css_id:  # pyright: ignore # noqa
+        countBox.set_name(component.css_id)  # pyright: ignore # noqa
+    if component.icon:  # pyright: ignore # noqa
+        countBox.append(Gtk.Label(label=f"{component.icon}"))  # pyright: ignore # noqa
+    countLabel = Gtk.Label(label="0")
+    countBox.append(countLabel)
+    click = Gtk.GestureClick.new()
+    click.connect("pressed", lambda *_: server.clear())
+    countBox.add_controller(click)
+    box.append(countBox)
+
+    def onCountChanged(count: int) -> None:
+        renderBatcher.setText(countLabel, f"{count}")
+        renderBatcher.setCssClass(countBox, "notifications-unread", count > 0)
+
+    server.listeners.append(onCountChanged)
+    if startServer:
+        server.start()
@@ -0,0 +1,197 @@
+# Offscreen Rendering and Render-cost Profiler
+#
+# `hyprbar render` builds the same widget tree as the bar from the config,
+# in a plain Gtk.Window instead of a layer-shell surface, renders it to a PNG
+# and profiles every widget over many frames:
+# - measure: the widget's own size request (its children stay cached)
+# - allocate: the widget's own allocation at its current size
+# - snapshot: building the widget's own render nodes (children stay cached)
+# - render: rasterizing the widget's render nodes, minus its children
+#
+# Expensive CSS (box-shadow, filter: blur, transitions) shows up in the
+# snapshot and render columns. Any display works, e.g. in CI:
+#
+#   GDK_BACKEND=x11 xvfb-run hyprbar render --output bar.png
+#
+import time
+from typing import Dict, List, Optional
+import gi
+
+gi.require_version("Gtk", "4.0")
+gi.require_version("Gsk", "4.0")
+from gi.repository import Gtk  # pyright: ignore # noqa
+from gi.repository import Gsk  # pyright: ignore # noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from gi.repository import Graphene  # pyright: ignore # noqa
+from hyprbar.config import HyprbarConfig  # noqa
+from hyprbar.render import renderBatcher  # noqa
+from hyprbar.widgets import buildBarContent, loadStyle  # noqa
+from hyprbar.util import printLog  # noqa
+
+SETTLE_SECONDS = 1.0  # main loop time given to components before profiling
+
+
+class WidgetCost:
+    """
+    Accumulated render cost of one widget, in seconds.
+
+    Attributes:
+        description (str): css name, #name and .classes of the widget
+        depth (int): Depth in the widget tree, 0 for the bar content
+    """
+
+    __slots__ = (
+        "description",
+        "depth",
+        "children",
+        "measure",
+        "allocate",
+        "snapshot",
+        "renderInclusive",
+        "render",
+    )
+
+    def __init__(self, description: str, depth: int) -> None:
+        self.description = description
+        self.depth = depth
+        self.children: List[Gtk.Widget] = []
+        self.measure = 0.0
+        self.allocate = 0.0
+        self.snapshot = 0.0
+        self.renderInclusive = 0.0
+        self.render = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.measure + self.allocate + self.snapshot + self.render
+
+
+def describeWidget(widget: Gtk.Widget) -> str:
+    description = widget.get_css_name()
+    name = widget.get_name()
+    if name and name != type(widget).__gtype__.name:
+        description += f"#{name}"
+    for cssClass in widget.get_css_classes():
+        description += f".{cssClass}"
+    return description
+
+
+def collectWidgets(
+    widget: Gtk.Widget, costs: Dict[Gtk.Widget, WidgetCost], depth: int = 0
+) -> None:
+    cost = WidgetCost(describeWidget(widget), depth)
+    costs[widget] = cost
+    child = widget.get_first_child()
+    while child is not None:
+        cost.children.append(child)
+        collectWidgets(child, costs, depth + 1)
+        child = child.get_next_sibling()
+
+
+def profileWidget(
+    widget: Gtk.Widget, cost: WidgetCost, renderer: Gsk.Renderer
+) -> None:
+    if not widget.get_mapped():
+        return
+    width, height = widget.get_width(), widget.get_height()
+
+    widget.queue_resize()
+    start = time.perf_counter()
+    widget.measure(Gtk.Orientation.HORIZONTAL, -1)
+    widget.measure(Gtk.Orientation.VERTICAL, width)
+    cost.measure += time.perf_counter() - start
+
+    parent = widget.get_parent()
+    transform = None
+    if parent is not None:
+        found, bounds = widget.compute_bounds(parent)
+        if found:
+            transform = Gsk.Transform().translate(
+                Graphene.Point().init(bounds.get_x(), bounds.get_y())
+            )
+    widget.queue_allocate()
+    start = time.perf_counter()
+    widget.allocate(width, height, -1, transform)
+    cost.allocate += time.perf_counter() - start
+
+    widget.queue_draw()
+    snapshot = Gtk.Snapshot()
+    start = time.perf_counter()
+    Gtk.WidgetPaintable.new(widget).snapshot(snapshot, width, height)
+    node = snapshot.to_node()
+    cost.snapshot += time.perf_counter() - start
+
+    if node is not None:
+        start = time.perf_counter()
+        renderer.render_texture(node, None)
+        cost.renderInclusive += time.perf_counter() - start
+
+
+def settle(context: GLib.MainContext, seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if not context.iteration(False):
+            time.sleep(0.005)
+
+
+def renderOffscreen(
+    config: HyprbarConfig, output: Optional[str], frames: int
+) -> List[WidgetCost]:
+    """
+    Renders the bar described by `config` and profiles every widget.
+
+    Args:
+        config (HyprbarConfig): The validated configuration.
+        output (Optional[str]): PNG file written with the final frame.
+        frames (int): Frames each widget is profiled over.
+
+    Returns:
+        List[WidgetCost]: Per-frame average cost of every widget, in tree order.
+    """
+    Gtk.init()
+    window = Gtk.Window()
+    window.set_name("hyprbar")
+    loadStyle(window.get_display())
+    window.set_default_size(config.window.width, config.window.height)
+    # The tray and the notification daemon stay off the session bus
+    content = buildBarContent(config, offscreen=True)
+    window.set_child(content)
+    renderBatcher.attach(window)
+    window.present()
+
+    context = GLib.MainContext.default()
+    while not content.get_mapped():
+        context.iteration(True)
+    # Let components apply their first values
+    settle(context, SETTLE_SECONDS)
+
+    costs: Dict[Gtk.Widget, WidgetCost] = {}
+    collectWidgets(content, costs)
+    renderer = window.get_renderer()
+    printLog(f"Profiling {len(costs)} widgets over {frames} frames")
+    for _ in range(frames):
+        for widget, cost in costs.items():
+            profileWidget(widget, cost, renderer)
+        # Restore the real layout before the next frame
+        window.queue_allocate()
+        while context.pending():
+            context.iteration(False)
+
+    for cost in costs.values():
+        cost.render = cost.renderInclusive - sum(
+            costs[child].renderInclusive for child in cost.children
+        )
+        for field in ("measure", "allocate", "snapshot", "render"):
+            setattr(cost, field, max(0.0, getattr(cost, field)) / frames)
+
+    if output:
+        snapshot = Gtk.Snapshot()
+        Gtk.WidgetPaintable.new(content).snapshot(
+            snapshot, content.get_width(), content.get_height()
+        )
+        node = snapshot.to_node()
+        if node is not None:
+            renderer.render_texture(node, None).save_to_png(output)
+            printLog(f"Bar rendered to {output}")
+    window.destroy()
+    return list(costs.values())
@@ -0,0 +1,147 @@
+# Data Providers
+#
+# In-process sources for the values that components used to obtain by forking
+# a shell command (`uname -r`, `hostname`, `uptime -p`, ...). Each provider is
+# tagged with how often its value can change, so static values are computed
+# exactly once per process and never re-read on refresh.
+#
+import os
+import pwd
+import socket
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+
+class Volatility(Enum):
+    STATIC = "static"  # cannot change while the bar is running
+    SLOW = "slow"  # changes rarely (minutes or more)
+    DYNAMIC = "dynamic"  # changes on every refresh
+
+
+class Provider:
+    """
+    A named in-process data source.
+
+    Attributes:
+        name (str): Provider identifier used in the config and in the command map
+        volatility (Volatility): How often the value can change
+    """
+
+    def __init__(
+        self, name: str, volatility: Volatility, reader: Callable[[], str]
+    ) -> None:
+        self.name = name
+        self.volatility = volatility
+        self._reader = reader
+        self._value: Optional[str] = None
+
+    @property
+    def isStatic(self) -> bool:
+        return self.volatility is Volatility.STATIC
+
+    def read(self) -> str:
+        if self.isStatic and self._value is not None:
+            return self._value
+        self._value = self._reader()
+        return self._value
+
+
+def readKernelRelease() -> str:
+    return os.uname().release
+
+
+def readKernelName() -> str:
+    return os.uname().sysname
+
+
+def readMachine() -> str:
+    return os.uname().machine
+
+
+def readHostname() -> str:
+    return socket.gethostname()
+
+
+def readUsername() -> str:
+    return pwd.getpwuid(os.getuid()).pw_name
+
+
+def readLoadAvg() -> str:
+    return " ".join(f"{value:.2f}" for value in os.getloadavg())
+
+
+def formatUptime(seconds: float) -> str:
+    """
+    Formats seconds the same way `uptime -p` does, e.g. "up 2 days, 3 hours, 4 minutes".
+    """
+    minutes = int(seconds) // 60
+    units = [
+        ("year", 60 * 24 * 365),
+        ("week", 60 * 24 * 7),
+        ("day", 60 * 24),
+        ("hour", 60),
+        ("minute", 1),
+    ]
+    parts = []
+    for unit, size in units:
+        count, minutes = divmod(minutes, size)
+        if count:
+            parts.append(f"{count} {unit}{'s' if count != 1 else ''}")
+    if not parts:
+        parts.append("0 minutes")
+    return "up " + ", ".join(parts)
+
+
+def readUptime() -> str:
+    with open("/proc/uptime", "r") as f:
+        return formatUptime(float(f.read().split()[0]))
+
+
+PROVIDERS: Dict[str, Provider] = {
+    provider.name: provider
+    for provider in (
+        Provider("kernel", Volatility.STATIC, readKernelRelease),
+        Provider("kernelname", Volatility.STATIC, readKernelName),
+        Provider("machine", Volatility.STATIC, readMachine),
+        Provider("username", Volatility.STATIC, readUsername),
+        Provider("hostname", Volatility.SLOW, readHostname),
+        Provider("uptime", Volatility.SLOW, readUptime),
+        Provider("loadavg", Volatility.DYNAMIC, readLoadAvg),
+    )
+}
+
+# Shell commands whose output is reproduced exactly by a provider
+COMMAND_PROVIDERS: Dict[str, str] = {
+    "uname -r": "kernel",
+    "uname --kernel-release": "kernel",
+    "cat /proc/sys/kernel/osrelease": "kernel",
+    "uname": "kernelname",
+    "uname -s": "kernelname",
+    "uname -m": "machine",
+    "uname -n": "hostname",
+    "hostname": "hostname",
+    "whoami": "username",
+    "id -un": "username",
+    "uptime -p": "uptime",
+}
+
+
+def getProvider(name: str) -> Optional[Provider]:
+    return PROVIDERS.get(name)
+
+
+def resolveProvider(command: Optional[str]) -> Optional[Provider]:
+    """
+    Maps a shell command to the provider that produces the same output.
+
+    Args:
+        command (str): The shell command from the config.
+
+    Returns:
+        Optional[Provider]: The matching provider, or None if the command must be run.
+    """
+    if not command:
+        return None
+    normalized = " ".join(command.split())
+    name = COMMAND_PROVIDERS.get(normalized)
+    return PROVIDERS.get(name) if name else None
@@ -0,0 +1,125 @@
+# Frame-clock Render Batching
+#
+# Components do not touch widgets from their timers and D-Bus callbacks any
+# more; they queue the mutation here instead. Pending mutations are keyed by
+# (widget, key), so a newer update for the same widget property supersedes
+# the older one, and everything still pending is applied once per frame from
+# the window's Gdk.FrameClock "update" phase.
+#
+from typing import Any, Callable, Dict, Optional, Tuple
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Gdk  # pyright: ignore #noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.util import printLog
+
+STATS_INTERVAL = 60  # seconds between coalescing reports
+
+
+class RenderBatcher:
+    """
+    Applies queued widget mutations once per frame.
+
+    Attributes:
+        applied (int): Mutations applied so far
+        coalesced (int): Mutations dropped because a newer one superseded them
+        frames (int): Frames in which at least one mutation was applied
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[Any, str], Tuple[Callable, tuple]] = {}
+        self._frameClock: Optional[Gdk.FrameClock] = None
+        self._idleSourceId: Optional[int] = None
+        self._reported = (0, 0)
+        self.applied = 0
+        self.coalesced = 0
+        self.frames = 0
+
+    def attach(self, window: Gtk.Window) -> None:
+        # The frame clock only exists once the window is realized
+        window.connect("realize", self._onRealize)
+        if window.get_realized():
+            self._onRealize(window)
+        GLib.timeout_add_seconds(STATS_INTERVAL, self._report)
+
+    def schedule(self, widget: Any, key: str, func: Callable, *args: Any) -> None:
+        """
+        Queues func(*args) for the next frame, replacing a pending update
+        with the same widget and key.
+        """
+        pendingKey = (widget, key)
+        if pendingKey in self._pending:
+            self.coalesced += 1
+        self._pending[pendingKey] = (func, args)
+        self._requestFrame()
+
+    def cancel(self, widget: Any, key: Optional[str] = None) -> None:
+        """
+        Drops the pending updates of a widget, or only the one with key,
+        e.g. when a recycled widget is bound to something else.
+        """
+        if key is not None:
+            self._pending.pop((widget, key), None)
+            return
+        for pendingKey in [k for k in self._pending if k[0] is widget]:
+            del self._pending[pendingKey]
+
+    def setText(self, label: Gtk.Label, text: str) -> None:
+        self.schedule(label, "text", label.set_text, text)
+
+    def setCssClass(self, widget: Gtk.Widget, cssClass: str, enabled: bool) -> None:
+        func = widget.add_css_class if enabled else widget.remove_css_class
+        self.schedule(widget, f"css:{cssClass}", func, cssClass)
+
+    def setVisible(self, widget: Gtk.Widget, visible: bool) -> None:
+        self.schedule(widget, "visible", widget.set_visible, visible)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "frames": self.frames,
+            "pending": len(self._pending),
+        }
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+        for (widget, key), (func, args) in pending.items():
+            try:
+                func(*args)
+            except Exception as e:
+                printLog(f"Error applying '{key}' update to {widget}: {e}")
+        self.applied += len(pending)
+        self.frames += 1
+
+    def _onRealize(self, window: Gtk.Window) -> None:
+        self._frameClock = window.get_frame_clock()
+        self._frameClock.connect("update", lambda _: self.flush())
+        if self._pending:
+            self._requestFrame()
+
+    def _requestFrame(self) -> None:
+        if self._frameClock is not None:
+            self._frameClock.request_phase(Gdk.FrameClockPhase.UPDATE)
+        elif self._idleSourceId is None:
+            # No window yet, fall back to a single idle flush
+            self._idleSourceId = GLib.idle_add(self._onIdle)
+
+    def _onIdle(self) -> bool:
+        self._idleSourceId = None
+        self.flush()
+        return False
+
+    def _report(self) -> bool:
+        if (self.applied, self.coalesced) != self._reported:
+            self._reported = (self.applied, self.coalesced)
+            printLog(
+                f"Render batching: {self.applied} updates applied in {self.frames} frames, "
+                f"{self.coalesced} superseded updates coalesced"
+            )
+        return True
+
+
+renderBatcher = RenderBatcher()
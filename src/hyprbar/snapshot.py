@@ -0,0 +1,116 @@
+# Warm-start State Snapshot
+#
+# Persists a compact copy of the last rendered state (windows, tray items,
+# workspaces, static provider values) under $XDG_CACHE_HOME. On start the
+# components render the previous snapshot immediately and then reconcile it
+# with live data. Writes are debounced on the main loop and performed
+# atomically on a background thread, so saving never blocks drawing.
+#
+import os
+import json
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.constants import SNAPSHOT_FILE, APP_VERSION
+from hyprbar.util import printLog
+
+SNAPSHOT_VERSION = 1
+SAVE_DELAY = 2000  # debounce window in milliseconds
+
+
+class StateSnapshot:
+    """
+    Last rendered state, split into named sections owned by components.
+
+    Attributes:
+        path (str): File the snapshot is persisted to
+        previous (Dict[str, Any]): Sections loaded from the previous run
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.previous: Dict[str, Any] = {}
+        self._sections: Dict[str, Any] = {}
+        self._saveSourceId: Optional[int] = None
+        self._writeLock = threading.Lock()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            printLog(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return
+
+        if (
+            data.get("version") != SNAPSHOT_VERSION
+            or data.get("app_version") != APP_VERSION
+        ):
+            printLog("Snapshot was written by another version, ignoring it.")
+            return
+
+        self.previous = data.get("sections", {})
+        # Sections that are not reconciled yet are carried over unchanged
+        self._sections = dict(self.previous)
+        printLog(f"Loaded warm-start snapshot with {list(self.previous)} sections")
+
+    def get(self, section: str, default: Any = None) -> Any:
+        return self.previous.get(section, default)
+
+    def current(self, section: str, default: Any = None) -> Any:
+        return self._sections.get(section, default)
+
+    def update(self, section: str, value: Any) -> None:
+        if self._sections.get(section) == value:
+            return
+        self._sections[section] = value
+        if self._saveSourceId is None:
+            self._saveSourceId = GLib.timeout_add(SAVE_DELAY, self._onSaveTimeout)
+
+    def flush(self) -> None:
+        # Synchronous save, used on shutdown
+        if self._saveSourceId is not None:
+            GLib.source_remove(self._saveSourceId)
+            self._saveSourceId = None
+        self._write(self._serialize())
+
+    def _serialize(self) -> str:
+        return json.dumps(
+            {
+                "version": SNAPSHOT_VERSION,
+                "app_version": APP_VERSION,
+                "sections": self._sections,
+            },
+            separators=(",", ":"),
+        )
+
+    def _onSaveTimeout(self) -> bool:
+        self._saveSourceId = None
+        payload = self._serialize()
+        threading.Thread(target=self._write, args=(payload,), daemon=True).start()
+        return False
+
+    def _write(self, payload: str) -> None:
+        with self._writeLock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                fd, tmpPath = tempfile.mkstemp(
+                    dir=os.path.dirname(self.path), prefix=".snapshot-"
+                )
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmpPath, self.path)
+                except BaseException:
+                    os.unlink(tmpPath)
+                    raise
+            except OSError as e:
+                printLog(f"Error writing snapshot {self.path}: {e}")
+
+
+snapshot = StateSnapshot(SNAPSHOT_FILE)
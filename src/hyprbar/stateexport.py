@@ -0,0 +1,371 @@
+# State Export Stream
+#
+# Read-only subscription stream of the state the bar already tracks, so other
+# desktop tools (eww widgets, lock screen and status scripts) read it from
+# here instead of polling hyprctl and D-Bus themselves (`hyprbar watch`).
+#
+# A subscriber connects to the state socket and sends one JSON line with the
+# topics it wants (all of them when empty):
+#
+#   {"topics": ["workspaces", "activewindow"]}
+#
+# and then only reads. Every message is one JSON line carrying the stream
+# version "v". A hello comes first, then a snapshot of every topic that has a
+# value, then a diff whenever a topic changes:
+#
+#   {"v": 1, "type": "hello", "topics": ["workspaces", "activewindow"]}
+#   {"v": 1, "type": "snapshot", "topic": "workspaces", "seq": 7, "data": {...}}
+#   {"v": 1, "type": "diff", "topic": "workspaces", "seq": 8,
+#    "set": {...}, "del": [...]}
+#
+# Topic values are objects; a diff replaces the keys in "set" and removes the
+# keys in "del", and applies to the value of seq - 1. Publishes are coalesced
+# over PUBLISH_DELAY and every diff is serialized once for all subscribers.
+#
+# Subscribers never block the bar: a subscriber whose socket is full gets no
+# more diffs, only a fresh snapshot of the topics that changed once it has
+# caught up, and is dropped when it stays stuck for STALL_TIMEOUT.
+#
+import json
+import time
+import socket
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.constants import STATE_SOCKET, STATE_TOPICS
+from hyprbar.unixsocket import UnixListener
+from hyprbar.util import printLog
+
+STREAM_VERSION = 1
+PUBLISH_DELAY = 100  # milliseconds during which publishes are coalesced
+MAX_REQUEST = 4096  # longest subscription line accepted
+MAX_BACKLOG = 1 << 20  # bytes queued for one subscriber before dropping it
+STALL_TIMEOUT = 30.0  # seconds a backlogged subscriber may go without reading
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    line = json.dumps({"v": STREAM_VERSION, **message}, separators=(",", ":"))
+    return line.encode() + b"\n"
+
+
+def diffState(
+    old: Dict[str, Any], new: Dict[str, Any]
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Top-level difference between two values of a topic.
+
+    Returns:
+        Tuple[Dict[str, Any], List[str]]: Keys added or changed with their new
+        value, and keys removed.
+    """
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+def applyMessage(
+    state: Dict[str, Dict[str, Any]], message: Dict[str, Any]
+) -> Optional[str]:
+    """
+    Applies a snapshot or diff to the topics of a subscriber.
+
+    Returns:
+        Optional[str]: The topic that changed, None for other messages.
+    """
+    topic = message.get("topic")
+    if message.get("type") == "snapshot":
+        state[topic] = message["data"]  # pyright: ignore # noqa
+    elif message.get("type") == "diff":
+        data = state.setdefault(topic, {})  # pyright: ignore # noqa
+        data.update(message.get("set", {}))
+        for key in message.get("del", []):
+            data.pop(key, None)
+    else:
+        return None
+    return topic
+
+
+def subscribe(
+    topics: Iterable[str], path: str = STATE_SOCKET
+) -> Iterator[Dict[str, Any]]:
+    """
+    Subscribes to a running bar and yields every message until it goes away.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({"topics": list(topics)}).encode() + b"\n")
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+class Subscriber:
+    __slots__ = (
+        "sock",
+        "topics",
+        "request",
+        "backlog",
+        "dirty",
+        "blockedSince",
+        "coalesced",
+        "readSourceId",
+        "writeSourceId",
+    )
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.topics: Optional[Set[str]] = None  # None until the request is read
+        self.request = b""
+        self.backlog = bytearray()  # bytes the socket did not accept yet
+        self.dirty: Set[str] = set()  # topics to resync once caught up
+        self.blockedSince = 0.0
+        self.coalesced = 0  # diffs replaced by a later snapshot
+        self.readSourceId: Optional[int] = None
+        self.writeSourceId: Optional[int] = None
+
+
+class StateExport:
+    """
+    Publishes the state of the bar to the subscribers of the state socket.
+
+    Attributes:
+        path (str): Socket path
+        state (Dict[str, Dict[str, Any]]): Last value of every topic
+        seq (Dict[str, int]): Number of changes of every topic
+    """
+
+    def __init__(self, path: str = STATE_SOCKET) -> None:
+        self.path = path
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self.seq: Dict[str, int] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushSourceId: Optional[int] = None
+        self._listener = UnixListener(path)
+        self._acceptSourceId: Optional[int] = None
+        self._subscribers: Dict[int, Subscriber] = {}
+
+    def publish(self, topic: str, value: Dict[str, Any]) -> None:
+        """
+        Sets the value of a topic. The value is only read at the next flush
+        and must not be mutated afterwards.
+        """
+        self._pending[topic] = value
+        if self._flushSourceId is None:
+            self._flushSourceId = GLib.timeout_add(PUBLISH_DELAY, self._onFlush)
+
+    def publishKey(self, topic: str, key: str, value: Any) -> None:
+        # One key of a topic shared by several components, e.g. metrics
+        current = self._pending.get(topic)
+        if current is None:
+            current = dict(self.state.get(topic, {}))
+        current[key] = value
+        self.publish(topic, current)
+
+    def start(self) -> None:
+        # Called by the primary instance only, see bar.onStartup
+        if self._acceptSourceId is not None or not self._listener.bind():
+            return
+        self._acceptSourceId = GLib.io_add_watch(
+            self._listener.sock.fileno(),  # pyright: ignore # noqa
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN,
+            self._onAccept,
+        )
+        printLog(f"State stream listening at {self.path}")
+
+    def stop(self) -> None:
+        for subscriber in list(self._subscribers.values()):
+            self._drop(subscriber)
+        if self._acceptSourceId is not None:
+            GLib.source_remove(self._acceptSourceId)
+            self._acceptSourceId = None
+        # Only removes the socket if this process bound it
+        self._listener.close()
+
+    def _onFlush(self) -> bool:
+        self._flushSourceId = None
+        pending, self._pending = self._pending, {}
+        for topic, value in pending.items():
+            old = self.state.get(topic)
+            if old == value:
+                continue
+            self.state[topic] = value
+            self.seq[topic] = self.seq.get(topic, 0) + 1
+            subscribers = [
+                subscriber
+                for subscriber in self._subscribers.values()
+                if subscriber.topics is not None and topic in subscriber.topics
+            ]
+            if not subscribers:
+                continue
+            if old is None:
+                line = self._snapshotLine(topic)
+            else:
+                changed, removed = diffState(old, value)
+                line = encode(
+                    {
+                        "type": "diff",
+                        "topic": topic,
+                        "seq": self.seq[topic],
+                        "set": changed,
+                        "del": removed,
+                    }
+                )
+            for subscriber in subscribers:
+                self._deliver(subscriber, topic, line)
+        return False
+
+    def _snapshotLine(self, topic: str) -> bytes:
+        return encode(
+            {
+                "type": "snapshot",
+                "topic": topic,
+                "seq": self.seq[topic],
+                "data": self.state[topic],
+            }
+        )
+
+    def _deliver(self, subscriber: Subscriber, topic: str, line: bytes) -> None:
+        if not subscriber.backlog:
+            self._write(subscriber, line)
+            return
+        # Still behind: the diff is dropped, a snapshot replaces it later
+        if time.monotonic() - subscriber.blockedSince > STALL_TIMEOUT:
+            self._drop(subscriber, f"not reading for {STALL_TIMEOUT:.0f} s")
+            return
+        subscriber.dirty.add(topic)
+        subscriber.coalesced += 1
+
+    def _write(self, subscriber: Subscriber, data: bytes) -> None:
+        if subscriber.backlog:
+            subscriber.backlog += data
+            if len(subscriber.backlog) > MAX_BACKLOG:
+                self._drop(subscriber, "backlog too large")
+            return
+        try:
+            sent = subscriber.sock.send(data)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(subscriber)
+            return
+        if sent == len(data):
+            return
+        subscriber.backlog += data[sent:]
+        subscriber.blockedSince = time.monotonic()
+        subscriber.writeSourceId = GLib.io_add_watch(
+            subscriber.sock.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.OUT,
+            self._onWritable,
+        )
+
+    def _onWritable(self, fd: int, condition: GLib.IOCondition) -> bool:
+        subscriber = self._subscribers.get(fd)
+        if subscriber is None:
+            return False
+        try:
+            sent = subscriber.sock.send(subscriber.backlog)
+        except BlockingIOError:
+            return True
+        except OSError:
+            subscriber.writeSourceId = None
+            self._drop(subscriber)
+            return False
+        del subscriber.backlog[:sent]
+        if subscriber.backlog:
+            return True
+        subscriber.writeSourceId = None
+        # Caught up: one snapshot per topic that changed in the meantime
+        dirty, subscriber.dirty = subscriber.dirty, set()
+        for topic in sorted(dirty):
+            self._write(subscriber, self._snapshotLine(topic))
+        return False
+
+    def _onAccept(self, fd: int, condition: GLib.IOCondition) -> bool:
+        if self._listener.sock is None:
+            return False
+        try:
+            client, _ = self._listener.sock.accept()
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            printLog(f"Error accepting state subscriber: {e}")
+            return True
+        client.setblocking(False)
+        subscriber = Subscriber(client)
+        self._subscribers[client.fileno()] = subscriber
+        subscriber.readSourceId = GLib.io_add_watch(
+            client.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+            self._onReadable,
+        )
+        return True
+
+    def _onReadable(self, fd: int, condition: GLib.IOCondition) -> bool:
+        subscriber = self._subscribers.get(fd)
+        if subscriber is None:
+            return False
+        try:
+            data = subscriber.sock.recv(MAX_REQUEST)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+        if not data:
+            subscriber.readSourceId = None
+            self._drop(subscriber)
+            return False
+        if subscriber.topics is not None:
+            return True  # The stream is read-only, anything else is ignored
+
+        subscriber.request += data
+        if b"\n" not in subscriber.request:
+            if len(subscriber.request) > MAX_REQUEST:
+                subscriber.readSourceId = None
+                self._drop(subscriber, "subscription request too long")
+                return False
+            return True
+        line = subscriber.request.split(b"\n", 1)[0]
+        subscriber.request = b""
+        try:
+            topics = json.loads(line).get("topics") or list(STATE_TOPICS)
+            unknown = [topic for topic in topics if topic not in STATE_TOPICS]
+        except (ValueError, AttributeError, TypeError) as e:
+            unknown = [f"invalid request: {e}"]
+        if unknown:
+            error = {"type": "error", "error": f"unknown topics {unknown}"}
+            self._write(subscriber, encode(error))
+            subscriber.readSourceId = None
+            self._drop(subscriber)
+            return False
+
+        subscriber.topics = set(topics)
+        self._write(subscriber, encode({"type": "hello", "topics": sorted(topics)}))
+        for topic in sorted(subscriber.topics):
+            if topic in self.state:
+                self._write(subscriber, self._snapshotLine(topic))
+        return True
+
+    def _drop(self, subscriber: Subscriber, reason: Optional[str] = None) -> None:
+        fd = subscriber.sock.fileno()
+        if self._subscribers.get(fd) is not subscriber:
+            return
+        del self._subscribers[fd]
+        for sourceId in (subscriber.readSourceId, subscriber.writeSourceId):
+            if sourceId is not None:
+                GLib.source_remove(sourceId)
+        subscriber.readSourceId = subscriber.writeSourceId = None
+        subscriber.sock.close()
+        if reason:
+            printLog(
+                f"Dropped state subscriber ({reason}) after coalescing "
+                f"{subscriber.coalesced} updates"
+            )
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+stateExport = StateExport()
@@ -0,0 +1,312 @@
+# Sysfs and Procfs Readers
+#
+# Hardware values (hwmon temperatures, backlight brightness) are read through
+# file descriptors opened once and re-read with os.pread at offset 0, which
+# makes the kernel regenerate the attribute: no reopen, no subprocess and no
+# sensors walk on every refresh. Disk usage comes from os.statvfs, throttled
+# to a minimum interval.
+#
+# Every path is resolved under a root directory ("/" by default), so the
+# readers work the same against a fixture tree that stands in for /sys:
+#
+#   python -m hyprbar.sysfs
+#
+import os
+import glob
+import time
+from typing import Dict, List, Optional
+
+READ_SIZE = 64  # sysfs attributes read here are a single short line
+MIN_DISK_INTERVAL = 5.0  # seconds between two statvfs calls for the same path
+# hwmon chips preferred for the CPU temperature when no sensor is configured
+CPU_SENSORS = ("coretemp", "k10temp", "zenpower", "cpu_thermal", "acpitz")
+
+
+class SysfsReader:
+    """
+    Reads sysfs attributes through persistent file descriptors.
+
+    Attributes:
+        root (str): Directory standing in for "/", e.g. a fixture tree
+    """
+
+    def __init__(self, root: str = "/") -> None:
+        self.root = root
+        self._fds: Dict[str, int] = {}
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def glob(self, *parts: str) -> List[str]:
+        return sorted(glob.glob(self.path(*parts)))
+
+    def readText(self, path: str) -> str:
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+            self._fds[path] = fd
+        try:
+            return os.pread(fd, READ_SIZE, 0).decode().strip()
+        except OSError:
+            # The device went away (e.g. ENODEV): reopen on the next read
+            self.forget(path)
+            raise
+
+    def readInt(self, path: str) -> int:
+        return int(self.readText(path))
+
+    def forget(self, path: str) -> None:
+        fd = self._fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def close(self) -> None:
+        for path in list(self._fds):
+            self.forget(path)
+
+    @property
+    def openFiles(self) -> int:
+        return len(self._fds)
+
+
+reader = SysfsReader()
+
+
+class TemperatureSensor:
+    """
+    One hwmon temperature input.
+
+    Attributes:
+        path (str): The temp*_input attribute
+        name (str): hwmon chip name, plus the input label when there is one
+    """
+
+    __slots__ = ("reader", "path", "name")
+
+    def __init__(self, reader: SysfsReader, path: str, name: str) -> None:
+        self.reader = reader
+        self.path = path
+        self.name = name
+
+    def read(self) -> float:
+        # hwmon reports millidegrees Celsius
+        return self.reader.readInt(self.path) / 1000
+
+
+def findTemperatureSensor(
+    reader: SysfsReader, sensor: Optional[str] = None, label: Optional[str] = None
+) -> Optional[TemperatureSensor]:
+    """
+    Finds a hwmon temperature input, once, at component creation.
+
+    Args:
+        reader (SysfsReader): Reader whose root holds sys/class/hwmon.
+        sensor (Optional[str]): hwmon chip name (coretemp, k10temp, nvme...),
+            by default the first known CPU chip, or else the first chip.
+        label (Optional[str]): temp*_label of the input (e.g. "Package id 0"),
+            by default the first input of the chip.
+
+    Returns:
+        Optional[TemperatureSensor]: The sensor, or None if nothing matches.
+    """
+    chips = []
+    for directory in reader.glob("sys", "class", "hwmon", "hwmon*"):
+        try:
+            with open(os.path.join(directory, "name"), "r") as f:
+                chips.append((f.read().strip(), directory))
+        except OSError:
+            continue
+    if sensor is not None:
+        chips = [chip for chip in chips if chip[0] == sensor]
+    else:
+        chips.sort(key=lambda chip: chip[0] not in CPU_SENSORS)
+
+    for name, directory in chips:
+        for path in sorted(glob.glob(os.path.join(directory, "temp*_input"))):
+            inputLabel = None
+            try:
+                with open(path.replace("_input", "_label"), "r") as f:
+                    inputLabel = f.read().strip()
+            except OSError:
+                pass
+            if label is not None and inputLabel != label:
+                continue
+            return TemperatureSensor(
+                reader, path, f"{name}/{inputLabel}" if inputLabel else name
+            )
+    return None
+
+
+class Backlight:
+    """
+    A backlight device of /sys/class/backlight.
+
+    Attributes:
+        directory (str): The device directory
+        maximum (int): max_brightness, read once
+    """
+
+    __slots__ = ("reader", "directory", "maximum")
+
+    def __init__(self, reader: SysfsReader, directory: str) -> None:
+        self.reader = reader
+        self.directory = directory
+        self.maximum = reader.readInt(os.path.join(directory, "max_brightness"))
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.directory)
+
+    @property
+    def watchedFiles(self) -> List[str]:
+        # brightness changes on writes, actual_brightness on hardware keys
+        return [
+            os.path.join(self.directory, "brightness"),
+            os.path.join(self.directory, "actual_brightness"),
+        ]
+
+    def read(self) -> float:
+        # Brightness in percent of max_brightness
+        try:
+            value = self.reader.readInt(
+                os.path.join(self.directory, "actual_brightness")
+            )
+        except OSError:
+            value = self.reader.readInt(os.path.join(self.directory, "brightness"))
+        return value * 100 / self.maximum if self.maximum else 0.0
+
+
+def findBacklight(
+    reader: SysfsReader, device: Optional[str] = None
+) -> Optional[Backlight]:
+    for directory in reader.glob("sys", "class", "backlight", device or "*"):
+        try:
+            return Backlight(reader, directory)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+class DiskStats:
+    __slots__ = ("total", "used", "free", "percent")
+
+    def __init__(self, total: int, used: int, free: int) -> None:
+        self.total = total
+        self.used = used
+        self.free = free
+        # Like df: reserved blocks count neither as used nor as available
+        self.percent = used * 100 / (used + free) if used + free else 0.0
+
+
+class DiskUsage:
+    """
+    Usage of the filesystem holding `path`, at most once per interval.
+
+    Attributes:
+        path (str): Any path on the filesystem
+        minInterval (float): Seconds during which the last statvfs is reused
+    """
+
+    __slots__ = ("path", "minInterval", "_last", "_stats")
+
+    def __init__(self, path: str, minInterval: float = MIN_DISK_INTERVAL) -> None:
+        self.path = path
+        self.minInterval = minInterval
+        self._last = 0.0
+        self._stats: Optional[DiskStats] = None
+
+    def read(self) -> DiskStats:
+        now = time.monotonic()
+        if self._stats is None or now - self._last >= self.minInterval:
+            st = os.statvfs(self.path)
+            self._stats = DiskStats(
+                total=st.f_blocks * st.f_frsize,
+                used=(st.f_blocks - st.f_bfree) * st.f_frsize,
+                free=st.f_bavail * st.f_frsize,
+            )
+            self._last = now
+        return self._stats
+
+
+def formatSize(size: float) -> str:
+    for unit in ("B", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def writeFixtureTree(root: str) -> None:
+    """
+    Writes a minimal /sys under `root`: two hwmon chips and a backlight.
+    """
+    files = {
+        "sys/class/hwmon/hwmon0/name": "nvme",
+        "sys/class/hwmon/hwmon0/temp1_input": "38850",
+        "sys/class/hwmon/hwmon0/temp1_label": "Composite",
+        "sys/class/hwmon/hwmon1/name": "coretemp",
+        "sys/class/hwmon/hwmon1/temp1_input": "52000",
+        "sys/class/hwmon/hwmon1/temp1_label": "Package id 0",
+        "sys/class/hwmon/hwmon1/temp2_input": "49000",
+        "sys/class/hwmon/hwmon1/temp2_label": "Core 0",
+        "sys/class/backlight/intel_backlight/max_brightness": "96000",
+        "sys/class/backlight/intel_backlight/brightness": "48000",
+        "sys/class/backlight/intel_backlight/actual_brightness": "48000",
+    }
+    for relative, value in files.items():
+        setFixtureValue(root, relative, value)
+
+
+def setFixtureValue(root: str, relative: str, value: str) -> None:
+    # Rewritten in place, like sysfs: open descriptors see the new value
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{value}\n")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="hyprbar-sysfs-") as root:
+        writeFixtureTree(root)
+        fixture = SysfsReader(root)
+        cpu = findTemperatureSensor(fixture)
+        nvme = findTemperatureSensor(fixture, sensor="nvme")
+        core = findTemperatureSensor(fixture, sensor="coretemp", label="Core 0")
+        backlight = findBacklight(fixture)
+        assert cpu and nvme and core and backlight
+        print(f"{cpu.name}: {cpu.read():.1f}°C")
+        print(f"{nvme.name}: {nvme.read():.1f}°C")
+        print(f"{core.name}: {core.read():.1f}°C")
+        print(f"{backlight.name}: {backlight.read():.0f}%")
+
+        setFixtureValue(root, "sys/class/hwmon/hwmon1/temp1_input", "71500")
+        setFixtureValue(
+            root, "sys/class/backlight/intel_backlight/actual_brightness", "24000"
+        )
+        print(f"after update: {cpu.read():.1f}°C, {backlight.read():.0f}%")
+        print(f"open descriptors: {fixture.openFiles}")
+
+        reads = 100_000
+        start = time.perf_counter()
+        for _ in range(reads):
+            cpu.read()
+        preadTime = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(reads):
+            with open(cpu.path, "r") as f:
+                int(f.read()) / 1000
+        openTime = time.perf_counter() - start
+        print(
+            f"pread: {preadTime * 1e6 / reads:.2f} µs/read, "
+            f"open+read: {openTime * 1e6 / reads:.2f} µs/read"
+        )
+        fixture.close()
+
+    disk = DiskUsage("/")
+    stats = disk.read()
+    print(
+        f"/: {formatSize(stats.used)} used of {formatSize(stats.total)}, "
+        f"{formatSize(stats.free)} free ({stats.percent:.0f}%)"
+    )
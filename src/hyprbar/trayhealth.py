@@ -0,0 +1,158 @@
+# Tray Item Health
+#
+# Per-item circuit breaker for StatusNotifierItem applications. Every D-Bus
+# call to an item is timed; an item that does not answer several calls in a
+# row (timeouts, NoReply) is degraded: it keeps its last good icon, and
+# clicks, menus and property refreshes are rejected at once instead of
+# waiting on it again. A single probe is sent after a backoff that doubles
+# with every failed probe; the first answer restores the item.
+#
+# Calls answered with an error (e.g. an item without Activate) still prove
+# that the application is alive: they are counted but do not trip the
+# breaker. Errors sent by the bus daemon itself because the application is
+# gone (ServiceUnknown, NameHasNoOwner) prove nothing and count as
+# unanswered calls.
+#
+import time
+from typing import Dict, Optional
+from hyprbar.util import printLog
+
+FAILURE_THRESHOLD = 3  # consecutive unanswered calls before degrading
+CALL_TIMEOUT_MS = 2000  # timeout of every call to an item
+PROBE_MIN_MS = 1000
+PROBE_MAX_MS = 300000
+LATENCY_WEIGHT = 0.2  # weight of the newest sample in the average latency
+# Remote errors that mean the item did not answer at all
+UNANSWERED_ERRORS = (
+    "org.freedesktop.DBus.Error.NoReply",
+    "org.freedesktop.DBus.Error.ServiceUnknown",
+    "org.freedesktop.DBus.Error.NameHasNoOwner",
+)
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"  # calls rejected, waiting for the next probe
+PROBING = "probing"  # one probe in flight, calls still rejected
+
+
+class ItemHealth:
+    """
+    Health of one tray item.
+
+    Attributes:
+        name (str): Item address, used in logs
+        state (str): HEALTHY, DEGRADED or PROBING
+        latency (float): Moving average of the answer time, in ms
+        probeDelay (int): Delay before the next probe, in ms
+    """
+
+    __slots__ = (
+        "name",
+        "state",
+        "calls",
+        "timeouts",
+        "errors",
+        "rejected",
+        "trips",
+        "consecutive",
+        "latency",
+        "maxLatency",
+        "probeDelay",
+        "since",
+    )
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = HEALTHY
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.rejected = 0
+        self.trips = 0
+        self.consecutive = 0  # unanswered calls in a row
+        self.latency = 0.0
+        self.maxLatency = 0.0
+        self.probeDelay = PROBE_MIN_MS
+        self.since = time.monotonic()
+
+    def allow(self) -> bool:
+        if self.state == HEALTHY:
+            return True
+        self.rejected += 1
+        return False
+
+    def startProbe(self) -> None:
+        self.state = PROBING
+
+    def answered(self, latency: float, error: Optional[str] = None) -> bool:
+        """
+        Records an answer, returns True if it restored a degraded item.
+        """
+        self._sample(latency)
+        if error is not None:
+            self.errors += 1
+        self.consecutive = 0
+        if self.state == HEALTHY:
+            return False
+        printLog(
+            f"Tray item {self.name} answered again after "
+            f"{time.monotonic() - self.since:.0f} s, restoring it"
+        )
+        self.state = HEALTHY
+        self.probeDelay = PROBE_MIN_MS
+        self.since = time.monotonic()
+        return True
+
+    def failed(self, latency: float, reason: str) -> bool:
+        """
+        Records an unanswered call, returns True if the item is now degraded
+        and a probe must be scheduled after probeDelay.
+        """
+        self._sample(latency)
+        self.timeouts += 1
+        self.consecutive += 1
+        if self.state == PROBING:
+            self.state = DEGRADED
+            self.probeDelay = min(self.probeDelay * 2, PROBE_MAX_MS)
+            printLog(
+                f"Probe of tray item {self.name} failed ({reason}), "
+                f"next probe in {self.probeDelay / 1000:.0f} s"
+            )
+            return True
+        if self.state == HEALTHY and self.consecutive >= FAILURE_THRESHOLD:
+            self.state = DEGRADED
+            self.trips += 1
+            self.since = time.monotonic()
+            printLog(
+                f"Tray item {self.name} did not answer {self.consecutive} calls "
+                f"({reason}), degrading it; probing in {self.probeDelay / 1000:.0f} s"
+            )
+            return True
+        return False
+
+    def _sample(self, latency: float) -> None:
+        self.calls += 1
+        self.maxLatency = max(self.maxLatency, latency)
+        if self.calls == 1:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_WEIGHT * (latency - self.latency)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "trips": self.trips,
+            "latency_ms": round(self.latency, 1),
+            "max_latency_ms": round(self.maxLatency, 1),
+        }
+
+    def describe(self) -> str:
+        return (
+            f"{self.name}: {self.state}, {self.calls} calls, "
+            f"{self.latency:.1f} ms avg / {self.maxLatency:.0f} ms max, "
+            f"{self.timeouts} timeouts, {self.errors} errors, "
+            f"{self.rejected} rejected, {self.trips} trips"
+        )
@@ -1,21 +1,137 @@
+import time
+import base64
 import gi
 
 gi.require_version("Gtk", "4.0")
-gi.require_version("GdkPixbuf", "2.0")
-from gi.repository import Gtk, Gio, GLib, GdkPixbuf, Gdk  # pyright: ignore # noqa
+from gi.repository import Gtk, Gio, GLib, Gdk  # pyright: ignore # noqa
 from hyprbar.util import printLog
+from hyprbar.snapshot import snapshot
+from hyprbar.stateexport import stateExport
+from hyprbar.render import renderBatcher
+from hyprbar.dbusmenu import DBusMenuClient
+from hyprbar.trayhealth import (
+    CALL_TIMEOUT_MS,
+    HEALTHY,
+    PROBE_MAX_MS,
+    PROBE_MIN_MS,
+    UNANSWERED_ERRORS,
+    ItemHealth,
+)
+
+SNI_INTERFACE = "org.freedesktop.StatusNotifierItem"
+ICON_SIZE = 24  # logical pixels, pixmaps are picked for the monitor scale
+# Signals that follow each other within this window are fetched together
+REFRESH_DEBOUNCE_MS = 50
+HEALTH_REPORT_INTERVAL = 300  # seconds between tray health reports
+# GetAll attempts for a new item before giving up on it; the delay between
+# attempts doubles from PROBE_MIN_MS, so this is about a minute
+ADD_MAX_ATTEMPTS = 6
+# Properties that may have changed when an SNI New* signal is emitted.
+# GDBusProxy does not refresh its cache for these signals.
+SIGNAL_PROPERTIES = {
+    "NewIcon": ("IconName", "IconPixmap"),
+    "NewAttentionIcon": ("AttentionIconName", "AttentionIconPixmap"),
+    "NewOverlayIcon": ("OverlayIconName", "OverlayIconPixmap"),
+    "NewTitle": ("Title",),
+}
+SIGNAL_PROPERTY_NAMES = {name for names in SIGNAL_PROPERTIES.values() for name in names}
+ICON_PROPERTIES = {"IconName", "IconPixmap", "AttentionIconName", "AttentionIconPixmap"}
 
 
 class TrayIconManager:
-    def __init__(self, tray_box: Gtk.Box):
+    def __init__(self, tray_box: Gtk.Box, connect: bool = True):
         self.tray_box = tray_box
         self.status_notifier_items = {}  # full_item_address -> {proxy, widget, signals_ids, etc.}
         self._dbus_connection = None
         self._watcher_proxy = None
         self._watcher_signal_handlers = []
-
+        self._placeholders = {}  # item id -> Gtk.Image drawn from the snapshot
+        self._health = {}  # full_item_address -> ItemHealth
+        self._pending_items = {}  # full_item_address -> retry source id or 0
+        self._add_attempts = {}  # full_item_address -> failed GetAll calls
+        # Items registered at startup that were neither shown nor given up yet;
+        # the placeholders of the items still missing are dropped after them
+        self._initial_items = set()
+
+        self._init_placeholders()
+        if not connect:
+            return  # Offscreen rendering: only the snapshot icons, no host
         self._init_dbus()
         self._init_watcher()
+        if not self._initial_items:
+            self._drop_stale_placeholders()
+        GLib.timeout_add_seconds(HEALTH_REPORT_INTERVAL, self._report_health)
+
+    def _init_placeholders(self):
+        # Draw the tray items of the last run before any D-Bus round trip
+        for entry in snapshot.get("tray", []):
+            icon_widget = Gtk.Image(pixel_size=ICON_SIZE)
+            self._apply_snapshot_icon(icon_widget, entry.get("icon"))
+            self.tray_box.append(icon_widget)
+            self._placeholders[entry["id"]] = icon_widget
+
+    def _drop_stale_placeholders(self):
+        for item_id, icon_widget in self._placeholders.items():
+            printLog(f"Tray item '{item_id}' from the snapshot is gone, removing it.")
+            if icon_widget.get_parent():
+                self.tray_box.remove(icon_widget)
+        self._placeholders.clear()
+        self._publish_snapshot()
+
+    def _initial_item_settled(self, full_item_address: str):
+        # Shown, given up or unregistered: no placeholder is waiting for it
+        if full_item_address not in self._initial_items:
+            return
+        self._initial_items.discard(full_item_address)
+        if not self._initial_items:
+            self._drop_stale_placeholders()
+
+    def _apply_snapshot_icon(self, icon_widget: Gtk.Image, icon):
+        if icon and "pixmap" in icon:
+            w, h, encoded = icon["pixmap"]
+            data = base64.b64decode(encoded)
+            if len(data) == w * h * 4:
+                icon_widget.set_from_paintable(
+                    self._texture_from_argb(w, h, GLib.Bytes.new(data))
+                )
+                return
+        if icon and "name" in icon:
+            icon_widget.set_from_icon_name(icon["name"])
+            return
+        icon_widget.set_from_icon_name("application-x-executable")
+
+    def _publish_snapshot(self):
+        snapshot.update(
+            "tray",
+            [
+                {"id": item_data["id"], "icon": item_data["icon"]}
+                for item_data in self.status_notifier_items.values()
+                if item_data.get("id")
+            ],
+        )
+        self._publish_state()
+
+    def _publish_state(self):
+        # Tray topic of the state stream: what the item shows, not its pixels,
+        # and its call statistics as of the last change or health report
+        def string_property(proxy, name):
+            value = proxy.get_cached_property(name)
+            return value.get_string() if value is not None else ""
+
+        stateExport.publish(
+            "tray",
+            {
+                address: {
+                    "id": item_data["id"] or "",
+                    "title": string_property(item_data["proxy"], "Title"),
+                    "status": string_property(item_data["proxy"], "Status"),
+                    "icon_name": string_property(item_data["proxy"], "IconName"),
+                    "health": item_data["health"].state,
+                    "health_stats": item_data["health"].stats(),
+                }
+                for address, item_data in self.status_notifier_items.items()
+            },
+        )
 
     def _init_dbus(self):
         try:
@@ -127,10 +243,11 @@ class TrayIconManager:
             if registered_items_variant:
                 item_addresses = registered_items_variant.get_strv()
                 printLog(f"Initial tray items: {item_addresses}")
+                self._initial_items.update(item_addresses)
                 for address in item_addresses:
                     # Use GLib.idle_add to queue the addition in the main loop,
                     # ensuring that subsequent UI and D-Bus operations are well-behaved.
-                    GLib.idle_add(self._add_tray_item, address)
+                    GLib.idle_add(self._add_initial_tray_item, address)
             else:
                 printLog(
                     "No tray items initially registered or property not available."
@@ -148,6 +265,12 @@ class TrayIconManager:
             printLog(f"D-Bus Signal: Item Unregistered: {full_item_address}")
             GLib.idle_add(self._remove_tray_item, full_item_address)
 
+    def _add_initial_tray_item(self, full_item_address: str):
+        self._add_tray_item(full_item_address)
+        if full_item_address not in self._pending_items:
+            self._initial_item_settled(full_item_address)  # Failed before GetAll
+        return False
+
     def _add_tray_item(self, full_item_address: str):
         if not self._dbus_connection:
             printLog(f"Cannot add {full_item_address}: D-Bus connection lost.")
@@ -168,7 +291,10 @@ class TrayIconManager:
             object_path = "/StatusNotifierItem"
 
         # The key for status_notifier_items should be unique. full_item_address is ideal.
-        if full_item_address in self.status_notifier_items:
+        if (
+            full_item_address in self.status_notifier_items
+            or full_item_address in self._pending_items
+        ):
             printLog(f"Item {full_item_address} already added (using original key).")
             return
 
@@ -190,18 +316,19 @@ class TrayIconManager:
                 )
                 return
 
-        item_interface_name = "org.freedesktop.StatusNotifierItem"
         try:
             printLog(
                 f"Trying to create proxy for service: '{service_name}', path: '{object_path}'"
             )
+            # Properties are fetched below with a timeout: creating the proxy
+            # only talks to the bus, never to the (possibly wedged) item
             item_proxy = Gio.DBusProxy.new_sync(
                 self._dbus_connection,
-                Gio.DBusProxyFlags.NONE,
+                Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES,
                 None,  # info
                 service_name,  # Parsed D-Bus bus name
                 object_path,  # Parsed D-Bus object path
-                item_interface_name,  # Interface
+                SNI_INTERFACE,  # Interface
                 None,  # cancellable
             )
         except (
@@ -225,9 +352,87 @@ class TrayIconManager:
             )
             return
 
-        icon_widget = Gtk.Image(pixel_size=24)
-        self._update_item_icon(item_proxy, icon_widget)
-        self._update_item_tooltip(item_proxy, icon_widget)
+        health = self._health.setdefault(
+            full_item_address, ItemHealth(full_item_address)
+        )
+        # Retries of a degraded item are its probes
+        probe = health.state != HEALTHY
+        if probe:
+            health.startProbe()
+        self._pending_items[full_item_address] = 0
+        self._call_item(
+            health,
+            service_name,
+            object_path,
+            "org.freedesktop.DBus.Properties",
+            "GetAll",
+            GLib.Variant("(s)", (SNI_INTERFACE,)),
+            GLib.VariantType("(a{sv})"),
+            self._on_new_item_properties,
+            (full_item_address, service_name, object_path, item_proxy),
+            probe=probe,
+        )
+        return False
+
+    def _on_new_item_properties(self, reply, error, user_data):
+        full_item_address, service_name, object_path, item_proxy = user_data
+        if full_item_address not in self._pending_items:
+            return  # Unregistered while the call was in flight
+        if reply is None:
+            # Errors answered by the item reset its probe delay, so the
+            # retries keep their own backoff and a limit
+            attempts = self._add_attempts.get(full_item_address, 0) + 1
+            if attempts >= ADD_MAX_ATTEMPTS:
+                printLog(
+                    f"Cannot read tray item {full_item_address} after "
+                    f"{attempts} attempts, giving up: {error}"
+                )
+                del self._pending_items[full_item_address]
+                self._add_attempts.pop(full_item_address, None)
+                self._health.pop(full_item_address, None)
+                self._initial_item_settled(full_item_address)
+                return
+            self._add_attempts[full_item_address] = attempts
+            delay = min(PROBE_MIN_MS << (attempts - 1), PROBE_MAX_MS)
+            printLog(
+                f"Cannot read tray item {full_item_address}: {error}, "
+                f"retrying in {delay / 1000:.0f} s"
+            )
+            self._pending_items[full_item_address] = GLib.timeout_add(
+                delay, self._retry_tray_item, full_item_address
+            )
+            return
+        del self._pending_items[full_item_address]
+        self._add_attempts.pop(full_item_address, None)
+        properties = reply.get_child_value(0)
+        for i in range(properties.n_children()):
+            entry = properties.get_child_value(i)
+            item_proxy.set_cached_property(
+                entry.get_child_value(0).get_string(),
+                entry.get_child_value(1).get_variant(),
+            )
+        self._show_tray_item(full_item_address, service_name, object_path, item_proxy)
+        self._initial_item_settled(full_item_address)
+
+    def _retry_tray_item(self, full_item_address: str):
+        self._pending_items.pop(full_item_address, None)
+        self._add_tray_item(full_item_address)
+        if full_item_address not in self._pending_items:
+            self._initial_item_settled(full_item_address)  # Failed before GetAll
+        return False
+
+    def _show_tray_item(
+        self, full_item_address: str, service_name: str, object_path: str, item_proxy
+    ):
+        item_id_variant = item_proxy.get_cached_property("Id")
+        item_id = item_id_variant.get_string() if item_id_variant else None
+
+        # Reuse the snapshot placeholder so the item keeps its position
+        icon_widget = self._placeholders.pop(item_id, None) if item_id else None
+        is_placeholder = icon_widget is not None
+        if icon_widget is None:
+            icon_widget = Gtk.Image(pixel_size=ICON_SIZE)
+        icon = self._update_item_icon(item_proxy, icon_widget)
 
         event_controller = Gtk.GestureClick.new()
         # Pass item_proxy and icon_widget as user_data to the callback
@@ -236,21 +441,44 @@ class TrayIconManager:
         )
         icon_widget.add_controller(event_controller)
 
-        self.tray_box.append(icon_widget)
+        if not is_placeholder:
+            self.tray_box.append(icon_widget)
 
         item_data = {
             "proxy": item_proxy,
             "widget": icon_widget,
+            "id": item_id,
+            "icon": icon,  # last applied icon, persisted in the snapshot
             "original_address": full_item_address,
             "service_name": service_name,  # Store the parsed service name
             "object_path": object_path,  # Store the parsed object path
             "signal_handler_id": None,
             "event_controller": event_controller,
+            "pending_properties": set(),  # changed properties not fetched yet
+            "menu_client": None,  # DBusMenuClient, created on first menu request
+            "refresh_source_id": None,
+            "probe_source_id": None,  # next probe while the item is degraded
+            "health": self._health[full_item_address],
+            "tooltip": None,  # markup, built on the first hover
+            "tooltip_stale": False,  # NewToolTip seen, fetch it on next hover
+            "tooltip_fetching": False,
         }
 
         # Pass item_data to the item signal callback
         handler_id = item_proxy.connect("g-signal", self._on_item_signal, item_data)
         item_data["signal_handler_id"] = handler_id
+        # Tooltips are built when hovered, not on every NewToolTip
+        icon_widget.set_has_tooltip(True)
+        item_data["tooltip_handler_id"] = icon_widget.connect(
+            "query-tooltip", self._on_query_tooltip, item_data
+        )
+        # Pick another pixmap when the bar moves to a monitor with another scale
+        icon_widget.connect(
+            "notify::scale-factor",
+            lambda widget, _: renderBatcher.schedule(
+                widget, "icon", self._refresh_item_icon, item_data
+            ),
+        )
 
         self.status_notifier_items[full_item_address] = (
             item_data  # Use full_item_address as key
@@ -258,13 +486,32 @@ class TrayIconManager:
         printLog(
             f"Added tray item: {full_item_address} (Service: {service_name}, Path: {object_path})"
         )
+        self._publish_snapshot()
 
     def _remove_tray_item(self, full_item_address: str):
+        self._health.pop(full_item_address, None)
+        self._add_attempts.pop(full_item_address, None)
+        self._initial_item_settled(full_item_address)
+        if full_item_address in self._pending_items:
+            retry_source_id = self._pending_items.pop(full_item_address)
+            if retry_source_id:
+                GLib.source_remove(retry_source_id)
+            printLog(f"Removed tray item before it was shown: {full_item_address}")
+            return
         if full_item_address in self.status_notifier_items:
             item_data = self.status_notifier_items.pop(full_item_address)
             widget = item_data["widget"]
             proxy = item_data["proxy"]
 
+            for source in ("refresh_source_id", "probe_source_id"):
+                if item_data.get(source):
+                    GLib.source_remove(item_data[source])
+                    item_data[source] = None
+
+            if item_data.get("menu_client"):
+                item_data["menu_client"].destroy()
+                item_data["menu_client"] = None
+
             if item_data.get("signal_handler_id") and proxy:
                 try:
                     proxy.disconnect(item_data["signal_handler_id"])
@@ -277,11 +524,14 @@ class TrayIconManager:
 
             if item_data.get("event_controller") and widget:
                 widget.remove_controller(item_data["event_controller"])
+                widget.disconnect(item_data["tooltip_handler_id"])
+                widget.set_has_tooltip(False)
 
             if widget and widget.get_parent():  # Ensure the widget is still in the box
                 self.tray_box.remove(widget)
 
             printLog(f"Removed tray item: {full_item_address}")
+            self._publish_snapshot()
         else:
             printLog(f"Attempt to remove non-existent tray item: {full_item_address}")
 
@@ -301,180 +551,290 @@ class TrayIconManager:
             # printLog(f"Error trying to auto-disconnect signal for orphaned item: {e}")
             return
 
-        if signal_name in ("NewIcon", "NewAttentionIcon", "NewOverlayIcon"):
-            GLib.idle_add(self._update_item_icon, proxy, widget)
-        elif signal_name == "NewToolTip":
-            GLib.idle_add(self._update_item_tooltip, proxy, widget)
+        if signal_name == "NewToolTip":
+            # Only invalidated: music players send it constantly
+            item_data["tooltip"] = None
+            item_data["tooltip_stale"] = True
+        elif signal_name in SIGNAL_PROPERTIES:
+            self._schedule_item_refresh(item_data, SIGNAL_PROPERTIES[signal_name])
         elif signal_name == "NewStatus":
             if parameters and parameters.n_children() > 0:
-                status = parameters.get_child_value(0).get_string()
-                printLog(f"Item {item_data['original_address']} new status: {status}")
+                status_variant = parameters.get_child_value(0)
+                # The new status travels with the signal, no fetch needed
+                proxy.set_cached_property("Status", status_variant)
+                self._publish_state()
+                printLog(
+                    f"Item {item_data['original_address']} new status: {status_variant.get_string()}"
+                )
 
-    def _update_item_icon(self, item_proxy, icon_widget: Gtk.Image):
-        pixbuf = None
-        target_size = icon_widget.get_pixel_size() or 24
+    def _schedule_item_refresh(self, item_data, property_names):
+        item_data["pending_properties"].update(property_names)
+        if item_data["refresh_source_id"] is None:
+            item_data["refresh_source_id"] = GLib.timeout_add(
+                REFRESH_DEBOUNCE_MS, self._flush_item_refresh, item_data
+            )
 
-        proxy_name = getattr(item_proxy, "get_name", lambda: "unknown proxy")()
-        printLog(f"Updating icon for proxy: {proxy_name}")
-        printLog(
-            f"Interface name for proxy {proxy_name}: {item_proxy.get_interface_name()}"
-        )  # Deve ser org.freedesktop.StatusNotifierItem
+    def _flush_item_refresh(self, item_data):
+        item_data["refresh_source_id"] = None
+        property_names = sorted(item_data["pending_properties"])
+        item_data["pending_properties"].clear()
+        if not property_names or not self._dbus_connection:
+            return False
+        if item_data["health"].state != HEALTHY:
+            # Degraded: keep the last good icon, the probe fetches everything
+            return False
+
+        # One targeted Get for a single property, one GetAll otherwise
+        if len(property_names) == 1:
+            method = "Get"
+            parameters = GLib.Variant("(ss)", (SNI_INTERFACE, property_names[0]))
+            reply_type = GLib.VariantType("(v)")
+        else:
+            method = "GetAll"
+            parameters = GLib.Variant("(s)", (SNI_INTERFACE,))
+            reply_type = GLib.VariantType("(a{sv})")
+
+        self._call_item(
+            item_data["health"],
+            item_data["service_name"],
+            item_data["object_path"],
+            "org.freedesktop.DBus.Properties",
+            method,
+            parameters,
+            reply_type,
+            self._on_item_properties_fetched,
+            (item_data, property_names),
+        )
+        return False
 
-        # Debug: Listar todas as propriedades em cache para este proxy
-        prop_names_variant = item_proxy.get_cached_property_names()
-        if prop_names_variant:
-            prop_names_list = prop_names_variant.get_strv()
+    def _call_item(
+        self,
+        health: ItemHealth,
+        service_name: str,
+        object_path: str,
+        interface: str,
+        method: str,
+        parameters,
+        reply_type,
+        callback,
+        user_data=None,
+        probe: bool = False,
+    ) -> bool:
+        """
+        Calls a method of a tray item through its circuit breaker.
+
+        callback(reply, error, user_data) runs with the reply, or with None
+        and an error message. Returns False if the call was rejected because
+        the item is degraded; the callback is not called then.
+        """
+        if not probe and not health.allow():
+            printLog(f"Tray item {health.name} is degraded, not calling {method}")
+            return False
+        start = time.monotonic()
+
+        def on_reply(connection, result, _):
+            latency = (time.monotonic() - start) * 1000
+            try:
+                reply = connection.call_finish(result)
+            except GLib.Error as e:
+                remote = Gio.DBusError.get_remote_error(e) or ""
+                if (
+                    e.matches(Gio.io_error_quark(), Gio.IOErrorEnum.TIMED_OUT)
+                    or remote in UNANSWERED_ERRORS
+                ):
+                    if health.failed(latency, e.message):
+                        self._on_item_degraded(health.name)
+                elif health.answered(latency, e.message):
+                    self._on_item_restored(health.name)
+                callback(None, e.message, user_data)
+                return
+            if health.answered(latency):
+                self._on_item_restored(health.name)
+            callback(reply, None, user_data)
+
+        self._dbus_connection.call(
+            service_name,
+            object_path,
+            interface,
+            method,
+            parameters,
+            reply_type,
+            Gio.DBusCallFlags.NONE,
+            CALL_TIMEOUT_MS,
+            None,
+            on_reply,
+            None,
+        )
+        return True
+
+    def _on_item_degraded(self, full_item_address: str):
+        item_data = self.status_notifier_items.get(full_item_address)
+        if item_data is None:
+            return  # Not shown yet, _add_tray_item retries it
+        renderBatcher.setCssClass(item_data["widget"], "tray-item-degraded", True)
+        self._publish_state()
+        if item_data["probe_source_id"] is None:
+            item_data["probe_source_id"] = GLib.timeout_add(
+                item_data["health"].probeDelay, self._probe_item, item_data
+            )
+
+    def _on_item_restored(self, full_item_address: str):
+        item_data = self.status_notifier_items.get(full_item_address)
+        if item_data is not None:
+            renderBatcher.setCssClass(item_data["widget"], "tray-item-degraded", False)
+            self._publish_state()
+
+    def _probe_item(self, item_data):
+        # One GetAll: proves the item answers and catches up on what it missed
+        item_data["probe_source_id"] = None
+        health = item_data["health"]
+        health.startProbe()
+        self._call_item(
+            health,
+            item_data["service_name"],
+            item_data["object_path"],
+            "org.freedesktop.DBus.Properties",
+            "GetAll",
+            GLib.Variant("(s)", (SNI_INTERFACE,)),
+            GLib.VariantType("(a{sv})"),
+            self._on_item_properties_fetched,
+            (item_data, sorted(SIGNAL_PROPERTY_NAMES)),
+            probe=True,
+        )
+        return False
+
+    def _report_health(self):
+        for health in self._health.values():
+            if health.state != HEALTHY or health.timeouts or health.rejected:
+                printLog(f"Tray health {health.describe()}")
+        self._publish_state()
+        return True
+
+    def _on_item_properties_fetched(self, reply, error, user_data):
+        item_data, property_names = user_data
+        if reply is None:
             printLog(
-                f"Proxy {proxy_name} available cached properties: {prop_names_list}"
+                f"Error fetching {property_names} for {item_data['original_address']}: {error}"
             )
-            if not prop_names_list:
-                printLog(
-                    f"Proxy {proxy_name} - get_cached_property_names() returned an empty list."
-                )
+            return
+
+        if (
+            self.status_notifier_items.get(item_data["original_address"])
+            is not item_data
+        ):
+            return  # Item was removed while the call was in flight
+
+        if len(property_names) == 1:
+            values = {property_names[0]: reply.get_child_value(0).get_variant()}
         else:
-            printLog(f"Proxy {proxy_name} - get_cached_property_names() returned None.")
+            values = {
+                name: reply.get_child_value(0).lookup_value(name, None)
+                for name in property_names
+            }
+
+        proxy = item_data["proxy"]
+        changed = set()
+        for name, value in values.items():
+            if value is None:
+                continue
+            old_value = proxy.get_cached_property(name)
+            if old_value is not None and old_value.equal(value):
+                continue
+            proxy.set_cached_property(name, value)
+            changed.add(name)
+
+        # Icon bytes are decoded again only when they actually changed
+        widget = item_data["widget"]
+        if changed & ICON_PROPERTIES:
+            renderBatcher.schedule(widget, "icon", self._refresh_item_icon, item_data)
+        if changed:
+            self._publish_state()
+
+    def _refresh_item_icon(self, item_data):
+        icon = self._update_item_icon(item_data["proxy"], item_data["widget"])
+        if icon != item_data["icon"]:
+            item_data["icon"] = icon
+            self._publish_snapshot()
+        return False
+
+    def _texture_from_argb(self, w: int, h: int, data: GLib.Bytes):
+        # SNI pixmaps are ARGB32 in network byte order, which is exactly
+        # Gdk.MemoryFormat.A8R8G8B8: the bytes are uploaded without conversion
+        return Gdk.MemoryTexture.new(w, h, Gdk.MemoryFormat.A8R8G8B8, data, w * 4)
+
+    def _select_pixmap(self, pixmaps, target_size: int):
+        """
+        Picks the smallest IconPixmap entry at least target_size pixels wide
+        and high, or the largest entry if none is big enough.
+
+        Only the entry headers are read while scanning. Returns (w, h, data),
+        where data is a GLib.Bytes sharing the variant's memory, or None.
+        """
+        best = None  # (width, height, index)
+        for i in range(pixmaps.n_children()):
+            entry = pixmaps.get_child_value(i)
+            width = entry.get_child_value(0).get_int32()
+            height = entry.get_child_value(1).get_int32()
+            if width <= 0 or height <= 0 or width > 512 or height > 512:
+                printLog(f"Invalid dimensions for pixmap entry {i}: {width}x{height}")
+                continue
+            if entry.get_child_value(2).get_size() != width * height * 4:
+                printLog(f"Invalid data size for pixmap entry {i}: {width}x{height}")
+                continue
+            if best is None:
+                best = (width, height, i)
+                continue
+            big_enough = min(width, height) >= target_size
+            best_big_enough = min(best[0], best[1]) >= target_size
+            area, best_area = width * height, best[0] * best[1]
+            if big_enough and (not best_big_enough or area < best_area):
+                best = (width, height, i)
+            elif not big_enough and not best_big_enough and area > best_area:
+                best = (width, height, i)
+        if best is None:
+            return None
+        width, height, i = best
+        data = pixmaps.get_child_value(i).get_child_value(2).get_data_as_bytes()
+        return width, height, data
+
+    def _update_item_icon(self, item_proxy, icon_widget: Gtk.Image):
+        """
+        Applies the item's icon to icon_widget.
+
+        Returns a compact description of the applied icon ({"name": ...} or
+        {"pixmap": [w, h, base64]}) for the warm-start snapshot, or None.
+        """
+        # Icons are drawn at pixel_size logical pixels, so pick the pixmap
+        # for the device pixels of the monitor (48 px on a 2x display)
+        target_size = (
+            icon_widget.get_pixel_size() or ICON_SIZE
+        ) * icon_widget.get_scale_factor()
+
+        proxy_name = getattr(item_proxy, "get_name", lambda: "unknown proxy")()
+        printLog(f"Updating icon for proxy: {proxy_name}")
 
-        # ... (resto do seu código como está) ...
         try:
             # 1. Try IconPixmap first
-            icon_pixmap_variant = item_proxy.get_cached_property(
-                "IconPixmap"
-            )  # Espera-se que seja GVariant do tipo a(iiay)
-
-            # Correção: Verificar o tipo e usar icon_pixmap_variant diretamente
+            icon_pixmap_variant = item_proxy.get_cached_property("IconPixmap")
             if icon_pixmap_variant and icon_pixmap_variant.is_of_type(
                 GLib.VariantType.new("a(iiay)")
             ):
-                # 'icon_pixmap_variant' É o array GVariant. Não chame .get_variant().
-                printLog(f"IconPixmap variant (type 'a(iiay)') found for {proxy_name}")
-
-                if (
-                    icon_pixmap_variant.n_children() > 0
-                ):  # Usar icon_pixmap_variant diretamente
+                pixmap = self._select_pixmap(icon_pixmap_variant, target_size)
+                if pixmap:
+                    w, h, data = pixmap
+                    icon_widget.set_from_paintable(self._texture_from_argb(w, h, data))
                     printLog(
-                        f"IconPixmap has {icon_pixmap_variant.n_children()} entries for {proxy_name}"
-                    )  # Usar icon_pixmap_variant
-                    best_pixmap_data = None
-                    min_diff = float("inf")
-
-                    # Usar icon_pixmap_variant para iterar
-                    for i in range(icon_pixmap_variant.n_children()):
-                        struct = icon_pixmap_variant.get_child_value(i)
-                        width = struct.get_child_value(0).get_int32()
-                        height = struct.get_child_value(1).get_int32()
-
-                        printLog(f"Pixmap entry {i}: {width}x{height}")
-
-                        # Validar dimensões
-                        if width <= 0 or height <= 0 or width > 512 or height > 512:
-                            printLog(
-                                f"Invalid dimensions for pixmap entry {i}: {width}x{height}"
-                            )
-                            continue
-
-                        current_diff = abs(width - target_size) + abs(
-                            height - target_size
-                        )
-                        if best_pixmap_data is None or current_diff < min_diff:
-                            min_diff = current_diff
-                            data_bytes_variant = struct.get_child_value(
-                                2
-                            )  # GVariant 'ay'
-                            data_bytes = bytes(data_bytes_variant.get_bytestring())
-
-                            expected_size = width * height * 4  # ARGB32
-                            if len(data_bytes) == expected_size:
-                                best_pixmap_data = (width, height, data_bytes)
-                                printLog(
-                                    f"Valid pixmap data found for entry {i}: {width}x{height}, {len(data_bytes)} bytes"
-                                )
-                            else:
-                                printLog(
-                                    f"Invalid data size for pixmap entry {i}: expected {expected_size}, got {len(data_bytes)}"
-                                )
-
-                    if best_pixmap_data:
-                        w, h, data = best_pixmap_data
-                        try:
-                            # Converter ARGB32 para RGBA
-                            rgba_data = bytearray(len(data))
-                            for idx in range(
-                                0, len(data), 4
-                            ):  # Renomeado 'i' para 'idx'
-                                # Renomeado componentes para clareza e evitar conflito de escopo
-                                a_pixel, r_pixel, g_pixel, b_pixel = (
-                                    data[idx],
-                                    data[idx + 1],
-                                    data[idx + 2],
-                                    data[idx + 3],
-                                )
-                                (
-                                    rgba_data[idx],
-                                    rgba_data[idx + 1],
-                                    rgba_data[idx + 2],
-                                    rgba_data[idx + 3],
-                                ) = (
-                                    r_pixel,
-                                    g_pixel,
-                                    b_pixel,
-                                    a_pixel,
-                                )  # Ordem para RGBA
-
-                            # Criar pixbuf com dados convertidos
-                            # Armazenar em uma variável temporária primeiro
-                            current_pixbuf = GdkPixbuf.Pixbuf.new_from_bytes(
-                                GLib.Bytes.new(rgba_data),
-                                GdkPixbuf.Colorspace.RGB,
-                                True,  # has_alpha
-                                8,  # bits_per_sample
-                                w,
-                                h,
-                                w * 4,  # rowstride
-                            )
-
-                            # Redimensionar se necessário e atribuir a 'pixbuf'
-                            if (
-                                target_size != w or target_size != h
-                            ):  # Checar ambas as dimensões
-                                pixbuf = current_pixbuf.scale_simple(
-                                    target_size,
-                                    target_size,
-                                    GdkPixbuf.InterpType.BILINEAR,
-                                )
-                            else:
-                                pixbuf = current_pixbuf  # Usar o pixbuf como está
-
-                            printLog(
-                                f"Successfully created pixbuf from IconPixmap for {proxy_name}"
-                            )
-
-                        except (
-                            Exception
-                        ) as e_pixbuf:  # Nome da variável de exceção mais específico
-                            printLog(
-                                f"Error creating pixbuf from IconPixmap data for {proxy_name}: {e_pixbuf}"
-                            )
-                            pixbuf = (
-                                None  # Garante que pixbuf seja None em caso de erro
-                            )
-                else:  # n_children == 0
-                    printLog(f"IconPixmap array is empty for {proxy_name}")
-
-            elif (
-                icon_pixmap_variant
-            ):  # A propriedade existe, mas não é do tipo 'a(iiay)'
+                        f"Icon set from {w}x{h} IconPixmap for {proxy_name} (target {target_size}px)"
+                    )
+                    return {"pixmap": [w, h, base64.b64encode(data.get_data()).decode()]}
+                printLog(f"No usable IconPixmap entry for {proxy_name}")
+            elif icon_pixmap_variant:
                 printLog(
                     f"IconPixmap property found for {proxy_name}, but it's of unexpected type: {icon_pixmap_variant.get_type_string()}"
                 )
-            else:  # A propriedade não existe (retornou None de get_cached_property)
+            else:
                 printLog(f"No IconPixmap property found for {proxy_name}")
 
-            # Se conseguiu criar o pixbuf, usar ele
-            if pixbuf:
-                icon_widget.set_from_pixbuf(pixbuf)
-                printLog(f"Icon set from pixbuf for {proxy_name}")
-                return
-
             # 2. Fallback para IconName
             icon_name_variant = item_proxy.get_cached_property("IconName")
             if icon_name_variant:
@@ -487,7 +847,7 @@ class TrayIconManager:
                     if icon_theme.has_icon(icon_name):
                         icon_widget.set_from_icon_name(icon_name)
                         printLog(f"Icon set from theme for {proxy_name}: {icon_name}")
-                        return
+                        return {"name": icon_name}
                     else:
                         printLog(
                             f"Icon '{icon_name}' not found in theme for {proxy_name}"
@@ -512,7 +872,7 @@ class TrayIconManager:
                         printLog(
                             f"Icon set from attention icon for {proxy_name}: {attention_icon}"
                         )
-                        return
+                        return {"name": attention_icon}
                     # Adicionado else para log de ícone de atenção não encontrado no tema
                     else:
                         printLog(
@@ -525,39 +885,65 @@ class TrayIconManager:
             # Se nada funcionou, usar ícone padrão
             printLog(f"Using fallback icon (application-x-executable) for {proxy_name}")
             icon_widget.set_from_icon_name("application-x-executable")
+            return None
 
         except Exception as e:
             printLog(f"Error updating icon for {proxy_name}: {e}")
             icon_widget.set_from_icon_name(
                 "application-x-executable"
             )  # Fallback em caso de erro inesperado
-
-    def _update_item_tooltip(self, item_proxy, icon_widget: Gtk.Image):
-        # (Implementation of _update_item_tooltip method as before)
-        try:
-            tooltip_variant = item_proxy.get_cached_property("ToolTip")
-            if tooltip_variant and tooltip_variant.n_children() == 4:
-                v_title = tooltip_variant.get_child_value(2).get_string()
-                v_text = tooltip_variant.get_child_value(3).get_string()
-
-                tooltip_markup = GLib.markup_escape_text(v_title)
-                if v_text:
-                    tooltip_markup += (
-                        f"\n<small>{GLib.markup_escape_text(v_text)}</small>"
-                    )
-
-                icon_widget.set_tooltip_markup(
-                    tooltip_markup if tooltip_markup else None
+            return None
+
+    def _tooltip_markup(self, tooltip_variant) -> str:
+        # ToolTip is (icon name, icon pixmaps, title, text)
+        if not tooltip_variant or tooltip_variant.n_children() != 4:
+            return ""
+        v_title = tooltip_variant.get_child_value(2).get_string()
+        v_text = tooltip_variant.get_child_value(3).get_string()
+        tooltip_markup = GLib.markup_escape_text(v_title)
+        if v_text:
+            tooltip_markup += f"\n<small>{GLib.markup_escape_text(v_text)}</small>"
+        return tooltip_markup
+
+    def _on_query_tooltip(self, widget, x, y, keyboard_mode, tooltip, item_data):
+        if item_data["tooltip_stale"]:
+            # Fetched now, shown by a new query when the answer arrives
+            if not item_data["tooltip_fetching"]:
+                item_data["tooltip_fetching"] = self._call_item(
+                    item_data["health"],
+                    item_data["service_name"],
+                    item_data["object_path"],
+                    "org.freedesktop.DBus.Properties",
+                    "Get",
+                    GLib.Variant("(ss)", (SNI_INTERFACE, "ToolTip")),
+                    GLib.VariantType("(v)"),
+                    self._on_tooltip_fetched,
+                    item_data,
                 )
-            else:
-                icon_widget.set_tooltip_text(None)
-        except Exception as e:  # More generic
-            if hasattr(item_proxy, "get_name"):
-                proxy_name = item_proxy.get_name()
-            else:
-                proxy_name = "unknown proxy"
-            printLog(f"Error updating tooltip for {proxy_name}: {e}")
-            icon_widget.set_tooltip_text(None)
+            return False
+        if item_data["tooltip"] is None:
+            item_data["tooltip"] = self._tooltip_markup(
+                item_data["proxy"].get_cached_property("ToolTip")
+            )
+        if not item_data["tooltip"]:
+            return False
+        tooltip.set_markup(item_data["tooltip"])
+        return True
+
+    def _on_tooltip_fetched(self, reply, error, item_data):
+        item_data["tooltip_fetching"] = False
+        if reply is None:
+            printLog(
+                f"Error fetching the tooltip of {item_data['original_address']}: {error}"
+            )
+            return
+        item_data["proxy"].set_cached_property(
+            "ToolTip", reply.get_child_value(0).get_variant()
+        )
+        item_data["tooltip_stale"] = False
+        widget = item_data["widget"]
+        if widget.get_parent():
+            widget.trigger_tooltip_query()
 
     def _on_item_clicked(
         self,
@@ -581,22 +967,45 @@ class TrayIconManager:
             else "unknown proxy"
         )
 
-        if button == Gdk.BUTTON_PRIMARY:
-            try:
-                printLog(f"Activating item (primary): {item_name_for_log}")
-                item_proxy.call_sync(
-                    "Activate",
-                    GLib.Variant("(ii)", (int(x), int(y))),
-                    Gio.DBusCallFlags.NONE,
-                    -1,
-                    None,
-                )
-            except GLib.Error as e:
-                printLog(f"Error calling Activate on {item_name_for_log}: {e}")
+        item_is_menu = item_proxy.get_cached_property("ItemIsMenu")
+        if button == Gdk.BUTTON_PRIMARY and item_is_menu and item_is_menu.get_boolean():
+            # The item only provides a menu, Activate is not supported
+            self._show_context_menu(item_proxy, widget, int(x), int(y))
+        elif button == Gdk.BUTTON_PRIMARY:
+            printLog(f"Activating item (primary): {item_name_for_log}")
+            self._call_item_method(widget, "Activate", int(x), int(y))
 
         elif button == Gdk.BUTTON_SECONDARY:
             self._show_context_menu(item_proxy, widget, int(x), int(y))
 
+    def _call_item_method(self, widget: Gtk.Widget, method: str, x: int, y: int):
+        # Activate and ContextMenu are fire-and-forget, never waited on
+        item_data = self._item_data_for_widget(widget)
+        if item_data is None:
+            return
+        self._call_item(
+            item_data["health"],
+            item_data["service_name"],
+            item_data["object_path"],
+            SNI_INTERFACE,
+            method,
+            GLib.Variant("(ii)", (x, y)),
+            None,
+            self._on_item_method_done,
+            (item_data["original_address"], method),
+        )
+
+    def _on_item_method_done(self, reply, error, user_data):
+        full_item_address, method = user_data
+        if error is not None:
+            printLog(f"Error calling {method} on {full_item_address}: {error}")
+
+    def _item_data_for_widget(self, widget: Gtk.Widget):
+        for item_data in self.status_notifier_items.values():
+            if item_data["widget"] is widget:
+                return item_data
+        return None
+
     def _show_context_menu(
         self, item_proxy: Gio.DBusProxy, widget: Gtk.Widget, click_x: int, click_y: int
     ):
@@ -610,26 +1019,30 @@ class TrayIconManager:
             if hasattr(item_proxy, "get_name")
             else "unknown proxy"
         )
+        item_data = self._item_data_for_widget(widget)
+        if item_data is not None and item_data["health"].state != HEALTHY:
+            printLog(f"Tray item {item_name_for_log} is degraded, no menu")
+            return
         try:
             menu_path_variant = item_proxy.get_cached_property("Menu")
             if menu_path_variant:
                 menu_object_path = menu_path_variant.get_string()
                 if menu_object_path and menu_object_path != "/":
-                    printLog(
-                        f"Item {item_name_for_log} has a D-Bus menu at: {menu_object_path}"
-                    )
-                    # Here would enter the complex D-Bus menu logic
-                # else:
-                # printLog(f"Item {item_name_for_log} doesn't have a valid menu path: {menu_object_path}")
+                    if item_data is not None:
+                        if item_data["menu_client"] is None:
+                            printLog(
+                                f"Item {item_name_for_log} has a D-Bus menu at: {menu_object_path}"
+                            )
+                            item_data["menu_client"] = DBusMenuClient(
+                                self._dbus_connection,
+                                item_data["service_name"],
+                                menu_object_path,
+                            )
+                        item_data["menu_client"].popup(widget, click_x, click_y)
+                        return
 
             printLog(f"Trying to call ContextMenu on {item_name_for_log}")
-            item_proxy.call_sync(
-                "ContextMenu",
-                GLib.Variant("(ii)", (click_x, click_y)),
-                Gio.DBusCallFlags.NONE,
-                -1,
-                None,
-            )
+            self._call_item_method(widget, "ContextMenu", click_x, click_y)
 
         except GLib.Error as e:
             printLog(f"Error trying to show context menu for {item_name_for_log}: {e}")
@@ -0,0 +1,82 @@
+# Listening Unix Sockets
+#
+# The control socket and the state stream are served by the primary bar
+# instance only. A path is taken over only when nobody answers on it (a
+# socket left behind by a crashed instance), and it is only removed on exit
+# if it still is the socket this process bound, so a second `hyprbar` launch
+# can never delete the sockets of the running bar.
+#
+import os
+import socket
+from typing import Optional
+from hyprbar.util import printLog
+
+
+def isServed(path: str) -> bool:
+    # True if a process accepts connections on path
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+class UnixListener:
+    """
+    Non-blocking listening socket bound to a path by this process.
+
+    Attributes:
+        path (str): Socket path
+        sock (Optional[socket.socket]): The socket, None when not bound
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.sock: Optional[socket.socket] = None
+        self._inode: Optional[int] = None  # inode of the path we bound
+
+    def bind(self, backlog: int = 8) -> bool:
+        """
+        Binds and listens on the path, unless another process serves it.
+
+        Returns:
+            bool: True if this process now owns the socket.
+        """
+        if self.sock is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            if isServed(self.path):
+                printLog(f"{self.path} is served by another process, leaving it")
+                return False
+            # Left behind by an instance that crashed
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.path)
+            sock.listen(backlog)
+            self._inode = os.stat(self.path).st_ino
+        except OSError as e:
+            sock.close()
+            printLog(f"Cannot listen on {self.path}: {e}")
+            return False
+        sock.setblocking(False)
+        self.sock = sock
+        return True
+
+    def close(self) -> None:
+        if self.sock is None:
+            return
+        self.sock.close()
+        self.sock = None
+        try:
+            # Another instance may have replaced the path meanwhile
+            if os.stat(self.path).st_ino == self._inode:
+                os.unlink(self.path)
+        except OSError:
+            pass
+        self._inode = None
@@ -1,31 +1,114 @@
-from typing import List
+import asyncio
+from typing import List, Optional
 from datetime import datetime
 from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Gdk  # pyright: ignore #noqa
 from gi.repository import GLib  # pyright: ignore # noqa
+from gi.repository import Gio  # pyright: ignore # noqa
 from gi.repository import Pango  # pyright: ignore # noqa
-from hyprbar.util import printLog, executeCommand
-from hyprpy import Hyprland
+from hyprbar.util import printLog
+from hyprbar.aio import TaskScope, inWorker, runCommand
+from hyprbar.providers import Provider, getProvider, resolveProvider
+from hyprbar.sysfs import (
+    MIN_DISK_INTERVAL,
+    DiskUsage,
+    findBacklight,
+    findTemperatureSensor,
+    formatSize,
+    reader,
+)
+from hyprbar.snapshot import snapshot
+from hyprbar.stateexport import stateExport
+from hyprbar.render import renderBatcher
+from hyprbar.memdiag import memoryDiagnostics
+from hyprbar.controlsocket import controlServer
+from hyprbar.workers import workerPool
 from rich.console import Console
-from hyprbar.config import ComponentConfig
-from hyprbar.appswitch import AppSwitch
+from hyprbar.config import ComponentConfig, HyprbarConfig
+from hyprbar.constants import STYLE_FILE
+from hyprbar.appswitch import AppSwitch, AppSwitchList
 from hyprbar.trayiconmanager import TrayIconManager
+from hyprbar.workspaces import Workspaces
+from hyprbar.activewindow import ActiveWindow
+from hyprbar.windowsearch import WindowSearch
+from hyprbar.notifications import createNotificationsComponent
 
 
 cl = Console()
-instance = Hyprland()
-workspaces = []
-currentWorkspaceID = 1
 
 
-def populateBox(box: Gtk.Box, components: List[ComponentConfig]) -> None:
+def loadStyle(display: Gdk.Display) -> Gtk.CssProvider:
+    printLog("Setting up style with CSS path: " + STYLE_FILE)
+    cssProvider = Gtk.CssProvider()
+    cssProvider.load_from_path(f"{STYLE_FILE}")
+    Gtk.StyleContext.add_provider_for_display(
+        display, cssProvider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+    )
+    printLog("CSS provider loaded")
+    return cssProvider
+
+
+def createGtkBox(h_align: Gtk.Align, spacing: int) -> Gtk.Box:
+    retValue = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=spacing)
+    retValue.set_halign(h_align)
+    retValue.set_valign(Gtk.Align.CENTER)
+    return retValue
+
+
+def buildBarContent(config: HyprbarConfig, offscreen: bool = False) -> Gtk.Box:
+    """
+    Builds the widget tree of the bar, without the window around it.
+
+    Args:
+        config (HyprbarConfig): The validated configuration.
+        offscreen (bool): Build the components without taking names on the
+            session bus (tray host, notification daemon), for `hyprbar render`.
+
+    Returns:
+        Gtk.Box: The main box with the left, center and right containers.
+    """
+    mainBox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+    # faz com que todos os widgets filhos ocupem o mesmo espaço
+    # horizontalmente
+    printLog("Setting homogeneous to True for mainBox.")
+    mainBox.set_homogeneous(True)
+
+    spacing = config.window.left_container.hor_spacing
+    printLog("Creating leftGtkBox for window...")
+    leftGtkBox = createGtkBox(Gtk.Align.START, spacing)
+
+    printLog("Creating centerGtkBox for window...")
+    centerGtkBox = createGtkBox(Gtk.Align.CENTER, spacing)
+
+    printLog("Creating rightGtkBox for window...")
+    rightGtkBox = createGtkBox(Gtk.Align.END, spacing)
+
+    mainBox.append(leftGtkBox)
+    mainBox.append(centerGtkBox)
+    mainBox.append(rightGtkBox)
+
+    printLog("Populate boxes with widgets.")
+    populateBox(leftGtkBox, config.window.left_container.components, offscreen)
+    populateBox(centerGtkBox, config.window.center_container.components, offscreen)
+    populateBox(rightGtkBox, config.window.right_container.components, offscreen)
+    return mainBox
+
+
+def populateBox(
+    box: Gtk.Box, components: List[ComponentConfig], offscreen: bool = False
+) -> None:
     printLog(f"Populating box => {box} with components")
     for comp in components:
+        previous = box.get_last_child()
         if comp.type == "workspaces":
             printLog("Creating workspaces component...")
-            createWorkspacesComponent(box=box, component=comp)  # pyright: ignore # noqa
+            Workspaces(box, comp)
         elif comp.type == "appswitch":
             printLog("Creating app switch component...")
-            AppSwitch(box, comp)
+            if comp.mode == "list":  # pyright: ignore # noqa
+                AppSwitchList(box, comp)
+            else:
+                AppSwitch(box, comp)
         elif comp.type == "clock":
             printLog(f"Creating clock component => {comp.icon}")  # pyright: ignore # noqa
             createClockComponent(
@@ -37,11 +120,83 @@ def populateBox(box: Gtk.Box, components: List[ComponentConfig]) -> None:
             createKernelComponent(box=box, component=comp)
         elif comp.type == "tray":
             printLog("Creating tray component...")
-            TrayIconManager(box)
+            TrayIconManager(box, connect=not offscreen)
+        elif comp.type == "custom":
+            printLog(f"Creating custom component => {comp.name}")  # pyright: ignore # noqa
+            createCustomComponent(box=box, component=comp)
+        elif comp.type == "notifications":
+            printLog("Creating notifications component...")
+            createNotificationsComponent(
+                box=box, component=comp, startServer=not offscreen
+            )
+        elif comp.type == "activewindow":
+            printLog("Creating active window component...")
+            ActiveWindow(box, comp)
+        elif comp.type == "windowsearch":
+            printLog("Creating window search component...")
+            WindowSearch(box, comp)
+        elif comp.type == "temperature":
+            printLog("Creating temperature component...")
+            createTemperatureComponent(box=box, component=comp)
+        elif comp.type == "backlight":
+            printLog("Creating backlight component...")
+            createBacklightComponent(box=box, component=comp)
+        elif comp.type == "disk":
+            printLog("Creating disk component...")
+            createDiskComponent(box=box, component=comp)
+        registerComponentWidgets(box, previous, comp.css_id or comp.type)  # pyright: ignore # noqa
+
+
+def registerComponentWidgets(
+    box: Gtk.Box, previous: Optional[Gtk.Widget], name: str
+) -> None:
+    # Everything appended after `previous` belongs to the new component
+    child = previous.get_next_sibling() if previous else box.get_first_child()
+    while child is not None:
+        memoryDiagnostics.registerComponent(name, child)
+        child = child.get_next_sibling()
+
 
+def createCustomComponent(box: Gtk.Box, component: ComponentConfig) -> None:
+    # Nothing is polled, scripts push values through the control socket
+    customBox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+    if component.css_id:  # pyright: ignore # noqa
+        customBox.set_name(component.css_id)  # pyright: ignore # noqa
+    if component.icon:  # pyright: ignore # noqa
+        customIcon = Gtk.Label(label=f"{component.icon}")  # pyright: ignore # noqa
+        customIcon.set_name(f"{component.css_id}-icon")  # pyright: ignore # noqa
+        customBox.append(customIcon)
+    customLabel = Gtk.Label(label=component.text)  # pyright: ignore # noqa
+    customLabel.set_name(f"{component.css_id}-label")  # pyright: ignore # noqa
+    customBox.append(customLabel)
+    box.append(customBox)
+    controlServer.registerTarget(component.name, customBox, customLabel)  # pyright: ignore # noqa
 
-def getKernelVersion(command: str) -> str:
-    code, out, error = executeCommand(command=command)
+
+def getComponentProvider(component: ComponentConfig) -> Optional[Provider]:
+    # An explicit provider wins, otherwise try to recognise the command
+    if component.provider:  # pyright: ignore # noqa
+        provider = getProvider(component.provider)  # pyright: ignore # noqa
+        if provider is None:
+            printLog(f"Unknown provider '{component.provider}', using command")  # pyright: ignore # noqa
+        return provider
+    return resolveProvider(component.command)  # pyright: ignore # noqa
+
+
+async def readKernelValue(command: str, provider: Optional[Provider] = None) -> str:
+    # Static providers are cached in-process, everything else may block
+    if provider is not None and provider.isStatic:
+        return provider.read()
+    if workerPool.enabled:
+        task, payload = ("provider", provider.name) if provider else ("command", command)
+        try:
+            return await inWorker(task, payload)
+        except RuntimeError as e:
+            printLog(f"Error getting kernel version: {e}")
+            return f"{e}"
+    if provider is not None:
+        return provider.read()
+    code, out, error = await runCommand(command)
     if code == 0:
         return "".join(c for c in out if c not in "\n\r")
     else:
@@ -49,68 +204,191 @@ def getKernelVersion(command: str) -> str:
         return f"{error}"
 
 
-def updateKernel(label: Gtk.Label, command: str) -> bool:
-    label.set_text(getKernelVersion(command=command))
-    return True
+def metricName(component: ComponentConfig) -> str:
+    # Key of the component in the metrics topic of the state stream
+    return component.css_id or component.type  # pyright: ignore # noqa
+
+
+def rememberProviderValue(provider: Provider, value: str) -> None:
+    # Only static values are worth showing again before the live read
+    if provider.isStatic:
+        values = dict(snapshot.current("providers", {}))
+        values[provider.name] = value
+        snapshot.update("providers", values)
+
+
+async def runKernel(
+    label: Gtk.Label,
+    command: str,
+    provider: Optional[Provider],
+    refresh: int,
+    metric: str = "kernel",
+) -> None:
+    while True:
+        value = await readKernelValue(command=command, provider=provider)
+        renderBatcher.setText(label, value)
+        stateExport.publishKey("metrics", metric, value)
+        if provider is not None:
+            rememberProviderValue(provider, value)
+        # Static values are computed once, there is nothing to refresh
+        if provider is not None and provider.isStatic:
+            return
+        await asyncio.sleep(refresh)
 
 
 def createKernelComponent(box: Gtk.Box, component: ComponentConfig) -> None:
+    provider = getComponentProvider(component)
+    if provider is not None:
+        printLog(f"Kernel component served by '{provider.name}' provider")
+
     kernelIcon = Gtk.Label(label=f"{component.icon}")  # pyright: ignore # noqa
     kernelIcon.set_name(f"{component.css_id}-icon")  # pyright: ignore # noqa
-    kernelLabel = Gtk.Label(label=getKernelVersion(command=component.command))  # pyright: ignore # noqa
+    kernelLabel = Gtk.Label()
     kernelLabel.set_name(f"{component.css_id}-label")  # pyright: ignore # noqa
 
     box.append(kernelIcon)
     box.append(kernelLabel)
 
-    # Update every refresh time
-    GLib.timeout_add(
-        component.refresh,  # pyright: ignore # noqa
-        lambda: updateKernel(label=kernelLabel, command=component.command),  # pyright: ignore # noqa
+    # Draw the last known value now, the task reconciles it
+    previous = (
+        snapshot.get("providers", {}).get(provider.name) if provider else None
     )
+    if previous is not None:
+        kernelLabel.set_text(previous)
 
+    TaskScope(f"kernel:{component.css_id}").bindTo(kernelLabel).spawn(  # pyright: ignore # noqa
+        runKernel(
+            label=kernelLabel,
+            command=component.command,  # pyright: ignore # noqa
+            provider=provider,
+            refresh=component.refresh,  # pyright: ignore # noqa
+            metric=metricName(component),
+        )
+    )
 
-def updateWorkspaces() -> bool:
-    global currentWorkspaceID
-    wk = instance.get_active_workspace()
-    if wk.id <= len(workspaces):
-        if wk.id != currentWorkspaceID:
-            # Remove active class
-            GLib.idle_add(
-                workspaces[currentWorkspaceID - 1].remove_css_class, "workspace-active"
-            )
-            currentWorkspaceID = wk.id
-            # add css class
-            GLib.idle_add(
-                workspaces[currentWorkspaceID - 1].add_css_class, "workspace-active"
+
+def createValueLabels(box: Gtk.Box, component: ComponentConfig) -> Gtk.Label:
+    # Icon and value labels shared by the sensor components
+    if component.icon:  # pyright: ignore # noqa
+        iconLabel = Gtk.Label(label=f"{component.icon}")  # pyright: ignore # noqa
+        iconLabel.set_name(f"{component.css_id}-icon")  # pyright: ignore # noqa
+        box.append(iconLabel)
+    valueLabel = Gtk.Label()
+    valueLabel.set_name(f"{component.css_id}-label")  # pyright: ignore # noqa
+    box.append(valueLabel)
+    return valueLabel
+
+
+async def runTemperature(label: Gtk.Label, component: ComponentConfig) -> None:
+    sensor = findTemperatureSensor(
+        reader,
+        sensor=component.sensor,  # pyright: ignore # noqa
+        label=component.label,  # pyright: ignore # noqa
+    )
+    if sensor is None:
+        printLog("No hwmon temperature sensor found")
+        renderBatcher.setText(label, "n/a")
+        return
+    printLog(f"Temperature component reading '{sensor.name}'")
+    while True:
+        try:
+            temp = sensor.read()
+        except (OSError, ValueError) as e:
+            printLog(f"Error reading temperature: {e}")
+        else:
+            renderBatcher.setText(label, component.format.format(temp=temp))  # pyright: ignore # noqa
+            renderBatcher.setCssClass(label, "critical", temp >= component.critical)  # pyright: ignore # noqa
+            stateExport.publishKey("metrics", metricName(component), round(temp, 1))
+        await asyncio.sleep(component.refresh)  # pyright: ignore # noqa
+
+
+def createTemperatureComponent(box: Gtk.Box, component: ComponentConfig) -> None:
+    label = createValueLabels(box, component)
+    TaskScope(f"temperature:{component.css_id}").bindTo(label).spawn(  # pyright: ignore # noqa
+        runTemperature(label, component)
+    )
+
+
+def createBacklightComponent(box: Gtk.Box, component: ComponentConfig) -> None:
+    label = createValueLabels(box, component)
+    backlight = findBacklight(reader, component.device)  # pyright: ignore # noqa
+    if backlight is None:
+        printLog("No backlight device found")
+        label.set_text("n/a")
+        return
+
+    def update(*_) -> None:
+        try:
+            percent = backlight.read()
+        except (OSError, ValueError) as e:
+            printLog(f"Error reading backlight: {e}")
+            return
+        renderBatcher.setText(label, component.format.format(percent=percent))  # pyright: ignore # noqa
+        stateExport.publishKey("metrics", metricName(component), round(percent))
+
+    # Follow brightness changes through inotify where sysfs reports them
+    monitors = []
+    for path in backlight.watchedFiles:
+        try:
+            monitor = Gio.File.new_for_path(path).monitor_file(
+                Gio.FileMonitorFlags.NONE, None
             )
+        except GLib.Error as e:
+            printLog(f"Cannot monitor {path}: {e.message}")
+            continue
+        monitor.connect("changed", update)
+        monitors.append(monitor)
+    # Keep the monitors alive as long as the label
+    label.monitors = monitors  # pyright: ignore # noqa
 
-    return True
+    async def poll() -> None:
+        while True:
+            update()
+            await asyncio.sleep(component.refresh)  # pyright: ignore # noqa
 
+    printLog(f"Backlight component following '{backlight.name}'")
+    TaskScope(f"backlight:{component.css_id}").bindTo(label).spawn(poll())  # pyright: ignore # noqa
 
-def createWorkspacesComponent(box, component: ComponentConfig) -> None:
-    global workspaces
-    global currentWorkspaceID
-    workspaces.clear()  # Limpa workspaces anterior
-    for index, id in enumerate(component.ids):  # pyright: ignore # noqa
-        label = Gtk.Label(label=f"{id}")
-        # css id for the workspace
-        label.set_name(f"{component.css_id}-{index + 1}")  # pyright: ignore # noqa
-        label.add_css_class("workspace-hover")
-        workspaces.append(label)
-        box.append(label)
 
-    activeWorkspace = instance.get_active_workspace()
-    currentWorkspaceID = activeWorkspace.id
-    # Update every second (100ms)
-    GLib.timeout_add(100, updateWorkspaces)
-    # add active class
-    GLib.idle_add(workspaces[currentWorkspaceID - 1].add_css_class, "workspace-active")
+async def runDisk(label: Gtk.Label, component: ComponentConfig) -> None:
+    disk = DiskUsage(component.path)  # pyright: ignore # noqa
+    refresh = max(component.refresh, MIN_DISK_INTERVAL)  # pyright: ignore # noqa
+    while True:
+        try:
+            stats = disk.read()
+        except OSError as e:
+            printLog(f"Error reading disk usage of {disk.path}: {e}")
+        else:
+            text = component.format.format(  # pyright: ignore # noqa
+                percent=stats.percent,
+                used=formatSize(stats.used),
+                free=formatSize(stats.free),
+                total=formatSize(stats.total),
+            )
+            renderBatcher.setText(label, text)
+            stateExport.publishKey(
+                "metrics",
+                metricName(component),
+                {
+                    "percent": round(stats.percent, 1),
+                    "used": stats.used,
+                    "free": stats.free,
+                    "total": stats.total,
+                },
+            )
+        await asyncio.sleep(refresh)
+
+
+def createDiskComponent(box: Gtk.Box, component: ComponentConfig) -> None:
+    label = createValueLabels(box, component)
+    TaskScope(f"disk:{component.css_id}").bindTo(label).spawn(  # pyright: ignore # noqa
+        runDisk(label, component)
+    )
 
 
 def clockUpdate(clockLabel: Gtk.Label, format: str) -> bool:
     current_time = datetime.now().strftime(format)
-    GLib.idle_add(clockLabel.set_text, current_time)
+    renderBatcher.setText(clockLabel, current_time)
     return True  # Continua chamando periodicamente
 
 
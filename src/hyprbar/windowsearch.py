@@ -0,0 +1,447 @@
+# Window Search
+#
+# Keyboard-driven popup that fuzzy-matches every open window by title, class
+# and workspace, and focuses the chosen one. It is opened from a Hyprland
+# bind through the control socket:
+#
+#   bind = SUPER, TAB, exec, hyprbar msg search
+#
+# WindowIndex is loaded once and kept current from Hyprland events (open,
+# close, retitle, move, focus). Each field is lowercased once per change and
+# every window keeps the set of its characters, so a keystroke only scores
+# windows that contain all the typed characters; when the query grows, only
+# the previous matches are scored again. Results go to a Gtk.ListView that
+# realizes the visible rows only.
+#
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import Gdk  # pyright: ignore #noqa
+from gi.repository import Gio  # pyright: ignore # noqa
+from gi.repository import GObject  # pyright: ignore # noqa
+from gi.repository import Pango  # pyright: ignore # noqa
+from hyprbar.aio import TaskScope, hyprctl
+from hyprbar.hypripc import CLIENTS, hyprIPC
+from hyprbar.config import ComponentConfig
+from hyprbar.controlsocket import controlServer
+from hyprbar.hyprevents import hyprlandEvents, normalizeAddress
+from hyprbar.util import printLog
+
+WORD_SEPARATORS = " -_./:|"
+# Matches in the class are a little more relevant than in the title, and a
+# query spanning several fields ("firefox music") ranks below both
+FIELD_BONUS = (0, 2, 0, -5)  # title, class, workspace, all of them
+
+
+class IndexedWindow:
+    __slots__ = (
+        "address",
+        "title",
+        "wmClass",
+        "workspace",
+        "focus",
+        "fields",
+        "chars",
+        "item",
+    )
+
+    def __init__(self, address: str, title: str, wmClass: str, workspace: str):
+        self.address = address
+        self.title = title
+        self.wmClass = wmClass
+        self.workspace = workspace
+        self.focus = 0  # focus order, higher is more recent
+        self.fields: Tuple[str, ...] = ()
+        self.chars: FrozenSet[str] = frozenset()
+        self.item: Optional["SearchItem"] = None
+        self.reindex()
+
+    def reindex(self) -> None:
+        title, wmClass = self.title.lower(), self.wmClass.lower()
+        workspace = self.workspace.lower()
+        combined = f"{wmClass} {title} {workspace}"
+        self.fields = (title, wmClass, workspace, combined)
+        self.chars = frozenset(combined)
+
+
+def fuzzyScore(query: str, text: str) -> Optional[int]:
+    """
+    Scores `query` as a subsequence of `text`, both lowercase.
+
+    Returns:
+        Optional[int]: Higher is better, None if `text` does not match.
+    """
+    position = text.find(query)
+    if position >= 0:
+        # Substrings beat scattered matches, prefixes and word starts more
+        score = 8 * len(query) + 10
+        if position == 0 or text[position - 1] in WORD_SEPARATORS:
+            score += 10
+        return score - min(position, 10)
+    score = 0
+    previous = -1
+    for char in query:
+        position = text.find(char, previous + 1)
+        if position < 0:
+            return None
+        if position == previous + 1:
+            score += 5
+        elif previous >= 0:
+            score -= min(position - previous - 1, 3)
+        if position == 0 or text[position - 1] in WORD_SEPARATORS:
+            score += 3
+        previous = position
+    return score
+
+
+class WindowIndex:
+    """
+    Open windows of the Hyprland session, kept current from events.
+
+    Attributes:
+        windows (Dict[str, IndexedWindow]): address -> window
+        version (int): Incremented on every change that can change matches
+    """
+
+    def __init__(self) -> None:
+        self.windows: Dict[str, IndexedWindow] = {}
+        self.version = 0
+        self._focusCounter = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._started = False
+        self._tasks = TaskScope("windowindex")
+        self._lastQuery = ""
+        self._lastVersion = -1
+        self._lastMatches: List[IndexedWindow] = []
+
+    def addListener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        for event, handler in (
+            ("openwindow", self._onOpenWindow),
+            ("closewindow", self._onCloseWindow),
+            ("windowtitlev2", self._onWindowTitle),
+            ("movewindowv2", self._onMoveWindow),
+            ("activewindowv2", self._onActiveWindow),
+        ):
+            hyprlandEvents.subscribe(event, handler)
+        self._tasks.spawn(self.load())
+
+    async def load(self) -> None:
+        # Full list once, events keep it current afterwards
+        try:
+            clients = await hyprIPC.queryAsync(CLIENTS)
+        except (OSError, ValueError) as e:
+            printLog(f"Error loading windows for the search: {e}")
+            return
+        for client in sorted(clients, key=lambda c: -c.focusHistoryId):
+            self.add(client.address, client.title, client.wmClass, client.workspaceName)
+            self.focus(client.address)
+
+    def add(self, address: str, title: str, wmClass: str, workspace: str) -> None:
+        self.windows[address] = IndexedWindow(address, title, wmClass, workspace)
+        self._changed()
+
+    def remove(self, address: str) -> None:
+        if self.windows.pop(address, None) is not None:
+            self._changed()
+
+    def retitle(self, address: str, title: str) -> None:
+        window = self.windows.get(address)
+        if window is not None and window.title != title:
+            window.title = title
+            window.reindex()
+            self._changed()
+
+    def move(self, address: str, workspace: str) -> None:
+        window = self.windows.get(address)
+        if window is not None and window.workspace != workspace:
+            window.workspace = workspace
+            window.reindex()
+            self._changed()
+
+    def focus(self, address: str) -> None:
+        # Ranks ties and the empty query by recency, like alt-tab
+        window = self.windows.get(address)
+        if window is not None:
+            self._focusCounter += 1
+            window.focus = self._focusCounter
+
+    def search(self, query: str) -> List[IndexedWindow]:
+        """
+        Ranks the windows matching `query`, best first.
+
+        Args:
+            query (str): Typed text, case and spaces are ignored.
+
+        Returns:
+            List[IndexedWindow]: Matching windows, or every window by recency.
+        """
+        query = "".join(query.lower().split())
+        if not query:
+            self._lastQuery = ""
+            return sorted(self.windows.values(), key=lambda w: -w.focus)
+
+        # A longer query can only match a subset of the previous matches
+        if (
+            self._lastQuery
+            and self._lastVersion == self.version
+            and query.startswith(self._lastQuery)
+        ):
+            candidates = self._lastMatches
+        else:
+            candidates = self.windows.values()
+
+        needed = frozenset(query)
+        scored = []
+        for window in candidates:
+            if not needed <= window.chars:
+                continue
+            best = None
+            for text, bonus in zip(window.fields, FIELD_BONUS):
+                score = fuzzyScore(query, text)
+                if score is not None and (best is None or score + bonus > best):
+                    best = score + bonus
+            if best is not None:
+                scored.append((best, window.focus, window))
+        scored.sort(key=lambda match: (-match[0], -match[1]))
+
+        self._lastQuery = query
+        self._lastVersion = self.version
+        self._lastMatches = [window for _, _, window in scored]
+        return self._lastMatches
+
+    def _changed(self) -> None:
+        self.version += 1
+        for listener in self._listeners:
+            listener()
+
+    def _onOpenWindow(self, data: str) -> None:
+        address, workspace, wmClass, title = (data.split(",", 3) + ["", "", ""])[:4]
+        self.add(normalizeAddress(address), title, wmClass, workspace)
+
+    def _onCloseWindow(self, data: str) -> None:
+        self.remove(normalizeAddress(data))
+
+    def _onWindowTitle(self, data: str) -> None:
+        address, _, title = data.partition(",")
+        self.retitle(normalizeAddress(address), title)
+
+    def _onMoveWindow(self, data: str) -> None:
+        # "ADDRESS,WORKSPACEID,WORKSPACENAME"
+        address, _, workspace = (data.split(",", 2) + ["", ""])[:3]
+        self.move(normalizeAddress(address), workspace)
+
+    def _onActiveWindow(self, data: str) -> None:
+        if data and data != ",":
+            self.focus(normalizeAddress(data))
+
+
+windowIndex = WindowIndex()
+
+
+class SearchItem(GObject.Object):
+    """
+    Window in the result list of the popup.
+    """
+
+    __gtype_name__ = "HyprbarSearchItem"
+
+    def __init__(self, window: IndexedWindow) -> None:
+        super().__init__()
+        self.window = window
+
+
+def itemFor(window: IndexedWindow) -> SearchItem:
+    # One item per window, reused by every keystroke
+    if window.item is None:
+        window.item = SearchItem(window)
+    return window.item
+
+
+class WindowSearch:
+    """
+    Search popup, opened with `hyprbar msg search` or the optional bar button.
+    """
+
+    def __init__(self, box: Gtk.Box, config: ComponentConfig) -> None:
+        self.config = config
+        self.window: Optional[Gtk.Window] = None
+        self.entry: Optional[Gtk.SearchEntry] = None
+        self.store = Gio.ListStore(item_type=SearchItem)
+        self.selection = Gtk.SingleSelection(model=self.store, autoselect=True)
+        self.rows: Dict[Gtk.ListItem, Tuple[Gtk.Label, Gtk.Label, Gtk.Label]] = {}
+        self.tasks = TaskScope("windowsearch")
+
+        if config.icon:  # pyright: ignore # noqa
+            button = Gtk.Button(label=f"{config.icon}")  # pyright: ignore # noqa
+            if config.css_id:  # pyright: ignore # noqa
+                button.set_name(config.css_id)  # pyright: ignore # noqa
+            button.connect("clicked", lambda _: self.toggle())
+            box.append(button)
+
+        windowIndex.addListener(self.onIndexChanged)
+        windowIndex.start()
+        controlServer.registerAction("search", self.toggle)
+
+    def ensureWindow(self) -> Gtk.Window:
+        if self.window is not None:
+            return self.window
+        # Imported on first use so the offscreen renderer needs no layer shell
+        from gi.repository import Gtk4LayerShell as LayerShell  # pyright: ignore #noqa
+
+        window = Gtk.Window(application=Gtk.Application.get_default())
+        window.set_name("hyprbar-search")
+        LayerShell.init_for_window(window)
+        LayerShell.set_layer(window, LayerShell.Layer.OVERLAY)
+        LayerShell.set_keyboard_mode(window, LayerShell.KeyboardMode.EXCLUSIVE)
+        window.set_default_size(self.config.width, -1)  # pyright: ignore # noqa
+
+        self.entry = Gtk.SearchEntry()
+        self.entry.set_search_delay(0)
+        self.entry.connect("search-changed", lambda _: self.refresh())
+        self.entry.connect("activate", lambda _: self.activate(self.selected()))
+        self.entry.connect("stop-search", lambda _: self.hide())
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.onSetup)
+        factory.connect("bind", self.onBind)
+        factory.connect("teardown", self.onTeardown)
+        listView = Gtk.ListView(model=self.selection, factory=factory)
+        listView.set_single_click_activate(True)
+        listView.connect("activate", lambda _, position: self.activate(position))
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_min_content_height(self.config.height)  # pyright: ignore # noqa
+        scrolled.set_child(listView)
+
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        content.append(self.entry)
+        content.append(scrolled)
+        window.set_child(content)
+
+        # Up and Down move the selection while the entry keeps the focus
+        keys = Gtk.EventControllerKey()
+        keys.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        keys.connect("key-pressed", self.onKeyPressed)
+        window.add_controller(keys)
+        self.window = window
+        return window
+
+    def toggle(self) -> None:
+        if self.window is not None and self.window.get_visible():
+            self.hide()
+        else:
+            self.show()
+
+    def show(self) -> None:
+        window = self.ensureWindow()
+        self.entry.set_text("")  # pyright: ignore # noqa
+        self.refresh()
+        window.present()
+        self.entry.grab_focus()  # pyright: ignore # noqa
+
+    def hide(self) -> None:
+        if self.window is not None:
+            self.window.set_visible(False)
+
+    def refresh(self) -> None:
+        if self.entry is None:
+            return
+        start = time.perf_counter()
+        matches = windowIndex.search(self.entry.get_text())
+        elapsed = time.perf_counter() - start
+        maxResults = self.config.max_results  # pyright: ignore # noqa
+        items = [itemFor(window) for window in matches[:maxResults]]
+        # One items-changed for the whole result list
+        self.store.splice(0, self.store.get_n_items(), items)
+        if items:
+            self.selection.set_selected(0)
+        printLog(
+            f"Window search: {len(matches)} matches of {len(windowIndex.windows)} "
+            f"in {elapsed * 1000:.3f} ms"
+        )
+
+    def onIndexChanged(self) -> None:
+        if self.window is not None and self.window.get_visible():
+            self.refresh()
+
+    def selected(self) -> int:
+        return self.selection.get_selected()
+
+    def activate(self, position: int) -> None:
+        item = self.store.get_item(position) if position >= 0 else None
+        if item is None:
+            return
+        self.hide()
+        address = item.window.address
+        self.tasks.spawn(
+            hyprctl(f"dispatch focuswindow address:{address}", asJson=False)
+        )
+
+    def onKeyPressed(self, controller, keyval: int, keycode: int, state) -> bool:
+        count = self.store.get_n_items()
+        if not count or keyval not in (Gdk.KEY_Up, Gdk.KEY_Down):
+            return False
+        step = -1 if keyval == Gdk.KEY_Up else 1
+        self.selection.set_selected((self.selected() + step) % count)
+        return True
+
+    def onSetup(self, factory, listItem: Gtk.ListItem) -> None:
+        row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        wmClass = Gtk.Label(xalign=0)
+        wmClass.add_css_class("search-class")
+        title = Gtk.Label(xalign=0, hexpand=True)
+        title.set_ellipsize(Pango.EllipsizeMode.END)
+        title.add_css_class("search-title")
+        workspace = Gtk.Label()
+        workspace.add_css_class("search-workspace")
+        row.append(wmClass)
+        row.append(title)
+        row.append(workspace)
+        listItem.set_child(row)
+        self.rows[listItem] = (wmClass, title, workspace)
+
+    def onBind(self, factory, listItem: Gtk.ListItem) -> None:
+        wmClass, title, workspace = self.rows[listItem]
+        window = listItem.get_item().window
+        wmClass.set_text(window.wmClass)
+        title.set_text(window.title)
+        workspace.set_text(window.workspace)
+
+    def onTeardown(self, factory, listItem: Gtk.ListItem) -> None:
+        del self.rows[listItem]
+
+
+if __name__ == "__main__":
+    classes = ["firefox", "kitty", "code", "thunar", "org.gnome.Nautilus", "slack"]
+    words = ["report", "draft", "hyprbar", "invoice", "music", "build", "notes"]
+    index = WindowIndex()
+    for i in range(500):
+        index.add(
+            f"0x{i:x}",
+            f"{words[i % 7]} {words[(i * 3) % 7]} {i} - {classes[i % 6].title()}",
+            classes[i % 6],
+            str(i % 10 + 1),
+        )
+    for query in ("hyprbar", "firefoxmusic", "ktynotes", "slk", "xyz"):
+        fresh = []
+        for length in range(1, len(query) + 1):
+            index._lastQuery = ""
+            start = time.perf_counter()
+            index.search(query[:length])
+            fresh.append(time.perf_counter() - start)
+        typed = []
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            matches = index.search(query[:length])
+            typed.append(time.perf_counter() - start)
+        print(
+            f"{query:>14}: {len(matches):3d} matches, "
+            f"{sum(fresh) * 1000 / len(fresh):.3f} ms/key from scratch, "
+            f"{sum(typed) * 1000 / len(typed):.3f} ms/key while typing"
+        )
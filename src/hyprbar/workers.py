@@ -0,0 +1,225 @@
+# Provider Worker Pool
+#
+# Optional pool of worker processes (`workers: N` in config.yaml) that runs
+# blocking providers and shell commands off the GTK main thread and on other
+# cores. Replies are read from the worker pipes by GLib IO watches, so the
+# bar never waits for a worker. A supervisor timer kills workers that hang on
+# a job; hung or crashed workers are restarted with exponential backoff and
+# their pending jobs fail with an error instead of blocking the caller.
+#
+import time
+import threading
+import multiprocessing
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.util import printLog
+from hyprbar.workertasks import (
+    REPLY,
+    STATUS_OK,
+    encodeRequest,
+    workerMain,
+)
+
+JOB_TIMEOUT = 10.0  # seconds before a job is considered hung
+SUPERVISE_INTERVAL = 1  # seconds between hang checks
+RESTART_MIN_MS = 500
+RESTART_MAX_MS = 30000
+MAX_QUEUED = 256  # jobs waiting for a worker, the oldest are dropped
+
+Callback = Callable[[Optional[str], Optional[str]], None]  # (value, error)
+
+
+class Job:
+    __slots__ = ("id", "task", "payload", "callback", "deadline")
+
+    def __init__(self, id: int, task: str, payload: bytes, callback: Callback):
+        self.id = id
+        self.task = task
+        self.payload = payload
+        self.callback = callback
+        self.deadline = 0.0
+
+
+class Worker:
+    __slots__ = ("slot", "process", "connection", "watchId", "jobs")
+
+    def __init__(self, slot: int) -> None:
+        self.slot = slot
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.connection = None
+        self.watchId: Optional[int] = None
+        self.jobs: Dict[int, Job] = {}
+
+
+class WorkerPool:
+    """
+    Supervised pool of provider worker processes.
+
+    Attributes:
+        enabled (bool): Whether the pool was started
+        restarts (int): Workers restarted after a crash or a hang
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.restarts = 0
+        self.workers: List[Worker] = []
+        self.queue: Deque[Job] = deque(maxlen=MAX_QUEUED)
+        self._context = multiprocessing.get_context("forkserver")
+        self._backoff: Dict[int, int] = {}  # slot -> next restart delay
+        self._nextId = 1
+
+    def start(self, size: int) -> None:
+        if self.enabled or size <= 0:
+            return
+        self.enabled = True
+        for slot in range(size):
+            worker = Worker(slot)
+            self.workers.append(worker)
+            self._spawn(worker)
+        GLib.timeout_add_seconds(SUPERVISE_INTERVAL, self._supervise)
+        printLog(f"Started {size} provider worker processes")
+
+    def stop(self) -> None:
+        self.enabled = False
+        for worker in self.workers:
+            self._kill(worker)
+        self.workers.clear()
+
+    def submit(self, task: str, payload: str, callback: Callback) -> None:
+        """
+        Runs `task` in a worker and calls callback(value, error) on the main loop.
+
+        Args:
+            task (str): Task name, see hyprbar.workertasks.TASKS.
+            payload (str): Task argument (command line, provider name...).
+            callback (Callback): Receives the value, or None and an error.
+        """
+        job = Job(self._nextId, task, payload.encode(), callback)
+        self._nextId = (self._nextId + 1) & 0xFFFFFFFF or 1
+        worker = self._pickWorker()
+        if worker is None:
+            if len(self.queue) == self.queue.maxlen:
+                self._fail(self.queue[0], "dropped, no worker available")
+            self.queue.append(job)
+            return
+        self._send(worker, job)
+
+    def _pickWorker(self) -> Optional[Worker]:
+        alive = [w for w in self.workers if w.connection is not None]
+        return min(alive, key=lambda w: len(w.jobs), default=None)
+
+    def _send(self, worker: Worker, job: Job) -> None:
+        job.deadline = time.monotonic() + JOB_TIMEOUT
+        worker.jobs[job.id] = job
+        try:
+            worker.connection.send_bytes(encodeRequest(job.id, job.task, job.payload))
+        except (OSError, ValueError) as e:
+            self._restart(worker, f"write failed: {e}")
+
+    def _spawn(self, worker: Worker) -> bool:
+        if not self.enabled:
+            return False
+        parentEnd, childEnd = self._context.Pipe()
+        process = self._context.Process(
+            target=workerMain,
+            args=(childEnd,),
+            name=f"hyprbar-worker-{worker.slot}",
+            daemon=True,
+        )
+        try:
+            process.start()
+        except OSError as e:
+            printLog(f"Cannot start worker {worker.slot}: {e}")
+            self._scheduleRestart(worker)
+            return False
+        childEnd.close()
+        worker.process = process
+        worker.connection = parentEnd
+        worker.watchId = GLib.io_add_watch(
+            parentEnd.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+            self._onReadable,
+            worker,
+        )
+        while self.queue and worker.connection is not None:
+            self._send(worker, self.queue.popleft())
+        return False
+
+    def _onReadable(self, fd: int, condition: GLib.IOCondition, worker: Worker):
+        try:
+            while worker.connection is not None and worker.connection.poll():
+                frame = worker.connection.recv_bytes()
+                jobId, status = REPLY.unpack_from(frame)
+                job = worker.jobs.pop(jobId, None)
+                if job is None:
+                    continue  # Answer to a job that already timed out
+                # A healthy answer resets the restart backoff
+                self._backoff.pop(worker.slot, None)
+                value = frame[REPLY.size :].decode("utf-8", errors="replace")
+                if status == STATUS_OK:
+                    self._call(job, value, None)
+                else:
+                    self._call(job, None, value)
+        except (EOFError, OSError):
+            worker.watchId = None  # Removed by returning False
+            self._restart(worker, "exited")
+            return False
+        return worker.connection is not None
+
+    def _supervise(self) -> bool:
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        for worker in self.workers:
+            if any(job.deadline < now for job in worker.jobs.values()):
+                self._restart(worker, f"no answer within {JOB_TIMEOUT:.0f} s")
+        return True
+
+    def _restart(self, worker: Worker, reason: str) -> None:
+        if worker.connection is None:
+            return
+        printLog(f"Worker {worker.slot} {reason}, restarting it")
+        self.restarts += 1
+        self._kill(worker)
+        self._scheduleRestart(worker)
+
+    def _scheduleRestart(self, worker: Worker) -> None:
+        delay = self._backoff.get(worker.slot, RESTART_MIN_MS)
+        self._backoff[worker.slot] = min(delay * 2, RESTART_MAX_MS)
+        GLib.timeout_add(delay, self._spawn, worker)
+
+    def _kill(self, worker: Worker) -> None:
+        if worker.watchId is not None:
+            GLib.source_remove(worker.watchId)
+            worker.watchId = None
+        if worker.connection is not None:
+            worker.connection.close()
+            worker.connection = None
+        if worker.process is not None:
+            if worker.process.is_alive():
+                worker.process.kill()
+            # Reaped off the main loop, a killed process may take a moment
+            threading.Thread(
+                target=worker.process.join,
+                name=f"reap-worker-{worker.slot}",
+                daemon=True,
+            ).start()
+            worker.process = None
+        jobs, worker.jobs = worker.jobs, {}
+        for job in jobs.values():
+            self._fail(job, "worker restarted")
+
+    def _fail(self, job: Job, error: str) -> None:
+        self._call(job, None, error)
+
+    def _call(self, job: Job, value: Optional[str], error: Optional[str]) -> None:
+        try:
+            job.callback(value, error)
+        except Exception as e:
+            printLog(f"Error handling the result of '{job.task}': {e}")
+
+
+workerPool = WorkerPool()
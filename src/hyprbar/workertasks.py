@@ -0,0 +1,72 @@
+# Worker Process Tasks
+#
+# Code that runs inside the provider worker processes started by
+# hyprbar.workers. It must not import GTK: workers are started with the
+# forkserver method and only load what the tasks need.
+#
+# Every message is one pipe frame (multiprocessing.Connection.send_bytes):
+#   request: job id (u32), task name length (u8), task name, payload
+#   reply:   job id (u32), status (u8), payload (result or error message)
+#
+import signal
+import struct
+from typing import Callable, Dict
+from multiprocessing.connection import Connection
+from hyprbar.providers import getProvider
+from hyprbar.util import executeCommand
+
+REQUEST = struct.Struct("!IB")
+REPLY = struct.Struct("!IB")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def runCommandTask(payload: bytes) -> bytes:
+    code, out, error = executeCommand(command=payload.decode())
+    if code != 0:
+        raise RuntimeError(error.strip() or f"exit code {code}")
+    return "".join(c for c in out if c not in "\n\r").encode()
+
+
+def readProviderTask(payload: bytes) -> bytes:
+    provider = getProvider(payload.decode())
+    if provider is None:
+        raise KeyError(f"unknown provider '{payload.decode()}'")
+    return provider.read().encode()
+
+
+TASKS: Dict[str, Callable[[bytes], bytes]] = {
+    "command": runCommandTask,
+    "provider": readProviderTask,
+}
+
+
+def encodeRequest(jobId: int, task: str, payload: bytes) -> bytes:
+    name = task.encode()
+    return REQUEST.pack(jobId, len(name)) + name + payload
+
+
+def decodeRequest(frame: bytes):
+    jobId, nameLength = REQUEST.unpack_from(frame)
+    start = REQUEST.size
+    task = frame[start : start + nameLength].decode()
+    return jobId, task, frame[start + nameLength :]
+
+
+def workerMain(connection: Connection) -> None:
+    # Ctrl+C is handled by the bar, which stops its workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            frame = connection.recv_bytes()
+        except (EOFError, OSError):
+            return
+        jobId, task, payload = decodeRequest(frame)
+        try:
+            result, status = TASKS[task](payload), STATUS_OK
+        except Exception as e:
+            result, status = f"{type(e).__name__}: {e}".encode(), STATUS_ERROR
+        try:
+            connection.send_bytes(REPLY.pack(jobId, status) + result)
+        except (BrokenPipeError, OSError):
+            return
@@ -0,0 +1,370 @@
+# Workspaces Component
+#
+# WorkspaceModel tracks every Hyprland workspace (numbered, named and special)
+# with its windows, urgent windows and monitor, and is updated incrementally
+# from Hyprland events instead of polling. The Workspaces component renders
+# the model, switches workspace on click and cycles on scroll; scroll
+# dispatches are rate-limited and coalesced into a single relative move.
+#
+import time
+from typing import Callable, Dict, List, Optional, Set
+from gi.repository import Gtk  # pyright: ignore #noqa
+from gi.repository import GLib  # pyright: ignore # noqa
+from hyprbar.config import ComponentConfig
+from hyprbar.hyprevents import hyprlandEvents, normalizeAddress
+from hyprbar.hypripc import ACTIVE_WORKSPACE, CLIENTS, MONITORS, WORKSPACES, hyprIPC
+from hyprbar.render import renderBatcher
+from hyprbar.snapshot import snapshot
+from hyprbar.stateexport import stateExport
+from hyprbar.util import printLog
+
+
+class WorkspaceState:
+    __slots__ = ("id", "name", "monitor", "windows", "urgent")
+
+    def __init__(self, id: int, name: str, monitor: str = "") -> None:
+        self.id = id
+        self.name = name
+        self.monitor = monitor
+        self.windows: Set[str] = set()  # window addresses
+        self.urgent: Set[str] = set()  # urgent window addresses
+
+    @property
+    def isSpecial(self) -> bool:
+        return self.id < 0
+
+
+class WorkspaceModel:
+    """
+    All workspaces of the Hyprland session, kept up to date from events.
+
+    Listeners are called with the set of workspace ids that changed; the
+    active workspace is reported as a change of the old and new ids.
+    """
+
+    def __init__(self) -> None:
+        self.workspaces: Dict[int, WorkspaceState] = {}
+        self.windowWorkspace: Dict[str, int] = {}  # address -> workspace id
+        self.activeId: int = snapshot.get("workspaces", {}).get("active", 1)
+        self.monitorActive: Dict[str, int] = {}  # monitor -> visible workspace
+        self.focusedMonitor: str = ""
+        self._listeners: List[Callable[[Set[int]], None]] = []
+        self._started = False
+
+    def addListener(self, listener: Callable[[Set[int]], None]) -> None:
+        self._listeners.append(listener)
+        if not self._started:
+            self._started = True
+            self._subscribe()
+            GLib.idle_add(self.load)
+
+    def load(self) -> bool:
+        # Full state once, events keep it current afterwards
+        try:
+            monitors = hyprIPC.query(MONITORS)
+            workspaces = hyprIPC.query(WORKSPACES)
+            windows = hyprIPC.query(CLIENTS)
+            active = hyprIPC.query(ACTIVE_WORKSPACE)
+        except Exception as e:
+            printLog(f"Error loading Hyprland workspaces: {e}")
+            return False
+
+        self.workspaces = {
+            ws.id: WorkspaceState(ws.id, ws.name, ws.monitor) for ws in workspaces
+        }
+        self.windowWorkspace = {}
+        for window in windows:
+            self._placeWindow(window.address, window.workspaceId)
+        self.monitorActive = {m.name: m.activeWorkspaceId for m in monitors}
+        self.focusedMonitor = next((m.name for m in monitors if m.focused), "")
+        self.activeId = active.id
+        self._notify(set(self.workspaces) | {self.activeId})
+        return False
+
+    def _subscribe(self) -> None:
+        handlers = {
+            "workspacev2": self._onWorkspace,
+            "focusedmonv2": self._onFocusedMonitor,
+            "createworkspacev2": self._onCreateWorkspace,
+            "destroyworkspacev2": self._onDestroyWorkspace,
+            "moveworkspacev2": self._onMoveWorkspace,
+            "renameworkspace": self._onRenameWorkspace,
+            "openwindow": self._onOpenWindow,
+            "closewindow": self._onCloseWindow,
+            "movewindowv2": self._onMoveWindow,
+            "urgent": self._onUrgent,
+            "activewindowv2": self._onActiveWindow,
+        }
+        for event, handler in handlers.items():
+            hyprlandEvents.subscribe(event, handler)
+
+    def _notify(self, changed: Set[int]) -> None:
+        for listener in self._listeners:
+            listener(changed)
+        snapshot.update("workspaces", {"active": self.activeId})
+        stateExport.publish("workspaces", self.exportState())
+
+    def exportState(self) -> Dict[str, Dict[str, object]]:
+        # Keyed by workspace id, so a switch is a diff of two entries
+        visible = set(self.monitorActive.values())
+        return {
+            str(state.id): {
+                "name": state.name,
+                "monitor": state.monitor,
+                "windows": len(state.windows),
+                "urgent": bool(state.urgent),
+                "visible": state.id in visible,
+                "active": state.id == self.activeId,
+            }
+            for state in self.workspaces.values()
+        }
+
+    def _ensure(self, id: int, name: str = "", monitor: str = "") -> WorkspaceState:
+        state = self.workspaces.get(id)
+        if state is None:
+            state = WorkspaceState(id, name or str(id), monitor or self.focusedMonitor)
+            self.workspaces[id] = state
+        return state
+
+    def _placeWindow(self, address: str, workspaceId: int) -> Set[int]:
+        changed = self._unplaceWindow(address)
+        self._ensure(workspaceId).windows.add(address)
+        self.windowWorkspace[address] = workspaceId
+        changed.add(workspaceId)
+        return changed
+
+    def _unplaceWindow(self, address: str) -> Set[int]:
+        workspaceId = self.windowWorkspace.pop(address, None)
+        if workspaceId is None or workspaceId not in self.workspaces:
+            return set()
+        state = self.workspaces[workspaceId]
+        state.windows.discard(address)
+        state.urgent.discard(address)
+        return {workspaceId}
+
+    def _idByName(self, name: str) -> Optional[int]:
+        for state in self.workspaces.values():
+            if state.name == name:
+                return state.id
+        return None
+
+    def _onWorkspace(self, data: str) -> None:
+        id, _, name = data.partition(",")
+        self._setActive(int(id), name)
+
+    def _onFocusedMonitor(self, data: str) -> None:
+        monitor, _, id = data.partition(",")
+        self.focusedMonitor = monitor
+        self._setActive(int(id))
+
+    def _setActive(self, id: int, name: str = "") -> None:
+        previous = self.activeId
+        state = self._ensure(id, name)
+        self.activeId = id
+        if state.monitor:
+            self.monitorActive[state.monitor] = id
+        if previous != id:
+            self._notify({previous, id})
+
+    def _onCreateWorkspace(self, data: str) -> None:
+        id, _, name = data.partition(",")
+        self._ensure(int(id), name)
+        self._notify({int(id)})
+
+    def _onDestroyWorkspace(self, data: str) -> None:
+        id = int(data.partition(",")[0])
+        state = self.workspaces.pop(id, None)
+        if state is not None:
+            for address in state.windows:
+                self.windowWorkspace.pop(address, None)
+            self._notify({id})
+
+    def _onMoveWorkspace(self, data: str) -> None:
+        id, name, monitor = data.split(",", 2)
+        self._ensure(int(id), name).monitor = monitor
+        self._notify({int(id)})
+
+    def _onRenameWorkspace(self, data: str) -> None:
+        id, _, name = data.partition(",")
+        self._ensure(int(id)).name = name
+        self._notify({int(id)})
+
+    def _onOpenWindow(self, data: str) -> None:
+        address, workspaceName, _ = data.split(",", 2)
+        workspaceId = self._idByName(workspaceName)
+        if workspaceId is None:
+            if not workspaceName.lstrip("-").isdigit():
+                return
+            workspaceId = int(workspaceName)
+        self._notify(self._placeWindow(normalizeAddress(address), workspaceId))
+
+    def _onCloseWindow(self, data: str) -> None:
+        self._notify(self._unplaceWindow(normalizeAddress(data)))
+
+    def _onMoveWindow(self, data: str) -> None:
+        address, id, _ = data.split(",", 2)
+        self._notify(self._placeWindow(normalizeAddress(address), int(id)))
+
+    def _onUrgent(self, data: str) -> None:
+        address = normalizeAddress(data)
+        workspaceId = self.windowWorkspace.get(address)
+        if workspaceId is not None and workspaceId != self.activeId:
+            self.workspaces[workspaceId].urgent.add(address)
+            self._notify({workspaceId})
+
+    def _onActiveWindow(self, data: str) -> None:
+        # Focusing an urgent window clears its urgency
+        address = normalizeAddress(data)
+        workspaceId = self.windowWorkspace.get(address)
+        if workspaceId is not None and address in self.workspaces[workspaceId].urgent:
+            self.workspaces[workspaceId].urgent.discard(address)
+            self._notify({workspaceId})
+
+
+workspaceModel = WorkspaceModel()
+
+
+class Workspaces:
+    """
+    Workspace indicator with click-to-switch and scroll-to-cycle.
+    """
+
+    def __init__(self, box: Gtk.Box, config: ComponentConfig) -> None:
+        self.config = config
+        self.cssId = config.css_id  # pyright: ignore # noqa
+        # Workspaces 1..len(ids) are always shown with the configured labels
+        self.persistent: Dict[int, str] = {
+            index + 1: label
+            for index, label in enumerate(config.ids)  # pyright: ignore # noqa
+        }
+        self.labels: Dict[int, Gtk.Label] = {}
+        self.pendingSteps = 0
+        self.lastDispatch = 0.0
+        self.scrollSourceId: Optional[int] = None
+
+        self.root = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=box.get_spacing()
+        )
+        box.append(self.root)
+        if config.scroll:  # pyright: ignore # noqa
+            scroll = Gtk.EventControllerScroll.new(
+                Gtk.EventControllerScrollFlags.VERTICAL
+                | Gtk.EventControllerScrollFlags.DISCRETE
+            )
+            scroll.connect("scroll", self.onScroll)
+            self.root.add_controller(scroll)
+
+        for id in self.persistent:
+            self.refreshWorkspace(id)
+        workspaceModel.addListener(self.onModelChanged)
+
+    def isShown(self, id: int) -> bool:
+        if id in self.persistent:
+            return True
+        state = workspaceModel.workspaces.get(id)
+        if state is None:
+            return False
+        if state.isSpecial and not self.config.show_special:  # pyright: ignore # noqa
+            return False
+        monitor = self.config.monitor  # pyright: ignore # noqa
+        return not monitor or state.monitor == monitor
+
+    def activeId(self) -> int:
+        monitor = self.config.monitor  # pyright: ignore # noqa
+        if monitor:
+            return workspaceModel.monitorActive.get(monitor, workspaceModel.activeId)
+        return workspaceModel.activeId
+
+    def labelText(self, id: int) -> str:
+        if id in self.persistent:
+            return self.persistent[id]
+        state = workspaceModel.workspaces.get(id)
+        if state is None:
+            return str(id)
+        return state.name.removeprefix("special:") if state.isSpecial else state.name
+
+    def sortKey(self, id: int):
+        # Numbered workspaces first, special workspaces at the end
+        return (id < 0, abs(id))
+
+    def onModelChanged(self, changed: Set[int]) -> None:
+        for id in changed:
+            self.refreshWorkspace(id)
+
+    def refreshWorkspace(self, id: int) -> None:
+        label = self.labels.get(id)
+        if not self.isShown(id):
+            if label is not None:
+                self.root.remove(label)
+                del self.labels[id]
+            return
+        if label is None:
+            label = self.createLabel(id)
+
+        state = workspaceModel.workspaces.get(id)
+        renderBatcher.setText(label, self.labelText(id))
+        renderBatcher.setCssClass(label, "workspace-active", id == self.activeId())
+        renderBatcher.setCssClass(
+            label, "workspace-occupied", bool(state and state.windows)
+        )
+        renderBatcher.setCssClass(
+            label, "workspace-urgent", bool(state and state.urgent)
+        )
+
+    def createLabel(self, id: int) -> Gtk.Label:
+        label = Gtk.Label(label=self.labelText(id))
+        # css id for the workspace
+        suffix = f"special-{abs(id)}" if id < 0 else f"{id}"
+        label.set_name(f"{self.cssId}-{suffix}")
+        label.add_css_class("workspace-hover")
+        click = Gtk.GestureClick.new()
+        click.connect("released", lambda *_: self.switchTo(id))
+        label.add_controller(click)
+
+        # Keep the labels ordered
+        previous = max(
+            (k for k in self.labels if self.sortKey(k) < self.sortKey(id)),
+            key=self.sortKey,
+            default=None,
+        )
+        self.root.insert_child_after(
+            label, self.labels[previous] if previous is not None else None
+        )
+        self.labels[id] = label
+        return label
+
+    def switchTo(self, id: int) -> None:
+        state = workspaceModel.workspaces.get(id)
+        if state is not None and state.isSpecial:
+            dispatch(["togglespecialworkspace", state.name.removeprefix("special:")])
+        else:
+            dispatch(["workspace", str(id)])
+
+    def onScroll(self, controller, dx: float, dy: float) -> bool:
+        self.pendingSteps += 1 if dy > 0 else -1 if dy < 0 else 0
+        if self.scrollSourceId is None:
+            interval = self.config.scroll_interval / 1000  # pyright: ignore # noqa
+            wait = self.lastDispatch + interval - time.monotonic()
+            if wait <= 0:
+                self.flushScroll()
+            else:
+                # Steps arriving meanwhile are added to the pending move
+                self.scrollSourceId = GLib.timeout_add(
+                    int(wait * 1000) + 1, self.flushScroll
+                )
+        return True
+
+    def flushScroll(self) -> bool:
+        self.scrollSourceId = None
+        steps, self.pendingSteps = self.pendingSteps, 0
+        if steps:
+            self.lastDispatch = time.monotonic()
+            dispatch(["workspace", f"e{steps:+d}"])
+        return False
+
+
+def dispatch(arguments: List[str]) -> None:
+    try:
+        hyprIPC.dispatch(" ".join(arguments))
+    except OSError as e:
+        printLog(f"Error dispatching {arguments}: {e}")